@@ -5,7 +5,7 @@ from app.config import settings
 
 engine = create_engine(
     settings.DATABASE_URL,
-    echo=True,
+    echo=settings.SQL_ECHO,
     pool_size=10, 
     max_overflow=20,
     pool_timeout=30,
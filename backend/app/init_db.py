@@ -7,9 +7,11 @@ Idempotent - safe to run multiple times.
 import logging
 import os
 from datetime import datetime
-from pycoingecko import CoinGeckoAPI
 from app.database import SessionLocal, engine
 from app.models import Coin, Top100, TrendingCoin, TopGainerLoser, CoinHistory, Base
+from app.services import coingecko
+from app.services.catalog_sync import sync_coin_catalog
+from app.services import freshness, partitions, tick_buffer
 
 logger = logging.getLogger(__name__)
 
@@ -98,32 +100,15 @@ def init_coins_table():
             return True
         
         logger.info("Fetching all coins from CoinGecko API...")
-        cg = CoinGeckoAPI()
-        coin_list = cg.get_coins_list()
+        coin_list = coingecko.get_coins_list()
         
         if not coin_list:
             logger.error("Failed to fetch coins from CoinGecko")
             return False
         
         logger.info(f"Inserting {len(coin_list)} coins into database...")
-        
-        for idx, coin in enumerate(coin_list):
-            try:
-                new_coin = Coin(
-                    coin_id=coin["id"],
-                    symbol=coin["symbol"].upper()
-                )
-                db.add(new_coin)
-                
-                if (idx + 1) % 500 == 0:
-                    logger.info(f"  Progress: {idx + 1}/{len(coin_list)}")
-                    
-            except Exception as e:
-                logger.warning(f"Skipped coin {coin.get('id')}: {e}")
-                continue
-        
-        db.commit()
-        logger.info(f"✓ Successfully inserted {len(coin_list)} coins")
+        stats = sync_coin_catalog(db, coin_list)
+        logger.info(f"✓ Successfully inserted {stats['inserted']} coins in {stats['elapsed_ms']}ms")
         return True
         
     except Exception as e:
@@ -174,8 +159,7 @@ def init_trending_coins():
     try:
         logger.info("Fetching trending coins from CoinGecko...")
         
-        cg = CoinGeckoAPI()
-        trending_data = cg.get_search_trending()
+        trending_data = coingecko.get_search_trending()
         
         if not trending_data or 'coins' not in trending_data:
             logger.warning("No trending data available")
@@ -211,6 +195,7 @@ def init_trending_coins():
                 continue
         
         db.commit()
+        freshness.mark(freshness.TRENDING)
         logger.info(f"✓ Trending coins initialized: {added} coins")
         return True
         
@@ -231,8 +216,7 @@ def init_gainers_losers():
     try:
         logger.info("Fetching top gainers and losers from CoinGecko...")
         
-        cg = CoinGeckoAPI()
-        market_data = cg.get_coins_markets(
+        market_data = coingecko.get_coins_markets(
             vs_currency='usd',
             order='market_cap_desc',
             per_page=250,
@@ -311,6 +295,7 @@ def init_gainers_losers():
                 continue
         
         db.commit()
+        freshness.mark(freshness.GAINERS_LOSERS)
         logger.info(f"✓ Gainers/Losers initialized: {added} total")
         return True
         
@@ -341,6 +326,40 @@ def init_coin_history_table():
         return False
 
 
+def ensure_price_partitions():
+    """
+    Make sure price_points has partitions for this month and the next few,
+    plus the default partition for ticks outside them.
+    Runs on every startup (Railway included), since ticks cannot be written
+    into a month without a partition. Idempotent.
+    """
+    db = SessionLocal()
+    try:
+        created = partitions.ensure_partitions(db)
+        if created:
+            logger.info(f"✓ Created price_points partitions: {', '.join(created)}")
+        return True
+    except Exception as e:
+        logger.error(f"Error creating price_points partitions: {e}")
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+
+def warm_tick_buffer():
+    """Load recent ticks into this process's tick buffer so sparklines work straight away."""
+    db = SessionLocal()
+    try:
+        tick_buffer.buffer.warm(db)
+        return True
+    except Exception as e:
+        logger.error(f"Error warming tick buffer: {e}")
+        return False
+    finally:
+        db.close()
+
+
 def initialize_database():
     """
     Run all initialization tasks.
@@ -1,5 +1,6 @@
 import logging
 import os
+import threading
 from datetime import datetime
 
 from fastapi import FastAPI
@@ -12,7 +13,9 @@ from app.routes.fetch import router as fetch_router
 from app.routes import cost_basis
 from app.routes import charts
 from app.routes import market  
-from app.init_db import initialize_database
+from app.routes import export
+from app.init_db import initialize_database, ensure_price_partitions, warm_tick_buffer
+from app.services import coingecko, freshness
 
 LOG_DIR = "logs"
 if not os.path.exists(LOG_DIR):
@@ -59,7 +62,8 @@ app.add_middleware(
     allow_origins=["http://localhost:4200", "http://localhost:3000", "http://localhost:5173", "http://127.0.0.1:3000"],
     allow_credentials=True,
     allow_methods=["GET", "POST"],
-    allow_headers=["Authorization", "Content-Type"],
+    allow_headers=["Authorization", "Content-Type", "If-Modified-Since", "If-None-Match"],
+    expose_headers=["Age", "Content-Disposition", "ETag", "Last-Modified", "X-Cache-Status", "X-Data-As-Of", "X-Next-Cursor"],
 )
 
 logger.info("CORS middleware configured")
@@ -72,6 +76,7 @@ app.include_router(fetch_router)
 app.include_router(cost_basis.router)
 app.include_router(charts.router)
 app.include_router(market.router) 
+app.include_router(export.router)
 
 logger.info("All routers included successfully")
 
@@ -80,10 +85,15 @@ logger.info("All routers included successfully")
 async def startup_event():
     logger.info("FastAPI startup event triggered")
     initialize_database()
+    ensure_price_partitions()
+    freshness.mark_missing([freshness.WATCHLISTS, freshness.TRENDING, freshness.GAINERS_LOSERS, freshness.CATALOG])
+    # Loading a day of ticks can take a while; serve requests meanwhile
+    threading.Thread(target=warm_tick_buffer, name="warm-tick-buffer", daemon=True).start()
 
 
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    logger.info("FastAPI shutdown event triggered")
\ No newline at end of file
+    logger.info("FastAPI shutdown event triggered")
+    coingecko.close()
\ No newline at end of file
@@ -1,5 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, BigInteger, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, BigInteger, UniqueConstraint, Index
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.schema import PrimaryKeyConstraint
 from datetime import datetime
 
 Base = declarative_base()
@@ -10,6 +12,7 @@ class User(Base):
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     is_active = Column(Boolean, default=True)
+    last_login_at = Column(DateTime, nullable=True)
 
 class WatchlistItem(Base):
     __tablename__ = "watchlist"
@@ -20,6 +23,14 @@ class WatchlistItem(Base):
     order = Column(Integer, default=0, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class CoinSubscription(Base):
+    # One row per watched coin, kept in step with the watchlist by the watchlist routes
+    __tablename__ = "coin_subscriptions"
+    coin_id = Column(String, primary_key=True)
+    symbol = Column(String, nullable=False)
+    watchers = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
 class AlertsItem(Base):
     __tablename__ = "alerts"
     id = Column(Integer, primary_key=True, index=True)
@@ -29,11 +40,66 @@ class AlertsItem(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
 class PricePoint(Base):
+    # Range partitioned by month on timestamp (PostgreSQL), see app/services/partitions.py;
+    # there the primary key is (id, timestamp), see _price_points_primary_key below
     __tablename__ = "price_points"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    coin_id = Column(String, index=True)
     symbol = Column(String, index=True)
     price = Column(Float)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, nullable=False, default=datetime.utcnow)  # Upstream observation time (last_updated_at)
+
+    __table_args__ = (
+        UniqueConstraint('coin_id', 'timestamp', name='uix_price_coin_observed'),
+        # History reads: one symbol, newest first, keyset-paged on (timestamp, id)
+        Index('ix_price_points_symbol_timestamp', 'symbol', timestamp.desc(), id.desc()),
+        {'postgresql_partition_by': 'RANGE (timestamp)'},
+    )
+
+@compiles(PrimaryKeyConstraint, "postgresql")
+def _price_points_primary_key(constraint, compiler, **kw):
+    """
+    A partitioned table's primary key has to include the partition key, so on
+    PostgreSQL price_points is created with PRIMARY KEY (id, timestamp). The
+    mapper keeps id alone as its identity (ids come from one sequence), which
+    lets other databases create the table with a plain autoincrement id.
+    """
+    if constraint.table is not None and constraint.table.name == PricePoint.__tablename__:
+        return "PRIMARY KEY (id, timestamp)"
+    return compiler.visit_primary_key_constraint(constraint, **kw)
+
+
+class CurrentPrice(Base):
+    # Latest tick per coin, upserted in the same transaction as price_points
+    __tablename__ = "current_prices"
+    coin_id = Column(String, primary_key=True)
+    symbol = Column(String, index=True, nullable=False)
+    price = Column(Float, nullable=False)
+    timestamp = Column(DateTime, nullable=False)  # Upstream observation time of this price
+
+class PriceRollup(Base):
+    # OHLC buckets built from price_points by app.services.rollups
+    __tablename__ = "price_rollups"
+    id = Column(Integer, primary_key=True, index=True)
+    coin_id = Column(String, nullable=False)
+    symbol = Column(String, nullable=False)
+    resolution = Column(String, nullable=False)  # '1m', '1h' or '1d'
+    bucket = Column(DateTime, nullable=False)  # Bucket start (UTC)
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    ticks = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (UniqueConstraint('coin_id', 'resolution', 'bucket', name='uix_rollup_coin_resolution_bucket'),)
+
+class RollupWatermark(Base):
+    # Highest price_points.id each rollup job has processed
+    __tablename__ = "rollup_watermarks"
+    name = Column(String, primary_key=True)
+    last_id = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
 
 class CostBasis(Base):
     __tablename__ = "cost_basis"
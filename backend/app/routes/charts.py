@@ -1,9 +1,10 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from app import models
 from app.database import SessionLocal
 from app.config import settings
-from pycoingecko import CoinGeckoAPI
-from datetime import datetime, timedelta
+from app.services import coingecko, conditional, freshness, rollups
+from app.services.swr_cache import MISS, CacheResult, SWRCache
+from datetime import datetime, timedelta, timezone
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,19 +15,12 @@ CACHE_EXPIRATION_HOURS = 2
 INTERVAL_4H_MS = 4 * 60 * 60 * 1000  # 4 hours in milliseconds
 INTERVAL_DAILY_MS = 24 * 60 * 60 * 1000  # 1 day in milliseconds
 
-_cache = {}
-
-def get_cached_ohlc(coin_id, days):
-    key = f"{coin_id}_{days}"
-    now = datetime.utcnow()
-    if key in _cache:
-        entry = _cache[key]
-        if now - entry["time"] < timedelta(hours=CACHE_EXPIRATION_HOURS):
-            return entry["data"]
-    return None
-
-def set_cached_ohlc(coin_id, days, data):
-    _cache[f"{coin_id}_{days}"] = {"data": data, "time": datetime.utcnow()}
+# Last good chart data per (coin, days); stale entries are served while a refresh runs
+_chart_cache = SWRCache(
+    "chart",
+    fresh_seconds=CACHE_EXPIRATION_HOURS * 3600,
+    max_stale_seconds=settings.STALE_MAX_AGE_SECONDS,
+)
 
 
 # Canonical coin priority map for duplicate symbols
@@ -128,8 +122,12 @@ def _convert_ohlc_to_candles(ohlc_data):
 
 # /charts/available-coins
 @router.get("/available-coins")
-def get_available_coins():
+def get_available_coins(request: Request, response: Response):
     """Return a deduplicated list of coins for dropdown."""
+    not_modified = conditional.check(request, response, [freshness.CATALOG])
+    if not_modified is not None:
+        return not_modified
+
     db = SessionLocal()
     try:
         coins = db.query(models.Coin).all()
@@ -157,50 +155,60 @@ def get_available_coins():
     return result
 
 
-def _fetch_chart_data_with_cache(coin_id: str, days: int):
+def _load_chart_data(coin_id: str, days: int):
     """
-    Fetch chart data from CoinGecko API with caching and fallback logic.
+    Fetch chart data from CoinGecko, falling back to OHLC.
     Returns tuple of (raw_data, is_market_chart).
     """
-    api_key = settings.COINGECKO_API_KEY
-    if api_key:
-        cg = CoinGeckoAPI(demo_api_key=api_key)
-        logger.info(f"Fetching chart for {coin_id}, {days} days (Using API key)")
-    else:
-        cg = CoinGeckoAPI()
-        logger.info(f"Fetching chart for {coin_id}, {days} days (No API key)")
-
-    # Check cache first
-    cached = get_cached_ohlc(coin_id, days)
-    if cached is not None:
-        logger.info(f"Using cached chart data for {coin_id} ({days}d)")
-        is_market_chart = "prices" in cached
-        return cached, is_market_chart
-
-    # Fetch new data with fallback
     try:
-        market_data = cg.get_coin_market_chart_by_id(id=coin_id, vs_currency="usd", days=days)
-        raw_data = market_data
-        is_market_chart = True
-        set_cached_ohlc(coin_id, days, raw_data)
+        market_data = coingecko.get_coin_market_chart_by_id(
+            id=coin_id, vs_currency="usd", days=days,
+            priority=coingecko.PRIORITY_LOW, max_wait=settings.CHART_RATE_LIMIT_MAX_WAIT_SECONDS,
+        )
+        return market_data, True
+    except coingecko.CircuitOpenError:
+        # Upstream is down; a second call would fail the same way
+        raise
     except Exception as market_err:
         logger.warning(f"Market chart failed, trying OHLC: {market_err}")
-        try:
-            ohlc_data = cg.get_coin_ohlc_by_id(id=coin_id, vs_currency="usd", days=days)
-            raw_data = ohlc_data
-            is_market_chart = False
-            set_cached_ohlc(coin_id, days, raw_data)
-        except Exception as ohlc_err:
-            logger.error(f"Both APIs failed for {coin_id}: {ohlc_err}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"CoinGecko error: {str(ohlc_err)}")
+        ohlc_data = coingecko.get_coin_ohlc_by_id(
+            id=coin_id, vs_currency="usd", days=days,
+            priority=coingecko.PRIORITY_LOW, max_wait=settings.CHART_RATE_LIMIT_MAX_WAIT_SECONDS,
+        )
+        return ohlc_data, False
+
+
+def _fetch_chart_data_with_cache(coin_id: str, days: int, response: Response):
+    """
+    Fetch chart data with stale-while-revalidate caching.
+    Returns tuple of (raw_data, is_market_chart, cache_result) and sets cache headers on response.
+    """
+    logger.info(f"Fetching chart for {coin_id}, {days} days")
+    try:
+        cached = _chart_cache.get((coin_id, days), lambda: _load_chart_data(coin_id, days))
+    except coingecko.CircuitOpenError as e:
+        logger.warning(f"CoinGecko unavailable and no cached chart for {coin_id}: {e}")
+        raise HTTPException(status_code=503, detail="CoinGecko unavailable, try again shortly")
+    except Exception as e:
+        logger.error(f"Both APIs failed for {coin_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"CoinGecko error: {str(e)}")
+
+    if cached.status != MISS:
+        logger.info(f"Using {cached.status.lower()} chart data for {coin_id} ({days}d, {cached.age:.0f}s old)")
+    response.headers.update(cached.headers)
+    raw_data, is_market_chart = cached.value
+    return raw_data, is_market_chart, cached
+
 
-    return raw_data, is_market_chart
+def _cache_fields(cached: CacheResult):
+    return {"cache_status": cached.status, "data_age_seconds": int(cached.age)}
 
 
 # /charts/chart/{coin_id}
 @router.get("/chart/{coin_id}")
 def get_chart(
     coin_id: str,
+    response: Response,
     days: int = Query(30, ge=1, le=365),
     interval: str = Query("4h", description="Chart interval (UI hint only)"),
 ):
@@ -215,7 +223,7 @@ def get_chart(
         raise HTTPException(status_code=404, detail=f"Coin {coin_id} not found")
 
     # Fetch data with caching and fallback
-    raw_data, is_market_chart = _fetch_chart_data_with_cache(coin.coin_id, days)
+    raw_data, is_market_chart, cached = _fetch_chart_data_with_cache(coin.coin_id, days, response)
 
     # Convert data to candles based on format
     if is_market_chart:
@@ -237,11 +245,56 @@ def get_chart(
         "candles": candles,
         "interval": interval,
         "count": len(candles),
+        **_cache_fields(cached),
+    }
+
+
+# /charts/rollups/{coin_id}
+@router.get("/rollups/{coin_id}")
+def get_rollup_chart(
+    coin_id: str,
+    days: int = Query(7, ge=1, le=365),
+    max_points: int = Query(500, ge=10, le=5000, description="Most candles to return"),
+):
+    """
+    Return OHLC candles built from our own stored ticks, no CoinGecko call.
+    The resolution (1m, 1h or 1d) is the finest that fits max_points for the range.
+    """
+    db = SessionLocal()
+    try:
+        coin = db.query(models.Coin).filter(models.Coin.coin_id.ilike(coin_id)).first()
+        if not coin:
+            raise HTTPException(status_code=404, detail=f"Coin {coin_id} not found")
+
+        end = datetime.utcnow()
+        resolution, rows = rollups.get_candles(db, coin.coin_id, end - timedelta(days=days), end, max_points)
+    finally:
+        db.close()
+
+    candles = []
+    for row in rows:
+        timestamp_ms = int(row.bucket.replace(tzinfo=timezone.utc).timestamp() * 1000)
+        candles.append({
+            "timestamp": timestamp_ms,
+            "date": _timestamp_to_date(timestamp_ms),
+            "open": row.open,
+            "high": row.high,
+            "low": row.low,
+            "close": row.close,
+        })
+
+    return {
+        "status": "success",
+        "symbol": coin.symbol,
+        "coin_id": coin.coin_id,
+        "candles": candles,
+        "resolution": resolution,
+        "count": len(candles),
     }
 
 
 @router.get("/history/{coin_id}")
-def get_history(coin_id: str, days: int = Query(30, ge=1, le=365)):
+def get_history(coin_id: str, response: Response, days: int = Query(30, ge=1, le=365)):
     """Return OHLC history (table view)."""
     coin_id = coin_id.lower()
     db = SessionLocal()
@@ -254,7 +307,7 @@ def get_history(coin_id: str, days: int = Query(30, ge=1, le=365)):
         raise HTTPException(status_code=404, detail=f"Coin {coin_id} not found")
 
     # Fetch data with caching and fallback
-    raw_data, is_market_chart = _fetch_chart_data_with_cache(coin.coin_id, days)
+    raw_data, is_market_chart, cached = _fetch_chart_data_with_cache(coin.coin_id, days, response)
 
     # Convert data to history based on format
     if is_market_chart:
@@ -276,4 +329,5 @@ def get_history(coin_id: str, days: int = Query(30, ge=1, le=365)):
         "coin_id": coin.coin_id,
         "history": history,
         "count": len(history),
+        **_cache_fields(cached),
     }
@@ -0,0 +1,144 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from typing import Iterator, List, Optional
+from app import models
+from app.database import SessionLocal
+import csv
+import datetime
+import io
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/export", tags=["export"])
+
+# Rows fetched per round trip from the server-side cursor, and written per chunk
+CHUNK_SIZE = 5000
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _serialize(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def _naive_utc(value: datetime.datetime) -> datetime.datetime:
+    # price_points stores naive UTC timestamps
+    if value.tzinfo is not None:
+        return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _encode_chunk(rows, columns: List[str], fmt: str, header: bool) -> str:
+    if fmt == "ndjson":
+        return "".join(
+            json.dumps({column: _serialize(value) for column, value in zip(columns, row)}) + "\n"
+            for row in rows
+        )
+    out = io.StringIO()
+    writer = csv.writer(out)
+    if header:
+        writer.writerow(columns)
+    writer.writerows([_serialize(value) for value in row] for row in rows)
+    return out.getvalue()
+
+
+def _stream_rows(statement, columns: List[str], fmt: str, label: str) -> Iterator[str]:
+    """
+    Run statement through a server-side cursor and yield it encoded, one chunk
+    of CHUNK_SIZE rows at a time, so memory stays flat however long the export.
+    Owns its session: the response keeps streaming after the route has returned.
+    """
+    db = SessionLocal()
+    exported = 0
+    try:
+        result = db.execute(statement.execution_options(yield_per=CHUNK_SIZE))
+        if fmt == "csv":
+            yield _encode_chunk([], columns, fmt, header=True)
+        for rows in result.partitions():
+            yield _encode_chunk(rows, columns, fmt, header=False)
+            exported += len(rows)
+        logger.info(f"Exported {exported} {label} rows as {fmt}")
+    except Exception as e:
+        # Headers are already sent, so the client sees a truncated body
+        logger.error(f"Export of {label} failed after {exported} rows: {e}", exc_info=True)
+        raise
+    finally:
+        db.close()
+
+
+def _response(statement, columns: List[str], fmt: str, label: str) -> StreamingResponse:
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(FORMATS)}")
+    filename = f"{label}_{datetime.datetime.utcnow():%Y%m%d_%H%M%S}.{fmt}"
+    return StreamingResponse(
+        _stream_rows(statement, columns, fmt, label),
+        media_type=FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/prices")
+def export_prices(
+    symbol: Optional[str] = Query(None, description="Only this symbol"),
+    coin_id: Optional[str] = Query(None, description="Only this coin id"),
+    after: Optional[datetime.datetime] = Query(None, description="Only ticks observed after this time"),
+    before: Optional[datetime.datetime] = Query(None, description="Only ticks observed before this time"),
+    format: str = Query("ndjson", description="ndjson or csv"),
+):
+    """
+    Streams stored price ticks oldest first.
+    """
+    table = models.PricePoint
+    columns = ["coin_id", "symbol", "price", "timestamp"]
+    statement = select(table.coin_id, table.symbol, table.price, table.timestamp)
+    if symbol:
+        statement = statement.where(table.symbol == symbol.upper())
+    if coin_id:
+        statement = statement.where(table.coin_id == coin_id)
+    if after is not None:
+        statement = statement.where(table.timestamp > _naive_utc(after))
+    if before is not None:
+        statement = statement.where(table.timestamp < _naive_utc(before))
+    statement = statement.order_by(table.timestamp, table.id)
+
+    logger.info(f"Exporting price_points (symbol={symbol}, coin_id={coin_id}) as {format}")
+    return _response(statement, columns, format, "price_points")
+
+
+@router.get("/coin-history")
+def export_coin_history(
+    coin_id: Optional[str] = Query(None, description="Only this coin id"),
+    symbol: Optional[str] = Query(None, description="Only this symbol"),
+    since: Optional[datetime.date] = Query(None, description="First day to include"),
+    until: Optional[datetime.date] = Query(None, description="Last day to include"),
+    format: str = Query("ndjson", description="ndjson or csv"),
+):
+    """
+    Streams stored daily OHLC history, by coin then day.
+    """
+    table = models.CoinHistory
+    columns = ["coin_id", "symbol", "date", "timestamp", "open", "high", "low", "close"]
+    statement = select(
+        table.coin_id, table.symbol, table.date, table.timestamp,
+        table.open, table.high, table.low, table.close,
+    )
+    if coin_id:
+        statement = statement.where(table.coin_id == coin_id)
+    if symbol:
+        statement = statement.where(func.upper(table.symbol) == symbol.upper())
+    # date is stored as YYYY-MM-DD, so string order is date order
+    if since is not None:
+        statement = statement.where(table.date >= since.isoformat())
+    if until is not None:
+        statement = statement.where(table.date <= until.isoformat())
+    statement = statement.order_by(table.coin_id, table.date)
+
+    logger.info(f"Exporting coin_history (coin_id={coin_id}, symbol={symbol}) as {format}")
+    return _response(statement, columns, format, "coin_history")
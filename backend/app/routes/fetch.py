@@ -1,15 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from app import dependencies
 from app.database import SessionLocal
 from app.models import PricePoint, WatchlistItem, Coin
-import httpx
-import requests
 import datetime
 import sys
 import os
 from app.tasks.fetch_and_store_prices import fetch_and_store_prices
 from app.worker.celery_app import celery_app
+from app.services.ingestion_pipeline import run_price_ingestion
+from app.services import poll_scheduler, subscriptions
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -28,6 +28,7 @@ router = APIRouter(prefix="/fetch", tags=["fetch"])
 
 @router.get("/", status_code=200)
 def refresh_prices(
+    dry_run: bool = Query(False, description="Fetch and validate without writing to the database"),
     db: Session = Depends(dependencies.get_db)
     ):
 
@@ -35,23 +36,16 @@ def refresh_prices(
     """
     Fetch live prices from CoinGecko for all watchlist coins.
     Stores prices in price_points table for persistence.
-    Returns stored prices immediately.
+    Returns the fetched ticks, how many were stored as new rows, and per-stage
+    pipeline counters.
     """
     try:
         logger.info("REFRESH PRICES STARTED")
         
-        # Get all unique coin_ids from watchlist
-        watchlist_coins = (
-            db.query(WatchlistItem.coin_id, WatchlistItem.symbol)
-            .distinct(WatchlistItem.coin_id)
-            .filter(WatchlistItem.coin_id.isnot(None))
-            .all()
-        )
-        
-        logger.info(f"DEBUG: watchlist_coins query returned {len(watchlist_coins)} results")
-        logger.info(f"DEBUG: watchlist_coins = {watchlist_coins}")
+        # Watched coins from the subscription set kept by the watchlist routes
+        symbol_map = subscriptions.active_coins(db)
         
-        if not watchlist_coins:
+        if not symbol_map:
             logger.warning("No coins in watchlist")
             return {
                 "status": "success",
@@ -60,106 +54,49 @@ def refresh_prices(
                 "count": 0
             }
         
-        coin_ids = [c[0] for c in watchlist_coins]
-        symbol_map = {c[0]: c[1] for c in watchlist_coins}
+        coin_ids = list(symbol_map)
         
-        logger.info(f"DEBUG: Extracted coin_ids = {coin_ids}")
-        logger.info(f"DEBUG: symbol_map = {symbol_map}")
+        logger.debug(f"Coins to fetch: {symbol_map}")
         logger.info(f"Fetching prices for {len(coin_ids)} coins")
         
-        # Fetch live prices from CoinGecko in batches using httpx directly
-        batch_size = 10
-        all_prices = {}
-        
-        for i in range(0, len(coin_ids), batch_size):
-            batch = coin_ids[i:i + batch_size]
-            ids_str = ",".join(batch)
-            
-            logger.info(f"Batch coin_ids: {batch}")
-            logger.info(f"Batch ids_str: {ids_str}")
-            
-            try:
-                url = f"{settings.COINGECKO_PRICE_URL}?ids={ids_str}&vs_currencies=usd"
-                headers = {"x-cg-demo-api-key": settings.COINGECKO_API_KEY}
-
-                logger.info(f"DEBUG: Full URL = {url}")
-                logger.info(f"DEBUG: Sending request to CoinGecko...")
-
-                response = requests.get(url, headers=headers)
-
-                # response = httpx.get(url, timeout=30.0)
-                logger.info(f"DEBUG: HTTP Status = {response.status_code}")
-                
-                batch_data = response.json()
-                logger.info(f"DEBUG: Raw JSON response = {batch_data}")
-
-                
-                all_prices.update(batch_data)
-                logger.info(f"DEBUG: Total prices collected so far = {len(all_prices)}")
-                
-            except Exception as e:
-                logger.error(f"Error fetching batch {i//batch_size}: {e}", exc_info=True)
-                continue
-        
-
-        logger.info(f"DEBUG: all_prices (final) = {all_prices}")
-        logger.info(f"DEBUG: Total prices collected = {len(all_prices)}")
+        # Run the shared ingestion pipeline; fetched ticks are collected for the response,
+        # including ones already stored
+        summary, ticks = run_price_ingestion(coin_ids, symbol_map, dry_run=dry_run, collect=True)
         
-        if not all_prices:
+        if not ticks:
             logger.error("CRITICAL: No prices received from CoinGecko!")
             return {
                 "status": "error",
                 "message": "No prices received from CoinGecko - check logs",
                 "coins": [],
-                "count": 0
+                "count": 0,
+                "pipeline": summary
             }
         
-        # Store prices in database and prepare response
-        timestamp = datetime.datetime.utcnow()
-        stored_prices = []
-        
-        logger.info(f"\nProcessing prices for database storage...")
-        for coin_id, price_data in all_prices.items():
-            logger.info(f"Processing {coin_id}: {price_data}")
-            
-            if isinstance(price_data, dict) and "usd" in price_data:
-                symbol = symbol_map.get(coin_id, coin_id.upper())
-                price_raw = price_data["usd"]
-                price = float(price_raw)
-                
-                logger.info(f"✓ {symbol} ({coin_id}): {price_raw} → {price}")
-                
-                # Add to database
-                price_point = PricePoint(
-                    symbol=symbol,
-                    price=price,
-                    timestamp=timestamp
-                )
-                db.add(price_point)
-                
-                stored_prices.append({
-                    "symbol": symbol,
-                    "price": price,
-                    "coin_id": coin_id,
-                    "timestamp": timestamp.isoformat()
-                })
-            else:
-                logger.warning(f"✗ No USD price for {coin_id}: {price_data}")
-        
-        db.commit()
+        fetched_prices = [
+            {
+                "symbol": row["symbol"],
+                "price": row["price"],
+                "coin_id": row["coin_id"],
+                "timestamp": row["timestamp"].isoformat()
+            }
+            for row in ticks
+        ]
         
         logger.info(f"\n{'=' * 60}")
         logger.info(f"REFRESH PRICES COMPLETED")
         logger.info(f"{'=' * 60}")
-        logger.info(f"✓ Stored {len(stored_prices)} prices in database")
-        logger.info(f"Timestamp: {timestamp}")
+        logger.info(f"✓ Stored {summary['rows_written']} new prices in database{' (dry run)' if dry_run else ''}, {summary['unchanged']} unchanged")
+        logger.info(f"Timestamp: {summary['timestamp']}")
         
         return {
             "status": "success",
-            "message": f"Prices updated for {len(stored_prices)} coins",
-            "coins": stored_prices,
-            "count": len(stored_prices),
-            "timestamp": timestamp.isoformat()
+            "message": f"Fetched {len(fetched_prices)} prices, {summary['rows_written']} stored as new",
+            "coins": fetched_prices,
+            "count": len(fetched_prices),
+            "rows_written": summary["rows_written"],
+            "timestamp": summary["timestamp"],
+            "pipeline": summary
         }
         
     except Exception as e:
@@ -168,4 +105,16 @@ def refresh_prices(
         raise HTTPException(
             status_code=500,
             detail=f"Error refreshing prices: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/schedule", status_code=200)
+def get_poll_schedule(
+    refresh: bool = Query(False, description="Recompute instead of using the cached assignments"),
+    db: Session = Depends(dependencies.get_db)
+    ):
+    """
+    Current polling tier assignments: refresh period, slot, watcher count and
+    recent volatility for every watched coin, plus the upstream call estimate.
+    """
+    return poll_scheduler.get_assignments(db, refresh=refresh)
@@ -1,19 +1,28 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from sqlalchemy.orm import Session
 from app import dependencies
 from app.database import SessionLocal
 from app.models import Top100, TopGainerLoser, TrendingCoin, User
-from pycoingecko import CoinGeckoAPI
+from app.config import settings
+from app.services import coingecko, conditional, freshness
+from app.services.swr_cache import SWRCache
 import logging
 import time
 from typing import Dict, Any, List
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/market", tags=["market"])
-cg = CoinGeckoAPI()
+
+# Last good top-100 prices; served with their age while CoinGecko is slow or down
+_prices_cache = SWRCache(
+    "market prices",
+    fresh_seconds=settings.MARKET_PRICES_FRESH_SECONDS,
+    max_stale_seconds=settings.STALE_MAX_AGE_SECONDS,
+    max_entries=16,
+)
 
 @router.get("/prices")
-def get_top100_simple_prices() -> Dict[str, Dict[str, Any]]:
+def get_top100_simple_prices(response: Response) -> Dict[str, Dict[str, Any]]:
     db = SessionLocal()
     try:
         coins = db.query(Top100).all()
@@ -22,13 +31,20 @@ def get_top100_simple_prices() -> Dict[str, Dict[str, Any]]:
 
         ids_csv = ",".join(c.coin_id for c in coins)
         try:
-            data = cg.get_price(ids=ids_csv, vs_currencies="usd") or {}
+            cached = _prices_cache.get(ids_csv, lambda: coingecko.get_price(ids_csv, vs_currencies="usd") or {})
+        except coingecko.CircuitOpenError as e:
+            logger.warning(f"CoinGecko unavailable and no cached prices: {e}")
+            raise HTTPException(status_code=503, detail="CoinGecko unavailable, try again shortly")
         except Exception as e:
             logger.error(f"CoinGecko API error: {e}", exc_info=True)
             raise HTTPException(status_code=502, detail="CoinGecko API request failed")
 
+        response.headers.update(cached.headers)
+        data = cached.value
         return {c.coin_id: data.get(c.coin_id, {}) for c in coins}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Error fetching market prices")
         raise HTTPException(status_code=500, detail="Server error fetching market prices")
@@ -37,10 +53,13 @@ def get_top100_simple_prices() -> Dict[str, Dict[str, Any]]:
 
 
 @router.get("/trending")
-def get_trending_coins(db: Session = Depends(dependencies.get_db)):
+def get_trending_coins(request: Request, response: Response, db: Session = Depends(dependencies.get_db)):
     """
     Get trending coins from database (updated hourly by celery task)
     """
+    not_modified = conditional.check(request, response, [freshness.TRENDING])
+    if not_modified is not None:
+        return not_modified
     try:
         trending = db.query(TrendingCoin).order_by(TrendingCoin.rank).limit(15).all()
         
@@ -66,10 +85,13 @@ def get_trending_coins(db: Session = Depends(dependencies.get_db)):
 
 
 @router.get("/top-gainers-losers")
-def get_top_gainers_losers(db: Session = Depends(dependencies.get_db)):
+def get_top_gainers_losers(request: Request, response: Response, db: Session = Depends(dependencies.get_db)):
     """
     Get top gainers and losers from database (updated hourly by celery task)
     """
+    not_modified = conditional.check(request, response, [freshness.GAINERS_LOSERS])
+    if not_modified is not None:
+        return not_modified
     try:
         # Get top gainers (ordered by price change descending)
         gainers = (
@@ -1,97 +1,302 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from app import models, schemas, dependencies
+from app.config import settings
+from app.database import SessionLocal
+from app.services import conditional, freshness, poll_scheduler, price_cache, price_stream, subscriptions, tick_buffer
+import asyncio
+import base64
+import datetime
 import logging
-from sqlalchemy import func
-from app.worker.celery_app import celery_app
 import time
+from sqlalchemy import text, tuple_
+from app.worker.celery_app import celery_app
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/prices", tags=["prices"])
 
 # manually refresh from user
-# trigger fetch celery task to update prices and query database for latest prices
+# trigger fetch celery task to update prices and return what is stored right away
+
+def _load_latest_prices() -> List[Dict[str, Any]]:
+    """Current price of each watched coin, from the shared price cache first."""
+    db = SessionLocal()
+    try:
+        coin_ids = list(subscriptions.active_coins(db))
+        if not coin_ids:
+            logger.info("No coins in watchlist")
+            return []
+
+        return sorted(price_cache.get_latest(db, coin_ids), key=lambda p: p["symbol"])
+    finally:
+        db.close()
+
+
+_last_refresh_at = 0.0
+
+
+def _trigger_refresh() -> bool:
+    """
+    Queue a refresh of the watched coins that are overdue for their tier.
+    The task spends only the spare poll budget, see refresh_stale_prices.
+    """
+    global _last_refresh_at
+    if time.monotonic() - _last_refresh_at < poll_scheduler.REFRESH_INTERVAL_SECONDS:
+        return False
+    _last_refresh_at = time.monotonic()
+    try:
+        celery_app.send_task('app.tasks.refresh_stale_prices')
+        return True
+    except Exception as e:
+        logger.error(f"Could not queue price refresh: {e}")
+        return False
+
 
 @router.get("/", response_model=List[schemas.PricePointOut])
 @router.get("", response_model=List[schemas.PricePointOut])  # Handle both with/without trailing slash
-def get_latest_prices(db: Session = Depends(dependencies.get_db)):
+async def get_latest_prices(
+    request: Request,
+    response: Response,
+    refresh: bool = Query(False, description="Queue a refresh of coins overdue for their polling tier"),
+    wait: float = Query(
+        0, ge=0, le=settings.PRICES_MAX_WAIT_SECONDS,
+        description="Seconds to wait for the refresh to store new prices before answering",
+    ),
+):
     """
-    Returns current prices for all watched coins from database.
-    Fetches latest price point for each symbol in watchlist.
+    Returns current prices for all watched coins from database, immediately by default.
+    With wait > 0, answers as soon as new prices are stored or the wait runs out.
+    X-Data-As-Of tells when stored prices last changed. Answers 304 when the
+    client's ETag or Last-Modified is still current.
     """
     try:
         logger.info("Fetch called by user")
-        success =  celery_app.send_task('app.tasks.fetch_and_store_prices')
-        time.sleep(2)
-        logger.info("Celery task result: ", success)
-        # Get all unique symbols from watchlist
-        watchlist_symbols = (
-            db.query(models.WatchlistItem.symbol)
-            .distinct()
-            .filter(models.WatchlistItem.symbol.isnot(None))
-            .all()
+        as_of = await asyncio.to_thread(freshness.get, freshness.PRICES)
+        if refresh:
+            await asyncio.to_thread(_trigger_refresh)
+        if refresh and wait:
+            changed = await freshness.wait_for_change(freshness.PRICES, as_of, timeout=wait)
+            if changed is None:
+                logger.info(f"No new prices within {wait}s, returning stored prices")
+            else:
+                as_of = changed
+
+        not_modified = await asyncio.to_thread(
+            conditional.check, request, response, [freshness.PRICES, freshness.WATCHLISTS]
         )
-        
-        if not watchlist_symbols:
-            logger.info("No coins in watchlist")
+        if not_modified is not None:
+            return not_modified
+
+        latest_prices = await asyncio.to_thread(_load_latest_prices)
+        if not latest_prices:
+            logger.warning("No prices in database for watchlist symbols")
             return []
-        
-        symbols = [s[0] for s in watchlist_symbols]
-        logger.info(f"Watchlist has {len(symbols)} unique symbols: {symbols}")
-        
-        # Get the latest price for each symbol from db
-        if success:
-            subquery = (
-                db.query(
-                    models.PricePoint.symbol,
-                    func.max(models.PricePoint.id).label("max_id")
-                )
-                .filter(models.PricePoint.symbol.in_(symbols))
-                .group_by(models.PricePoint.symbol)
-                .subquery()
-            )
-            
-            latest_prices = (
-                db.query(models.PricePoint)
-                .join(
-                    subquery,
-                    (models.PricePoint.symbol == subquery.c.symbol) &
-                    (models.PricePoint.id == subquery.c.max_id)
-                )
-                .all()
-            )
-            
-            if not latest_prices:
-                logger.warning("No prices in database for watchlist symbols")
-                return []
-            
-            logger.info(f"Returning {len(latest_prices)} prices from database")
-            return latest_prices
-        
+
+        if as_of is None:
+            as_of = max(p["timestamp"] for p in latest_prices).replace(tzinfo=datetime.timezone.utc).timestamp()
+        response.headers["X-Data-As-Of"] = datetime.datetime.fromtimestamp(as_of, datetime.timezone.utc).isoformat()
+
+        logger.info(f"Returning {len(latest_prices)} prices from database")
+        return latest_prices
+
     except Exception as e:
         logger.error(f"Error in get_latest_prices: {e}", exc_info=True)
-        # Return empty list instead of 500 error
-        return []
+        # Not an empty 200: that would be cached under the validators already set
+        raise HTTPException(status_code=500, detail="Server error loading prices")
+
+def _naive_utc(value: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    # price_points stores naive UTC timestamps
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _encode_cursor(point: models.PricePoint) -> str:
+    raw = f"{point.timestamp.isoformat()}|{point.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    try:
+        timestamp, point_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.datetime.fromisoformat(timestamp), int(point_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/sparklines")
+def get_sparklines(
+    coin_ids: Optional[str] = Query(None, description="Comma-separated coin ids, defaults to all watched coins"),
+    hours: float = Query(24, gt=0, le=settings.TICK_BUFFER_HOURS, description="Window to cover"),
+    points: int = Query(48, ge=2, le=500, description="Most points per series"),
+    db: Session = Depends(dependencies.get_db)
+):
+    """
+    Recent price series and change over the window for each coin, answered from
+    the in-memory tick buffer. Coins without ticks in the window are left out.
+    Answers 503 until the buffer has finished loading at startup.
+    """
+    if not tick_buffer.buffer.ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Sparklines are still loading, try again shortly",
+            headers={"Retry-After": str(tick_buffer.CATCH_UP_INTERVAL_SECONDS)},
+        )
+    try:
+        ids = [c.strip() for c in coin_ids.split(",") if c.strip()] if coin_ids else sorted(subscriptions.active_coins(db))
+        tick_buffer.buffer.catch_up(db)
+
+        series = {}
+        for coin_id in ids:
+            line = tick_buffer.sparkline(coin_id, hours, points)
+            if line is not None:
+                series[coin_id] = line
+        logger.info(f"Returning sparklines for {len(series)}/{len(ids)} coins over {hours}h")
+        return series
+
+    except Exception as e:
+        logger.error(f"Error in get_sparklines: {e}", exc_info=True)
+        return {}
+
+
+STREAM_KEEPALIVE_SECONDS = 15
+
+
+@router.get("/stream")
+async def stream_prices(
+    request: Request,
+    coin_ids: Optional[str] = Query(None, description="Comma-separated coin ids, defaults to all coins"),
+):
+    """
+    Server-Sent Events: a `ticks` event with the new prices of the requested
+    coins each time ingestion stores some, and a keepalive comment when idle.
+    """
+    ids = [c.strip() for c in coin_ids.split(",") if c.strip()] if coin_ids else []
+
+    async def events():
+        subscription = price_stream.hub.subscribe(ids)
+        logger.info(f"Price stream opened for {len(ids) or 'all'} coins, {price_stream.hub.subscriber_count} open")
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                ticks = await subscription.next(timeout=STREAM_KEEPALIVE_SECONDS)
+                yield price_stream.stream_event(ticks) if ticks else price_stream.keepalive_event()
+        finally:
+            price_stream.hub.unsubscribe(subscription)
+            logger.info(f"Price stream closed, {price_stream.hub.subscriber_count} open")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+BATCH_MAX_KEYS = 100
+
+# One index range scan per key: ix_price_points_symbol_timestamp for symbols,
+# uix_price_coin_observed for coin_ids
+_BATCH_SQL = """
+SELECT k.key, p.symbol, p.price, p.timestamp
+FROM unnest(CAST(:keys AS varchar[])) WITH ORDINALITY AS k(key, position)
+CROSS JOIN LATERAL (
+    SELECT symbol, price, timestamp
+    FROM price_points
+    WHERE {column} = k.key{range}
+    ORDER BY timestamp DESC{tiebreak}
+    LIMIT :limit
+) p
+ORDER BY k.position, p.timestamp DESC
+"""
+
+
+@router.get("/batch", response_model=Dict[str, List[schemas.PricePointOut]])
+def get_price_history_batch(
+    symbols: Optional[str] = Query(None, description="Comma-separated symbols"),
+    coin_ids: Optional[str] = Query(None, description="Comma-separated coin ids, instead of symbols"),
+    limit: int = Query(100, ge=1, le=1000, description="Limit number of records per series"),
+    before: Optional[datetime.datetime] = Query(None, description="Only ticks observed before this time"),
+    after: Optional[datetime.datetime] = Query(None, description="Only ticks observed after this time"),
+    db: Session = Depends(dependencies.get_db)
+):
+    """
+    Price history for several symbols (or coin ids) in one query, newest first,
+    keyed by the requested symbol or coin id.
+    """
+    if bool(symbols) == bool(coin_ids):
+        raise HTTPException(status_code=400, detail="Pass either symbols or coin_ids")
+    if symbols:
+        column, tiebreak = "symbol", ", id DESC"
+        keys = list(dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip()))
+    else:
+        column, tiebreak = "coin_id", ""
+        keys = list(dict.fromkeys(c.strip() for c in coin_ids.split(",") if c.strip()))
+    if len(keys) > BATCH_MAX_KEYS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_KEYS} series per request")
+
+    try:
+        params: Dict[str, Any] = {"keys": keys, "limit": limit}
+        conditions = ""
+        if before is not None:
+            conditions += " AND timestamp < :before"
+            params["before"] = _naive_utc(before)
+        if after is not None:
+            conditions += " AND timestamp > :after"
+            params["after"] = _naive_utc(after)
+
+        sql = _BATCH_SQL.format(column=column, range=conditions, tiebreak=tiebreak)
+        series: Dict[str, List[Dict[str, Any]]] = {key: [] for key in keys}
+        for key, symbol, price, timestamp in db.execute(text(sql), params):
+            series[key].append({"symbol": symbol, "price": price, "timestamp": timestamp})
+
+        logger.info(f"Returning batch history for {len(keys)} {column}s, {sum(map(len, series.values()))} ticks")
+        return series
+
+    except Exception as e:
+        logger.error(f"Error in get_price_history_batch: {e}", exc_info=True)
+        return {}
+
 
 @router.get("/{symbol}", response_model=List[schemas.PricePointOut])
 def get_price_history(
     symbol: str,
-    limit: Optional[int] = Query(100, description="Limit number of records"),
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000, description="Limit number of records"),
+    before: Optional[datetime.datetime] = Query(None, description="Only ticks observed before this time"),
+    after: Optional[datetime.datetime] = Query(None, description="Only ticks observed after this time"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
     db: Session = Depends(dependencies.get_db)
 ):
     """
-    Returns price history for a symbol from database.
+    Returns price history for a symbol from database, newest first.
+    Pages by keyset on (timestamp, id): pass the X-Next-Cursor header of a full
+    page as cursor to get the next, older page.
     """
+    not_modified = conditional.check(request, response, [freshness.PRICES])
+    if not_modified is not None:
+        return not_modified
     try:
         symbol = symbol.upper()
+        before, after = _naive_utc(before), _naive_utc(after)
         
         logger.info(f"Getting price history for {symbol}, limit {limit}")
         
+        # Served by ix_price_points_symbol_timestamp as an index range scan
+        query = db.query(models.PricePoint).filter(models.PricePoint.symbol == symbol)
+        if before is not None:
+            query = query.filter(models.PricePoint.timestamp < before)
+        if after is not None:
+            query = query.filter(models.PricePoint.timestamp > after)
+        if cursor:
+            query = query.filter(
+                tuple_(models.PricePoint.timestamp, models.PricePoint.id) < tuple_(*_decode_cursor(cursor))
+            )
         prices = (
-            db.query(models.PricePoint)
-            .filter(models.PricePoint.symbol == symbol)
-            .order_by(models.PricePoint.timestamp.desc())
+            query
+            .order_by(models.PricePoint.timestamp.desc(), models.PricePoint.id.desc())
             .limit(limit)
             .all()
         )
@@ -100,9 +305,13 @@ def get_price_history(
             logger.info(f"No price history for {symbol}")
             return []
         
+        if len(prices) == limit:
+            response.headers["X-Next-Cursor"] = _encode_cursor(prices[-1])
         logger.info(f"Returning {len(prices)} historical prices for {symbol}")
         return prices
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in get_price_history: {e}", exc_info=True)
-        return []
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Server error loading price history")
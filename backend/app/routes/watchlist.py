@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
 from app import models, schemas, dependencies
+from app.services import freshness, subscriptions
 import logging
 
 logger = logging.getLogger(__name__)
@@ -62,7 +63,9 @@ def add_item(
         order=max_order
     )
     db.add(new_item)
+    subscriptions.subscribe(db, coin.coin_id, coin.symbol)
     db.commit()
+    freshness.mark(freshness.WATCHLISTS)
     db.refresh(new_item)
     logger.info(f"Successfully added {coin.symbol} ({coin.coin_id}) to watchlist for user {user.id}")
     return new_item
@@ -97,7 +100,10 @@ def remove_item(
     
     logger.info(f"Removing {item.symbol} ({item.coin_id}) from watchlist for user {user.id}")
     db.delete(item)
+    if item.coin_id:
+        subscriptions.unsubscribe(db, item.coin_id)
     db.commit()
+    freshness.mark(freshness.WATCHLISTS)
     return None
 
 
@@ -0,0 +1,128 @@
+"""
+Request planner for CoinGecko /simple/price.
+
+Packs as many coin ids into each call as the URL-length and ids-per-call
+limits allow. When CoinGecko rejects a batch as too large (414, or a 400 whose
+body says the URL is too long) the planner lowers its limits so later plans
+stay under the size that actually works. After PROBE_AFTER_SUCCESSES good
+multi-id calls it probes back up towards the configured limits, halfway to the
+last rejected size, so one bad spell does not shrink batches for good.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote, urlencode
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 414 always means the URL was too long; a 400 only when its body says so
+OVERSIZE_STATUS_CODE = 414
+OVERSIZE_400_MARKERS = ("too long", "too large")
+
+# Successful multi-id calls before limits are raised again
+PROBE_AFTER_SUCCESSES = 20
+
+# How long a rejected size caps the probes
+REJECTION_MEMORY_SECONDS = 3600
+
+# Encoded length of the "," between ids ("%2C")
+SEPARATOR_LENGTH = 3
+
+
+def _encoded_length(coin_id: str) -> int:
+    return len(quote(coin_id, safe=""))
+
+
+def is_oversize(status_code: Optional[int], body: str = "") -> bool:
+    """Whether an error response means the request was too large, not otherwise bad."""
+    if status_code == OVERSIZE_STATUS_CODE:
+        return True
+    if status_code == 400:
+        body = body.lower()
+        return any(marker in body for marker in OVERSIZE_400_MARKERS)
+    return False
+
+
+class BatchPlanner:
+    """Splits coin ids into the fewest /simple/price calls that fit the limits."""
+
+    def __init__(self, max_url_length: Optional[int] = None, max_ids: Optional[int] = None):
+        self.max_url_length = self.url_length_ceiling = max_url_length or settings.COINGECKO_MAX_URL_LENGTH
+        self.max_ids = self.ids_ceiling = max_ids or settings.COINGECKO_MAX_IDS_PER_CALL
+        self._rejected_length: Optional[int] = None
+        self._rejected_ids: Optional[int] = None
+        self._rejected_at = 0.0
+        self._successes = 0
+        self._lock = threading.Lock()
+
+    def base_length(self, url: str, params: Optional[Dict[str, Any]] = None) -> int:
+        """Length of the request URL with an empty ids parameter."""
+        query = urlencode({**(params or {}), "ids": ""})
+        return len(url) + 1 + len(query)
+
+    def url_length(self, url: str, coin_ids: List[str], params: Optional[Dict[str, Any]] = None) -> int:
+        ids_length = sum(_encoded_length(c) for c in coin_ids) + SEPARATOR_LENGTH * max(len(coin_ids) - 1, 0)
+        return self.base_length(url, params) + ids_length
+
+    def plan(self, coin_ids: List[str], url: str, params: Optional[Dict[str, Any]] = None) -> List[List[str]]:
+        """Greedily pack coin_ids into batches under the current limits."""
+        budget = self.max_url_length - self.base_length(url, params)
+        batches: List[List[str]] = []
+        batch: List[str] = []
+        used = 0
+
+        for coin_id in coin_ids:
+            cost = _encoded_length(coin_id) + (SEPARATOR_LENGTH if batch else 0)
+            if batch and (used + cost > budget or len(batch) >= self.max_ids):
+                batches.append(batch)
+                batch, used = [], 0
+                cost = _encoded_length(coin_id)
+            batch.append(coin_id)
+            used += cost
+
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def record_rejection(self, url: str, coin_ids: List[str], params: Optional[Dict[str, Any]] = None):
+        """Lower the limits after CoinGecko rejected this batch as too large."""
+        if len(coin_ids) <= 1:
+            return
+        rejected_length = self.url_length(url, coin_ids, params)
+        with self._lock:
+            self.max_ids = min(self.max_ids, max(1, len(coin_ids) // 2))
+            self.max_url_length = min(self.max_url_length, rejected_length - 1)
+            self._rejected_length = rejected_length
+            self._rejected_ids = len(coin_ids)
+            self._rejected_at = time.monotonic()
+            self._successes = 0
+        logger.warning(
+            f"Batch of {len(coin_ids)} ids ({rejected_length} chars) rejected, "
+            f"limits now {self.max_ids} ids / {self.max_url_length} chars"
+        )
+
+    def record_success(self, coin_ids: List[str]):
+        """Count a good multi-id call; raise lowered limits again after enough of them."""
+        if len(coin_ids) <= 1:
+            return
+        with self._lock:
+            if self.max_url_length >= self.url_length_ceiling and self.max_ids >= self.ids_ceiling:
+                return
+            self._successes += 1
+            if self._successes < PROBE_AFTER_SUCCESSES:
+                return
+            self._successes = 0
+
+            url_bound, ids_bound = self.url_length_ceiling, self.ids_ceiling
+            if time.monotonic() - self._rejected_at < REJECTION_MEMORY_SECONDS:
+                url_bound = min(url_bound, self._rejected_length - 1)
+                ids_bound = min(ids_bound, self._rejected_ids - 1)
+            else:
+                self._rejected_length = self._rejected_ids = None
+            self.max_url_length = max(self.max_url_length, (self.max_url_length + url_bound + 1) // 2)
+            self.max_ids = max(self.max_ids, (self.max_ids + ids_bound + 1) // 2)
+        logger.info(f"Probing larger batches: limits now {self.max_ids} ids / {self.max_url_length} chars")
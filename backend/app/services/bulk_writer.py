@@ -0,0 +1,196 @@
+"""
+Bulk write path for price ticks.
+
+Writes a whole tick set in one round trip instead of one ORM object per coin:
+PostgreSQL COPY when available, otherwise a single executemany INSERT.
+Ticks are keyed on (coin_id, timestamp); rows for an observation that is
+already stored are skipped, so re-runs and overlapping refreshes are free.
+The same transaction moves current_prices forward to the newest tick per coin.
+The caller owns the transaction and commits.
+"""
+
+import csv
+import io
+import logging
+import time
+from typing import Any, Dict, List, Set, Tuple
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import CurrentPrice, PricePoint
+
+logger = logging.getLogger(__name__)
+
+PRICE_POINT_COLUMNS = ("coin_id", "symbol", "price", "timestamp")
+
+# Per-connection staging table for COPY; emptied at every commit
+_STAGE_TABLE = "price_points_stage"
+
+# (coin_id, timestamp) of a stored observation
+TickKey = Tuple[str, Any]
+
+
+def _copy_rows(db: Session, table: str, columns: tuple, rows: List[Dict[str, Any]]):
+    """Stream rows into `table` with COPY ... FROM STDIN on the session's connection."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[c] for c in columns])
+    buffer.seek(0)
+
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def _copy_price_points(db: Session, rows: List[Dict[str, Any]]) -> Set[TickKey]:
+    """COPY into a temp staging table, then move new observations across. Returns their keys."""
+    columns = ", ".join(PRICE_POINT_COLUMNS)
+    db.execute(text(
+        f"CREATE TEMP TABLE IF NOT EXISTS {_STAGE_TABLE} "
+        "(coin_id VARCHAR, symbol VARCHAR, price DOUBLE PRECISION, timestamp TIMESTAMP) "
+        "ON COMMIT DELETE ROWS"
+    ))
+    _copy_rows(db, _STAGE_TABLE, PRICE_POINT_COLUMNS, rows)
+    result = db.execute(text(
+        f"INSERT INTO {PricePoint.__tablename__} ({columns}) "
+        f"SELECT {columns} FROM {_STAGE_TABLE} "
+        "ON CONFLICT (coin_id, timestamp) DO NOTHING "
+        "RETURNING coin_id, timestamp"
+    ))
+    inserted = {(coin_id, timestamp) for coin_id, timestamp in result}
+    db.execute(text(f"TRUNCATE {_STAGE_TABLE}"))
+    return inserted
+
+
+def _insert_price_points(db: Session, rows: List[Dict[str, Any]]) -> Set[TickKey]:
+    """executemany INSERT, skipping conflicts where the dialect supports it. Returns the new keys."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        db.execute(insert(PricePoint), rows)
+        return {(row["coin_id"], row["timestamp"]) for row in rows}
+
+    stmt = (
+        dialect_insert(PricePoint)
+        .on_conflict_do_nothing(index_elements=["coin_id", "timestamp"])
+        .returning(PricePoint.coin_id, PricePoint.timestamp)
+    )
+    return {(coin_id, timestamp) for coin_id, timestamp in db.execute(stmt, rows)}
+
+
+def upsert_current_prices(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """
+    Move current_prices to the newest tick per coin in rows.
+    A row never replaces a newer observation, so out-of-order batches are safe.
+    """
+    newest: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        seen = newest.get(row["coin_id"])
+        if seen is None or row["timestamp"] > seen["timestamp"]:
+            newest[row["coin_id"]] = row
+    if not newest:
+        return 0
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        for row in newest.values():
+            db.merge(CurrentPrice(**{c: row[c] for c in PRICE_POINT_COLUMNS}))
+        return len(newest)
+
+    stmt = dialect_insert(CurrentPrice)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["coin_id"],
+        set_={c: stmt.excluded[c] for c in ("symbol", "price", "timestamp")},
+        where=CurrentPrice.timestamp < stmt.excluded.timestamp,
+    )
+    db.execute(stmt, [{c: row[c] for c in PRICE_POINT_COLUMNS} for row in newest.values()])
+    return len(newest)
+
+
+def write_price_points(db: Session, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Insert price point rows ({"coin_id", "symbol", "price", "timestamp"}) in bulk.
+    Returns rows inserted, rows skipped as already stored, the method used, the
+    elapsed time, and under "inserted" the input rows that were actually stored.
+    """
+    if not rows:
+        return {"rows": 0, "skipped": 0, "method": "none", "elapsed_ms": 0.0, "inserted": []}
+
+    start = time.perf_counter()
+    use_copy = settings.BULK_WRITE_USE_COPY and db.get_bind().dialect.name == "postgresql"
+
+    if use_copy:
+        keys = _copy_price_points(db, rows)
+        method = "copy"
+    else:
+        keys = _insert_price_points(db, rows)
+        method = "executemany"
+    upsert_current_prices(db, rows)
+    # A key repeated within rows is stored once; report its first row
+    inserted = []
+    for row in rows:
+        key = (row["coin_id"], row["timestamp"])
+        if key in keys:
+            inserted.append(row)
+            keys.discard(key)
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    skipped = len(rows) - len(inserted)
+    logger.info(f"Wrote {len(inserted)} price points via {method} in {elapsed_ms:.1f}ms ({skipped} already stored)")
+    return {
+        "rows": len(inserted),
+        "skipped": skipped,
+        "method": method,
+        "elapsed_ms": round(elapsed_ms, 2),
+        "inserted": inserted,
+    }
+
+
+def upsert_rows(
+    db: Session,
+    model,
+    rows: List[Dict[str, Any]],
+    index_elements: List[str],
+    update_columns: List[str],
+) -> int:
+    """
+    Insert rows, updating update_columns where index_elements already exist.
+    Uses ON CONFLICT on PostgreSQL and SQLite; other dialects get a plain insert.
+    """
+    if not rows:
+        return 0
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        db.execute(insert(model), rows)
+        return len(rows)
+
+    stmt = dialect_insert(model)
+    if update_columns:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={c: stmt.excluded[c] for c in update_columns},
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+    db.execute(stmt, rows)
+    return len(rows)
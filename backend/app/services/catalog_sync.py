@@ -0,0 +1,73 @@
+"""
+Diff-based sync of the Coin catalog against CoinGecko's /coins/list.
+
+Only changed rows are written (new coins, symbol changes, delistings), all in
+one transaction, so readers never see an empty or half-filled coins table.
+"""
+
+import logging
+import time
+from typing import Any, Dict, List
+
+from sqlalchemy.orm import Session
+
+from app.models import Coin
+from app.services import freshness
+from app.services.bulk_writer import upsert_rows
+
+logger = logging.getLogger(__name__)
+
+# Refuse to delist more than this share of the catalog in one run; a truncated
+# upstream response should not wipe the table.
+MAX_DELIST_FRACTION = 0.2
+
+DELETE_CHUNK_SIZE = 1000
+
+
+def sync_coin_catalog(db: Session, coin_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Bring the coins table in line with coin_list and commit.
+    Returns counts of inserted, updated, delisted and unchanged coins plus timing.
+    """
+    start = time.perf_counter()
+
+    upstream = {}
+    for coin in coin_list:
+        coin_id = coin.get("id")
+        symbol = coin.get("symbol")
+        if coin_id and symbol:
+            upstream[coin_id] = symbol.upper()
+
+    existing = dict(db.query(Coin.coin_id, Coin.symbol).all())
+
+    inserted = [{"coin_id": cid, "symbol": sym} for cid, sym in upstream.items() if cid not in existing]
+    updated = [
+        {"coin_id": cid, "symbol": sym}
+        for cid, sym in upstream.items()
+        if cid in existing and existing[cid] != sym
+    ]
+    delisted = [cid for cid in existing if cid not in upstream]
+
+    if existing and len(delisted) > len(existing) * MAX_DELIST_FRACTION:
+        logger.warning(
+            f"Upstream list would delist {len(delisted)}/{len(existing)} coins, skipping delistings"
+        )
+        delisted = []
+
+    upsert_rows(db, Coin, inserted + updated, index_elements=["coin_id"], update_columns=["symbol"])
+    for i in range(0, len(delisted), DELETE_CHUNK_SIZE):
+        chunk = delisted[i:i + DELETE_CHUNK_SIZE]
+        db.query(Coin).filter(Coin.coin_id.in_(chunk)).delete(synchronize_session=False)
+    db.commit()
+    if inserted or updated or delisted:
+        freshness.mark(freshness.CATALOG)
+
+    stats = {
+        "inserted": len(inserted),
+        "updated": len(updated),
+        "delisted": len(delisted),
+        "unchanged": len(upstream) - len(inserted) - len(updated),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+    logger.info(f"Coin catalog synced: {stats}")
+    return stats
@@ -0,0 +1,101 @@
+"""
+Circuit breaker for upstream calls.
+
+    closed    -> calls go through; consecutive failures are counted
+    open      -> calls fail at once with CircuitOpenError for reset_timeout seconds
+    half_open -> a limited number of trial calls go through; a success closes
+                 the circuit, a failure opens it again
+
+While the circuit is open, callers stop spending request threads, rate-limit
+tokens and timeouts on an upstream that is already failing.
+"""
+
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the circuit is open."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_in:.1f}s")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker. Used from one event loop, so no locking."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_calls = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._trial_calls = 0
+        return self._state
+
+    def check(self):
+        """Raise CircuitOpenError if a call would be refused right now; takes nothing."""
+        state = self.state
+        if state == OPEN:
+            raise CircuitOpenError(self.name, self.reset_timeout - (time.monotonic() - self._opened_at))
+        if state == HALF_OPEN and self._trial_calls >= self.half_open_max_calls:
+            raise CircuitOpenError(self.name, 0.0)
+
+    def before_call(self):
+        """
+        Raise CircuitOpenError if the call should not go upstream. In half-open
+        state this takes a trial slot, which record_success(), record_failure()
+        or abandon() must give back.
+        """
+        self.check()
+        if self._state == HALF_OPEN:
+            self._trial_calls += 1
+
+    def abandon(self):
+        """The call never reached upstream (e.g. rate-limited or cancelled); free its trial slot."""
+        if self._state == HALF_OPEN and self._trial_calls > 0:
+            self._trial_calls -= 1
+
+    def record_success(self):
+        if self._state != CLOSED:
+            logger.info(f"Circuit '{self.name}' closed")
+        self._state = CLOSED
+        self._failures = 0
+
+    def record_failure(self):
+        self._failures += 1
+        if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state != OPEN:
+                logger.warning(f"Circuit '{self.name}' opened after {self._failures} consecutive failures")
+            self._state = OPEN
+            self._opened_at = time.monotonic()
+
+    def status(self) -> dict:
+        state = self.state
+        return {
+            "name": self.name,
+            "state": state,
+            "failures": self._failures,
+            "retry_in": max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)) if state == OPEN else 0.0,
+        }
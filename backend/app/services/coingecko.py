@@ -0,0 +1,349 @@
+"""
+Shared CoinGecko HTTP client.
+
+Every upstream call goes through one pooled httpx.AsyncClient that lives on a
+background event loop. Sync callers (routes, Celery tasks, init_db) submit
+coroutines to that loop with run(), so all of them share the same keep-alive
+connections, concurrency limit and per-call timeouts.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import httpx
+
+from app.config import settings
+from app.services.batch_planner import BatchPlanner, is_oversize
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.services.rate_limiter import (
+    PRIORITY_HIGH,
+    PRIORITY_LOW,
+    PRIORITY_NORMAL,
+    RateLimiter,
+    RateLimitTimeout,
+)
+from app.services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class CoinGeckoError(Exception):
+    """Raised when a CoinGecko call fails or returns an error status."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, body: str = ""):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+class CoinGeckoClient:
+    """Async CoinGecko client with connection pooling and bounded concurrency."""
+
+    def __init__(
+        self,
+        api_url: Optional[str] = None,
+        price_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_connections: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.api_url = (api_url or settings.COINGECKO_API_URL).rstrip("/")
+        self.price_url = price_url or settings.COINGECKO_PRICE_URL
+        self.api_key = settings.COINGECKO_API_KEY if api_key is None else api_key
+        self.timeout = timeout or settings.COINGECKO_TIMEOUT_SECONDS
+        self.max_connections = max_connections or settings.COINGECKO_MAX_CONNECTIONS
+        self.max_concurrency = max_concurrency or settings.COINGECKO_MAX_CONCURRENCY
+        self.planner = BatchPlanner()
+        self.limiter = RateLimiter()
+        self.flight = SingleFlight()
+        self.breaker = CircuitBreaker(
+            "coingecko",
+            failure_threshold=settings.COINGECKO_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=settings.COINGECKO_CIRCUIT_RESET_SECONDS,
+        )
+        self._transport = transport
+        self._http: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_http(self) -> httpx.AsyncClient:
+        # Created lazily so the pool and semaphore bind to the loop that uses them
+        if self._http is None:
+            headers = {"accept": "application/json"}
+            if self.api_key:
+                headers["x-cg-demo-api-key"] = self.api_key
+            self._http = httpx.AsyncClient(
+                headers=headers,
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                transport=self._transport,
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._http
+
+    async def request(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        priority: int = PRIORITY_NORMAL,
+        max_wait: Optional[float] = None,
+    ) -> Any:
+        """
+        GET a CoinGecko endpoint (absolute URL or path under api_url) and return its JSON.
+        Identical concurrent requests share one upstream call. Raises
+        CircuitOpenError without calling out while CoinGecko is failing.
+        """
+        if not url.startswith("http"):
+            url = f"{self.api_url}/{url.lstrip('/')}"
+
+        key = (url, tuple(sorted((params or {}).items())))
+        return await self.flight.do(key, lambda: self._request(url, params, timeout, priority, max_wait))
+
+    async def _request(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        timeout: Optional[float],
+        priority: int,
+        max_wait: Optional[float],
+    ) -> Any:
+        """
+        Send one logical request. Every attempt takes a rate-limit token first;
+        429s pause the shared limiter for Retry-After and are retried up to
+        COINGECKO_MAX_RETRIES times. Timeouts, connection errors, 5xx and
+        exhausted 429 retries count as failures for the circuit breaker.
+        A half-open trial slot is only taken once the limiter has granted a
+        token, and is given back if the call ends without an upstream outcome.
+        """
+        self.breaker.check()
+        http = self._get_http()
+        in_breaker = False
+        try:
+            for attempt in range(settings.COINGECKO_MAX_RETRIES + 1):
+                try:
+                    waited = await self.limiter.acquire(priority, max_wait=max_wait)
+                except RateLimitTimeout as e:
+                    raise CoinGeckoError(f"Rate limit budget exhausted for {url}: {e}", status_code=429) from e
+                if waited > 0:
+                    logger.info(f"Waited {waited:.2f}s for rate limit before {url} (priority {priority})")
+                if not in_breaker:
+                    self.breaker.before_call()
+                    in_breaker = True
+
+                async with self._semaphore:
+                    try:
+                        response = await http.get(url, params=params, timeout=timeout or self.timeout)
+                    except httpx.TimeoutException as e:
+                        in_breaker = False
+                        self.breaker.record_failure()
+                        raise CoinGeckoError(f"Timed out calling {url}") from e
+                    except httpx.HTTPError as e:
+                        in_breaker = False
+                        self.breaker.record_failure()
+                        raise CoinGeckoError(f"Request to {url} failed: {e}") from e
+
+                if response.status_code != 429:
+                    break
+                retry_after = response.headers.get("retry-after", "")
+                await self.limiter.penalize(float(retry_after) if retry_after.isdigit() else settings.COINGECKO_RETRY_AFTER_SECONDS)
+
+            in_breaker = False
+            if response.status_code == 429 or response.status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+        finally:
+            if in_breaker:
+                self.breaker.abandon()
+        if response.status_code >= 400:
+            raise CoinGeckoError(
+                f"CoinGecko returned {response.status_code} for {url}",
+                status_code=response.status_code,
+                body=response.text[:500],
+            )
+        return response.json()
+
+    def _price_params(self, vs_currencies: str, flags: Dict[str, bool]) -> Dict[str, Any]:
+        params: Dict[str, Any] = {"vs_currencies": vs_currencies}
+        for name, value in flags.items():
+            params[name] = "true" if value else "false"
+        return params
+
+    async def get_price(
+        self,
+        ids: Union[str, Iterable[str]],
+        vs_currencies: str = "usd",
+        timeout: Optional[float] = None,
+        priority: int = PRIORITY_NORMAL,
+        max_wait: Optional[float] = None,
+        **flags: bool,
+    ) -> Dict[str, Any]:
+        """Call /simple/price for one batch of ids."""
+        if not isinstance(ids, str):
+            ids = ",".join(ids)
+        params = {"ids": ids, **self._price_params(vs_currencies, flags)}
+        return await self.request(self.price_url, params, timeout=timeout, priority=priority, max_wait=max_wait) or {}
+
+    async def get_price_batch(
+        self,
+        batch: List[str],
+        vs_currencies: str,
+        flags: Dict[str, bool],
+        priority: int = PRIORITY_HIGH,
+    ) -> Dict[str, Any]:
+        """Fetch one planned batch, splitting it again if CoinGecko says it is too large."""
+        try:
+            prices = await self.get_price(batch, vs_currencies=vs_currencies, priority=priority, **flags)
+        except CoinGeckoError as e:
+            if not is_oversize(e.status_code, e.body) or len(batch) <= 1:
+                raise
+            params = self._price_params(vs_currencies, flags)
+            self.planner.record_rejection(self.price_url, batch, params)
+            results: Dict[str, Any] = {}
+            for sub_batch in self.planner.plan(batch, self.price_url, params):
+                results.update(await self.get_price_batch(sub_batch, vs_currencies, flags, priority))
+            return results
+        self.planner.record_success(batch)
+        return prices
+
+    def plan_price_batches(self, coin_ids: List[str], vs_currencies: str = "usd", **flags: bool) -> List[List[str]]:
+        return self.planner.plan(coin_ids, self.price_url, self._price_params(vs_currencies, flags))
+
+    async def get_prices(
+        self,
+        coin_ids: List[str],
+        vs_currencies: str = "usd",
+        priority: int = PRIORITY_HIGH,
+        **flags: bool,
+    ) -> Dict[str, Any]:
+        """
+        Fetch /simple/price for many ids, packing each call up to the planner
+        limits and running the calls concurrently. Defaults to ingestion priority.
+        Failed batches are logged and left out of the result.
+        """
+        batches = self.plan_price_batches(coin_ids, vs_currencies, **flags)
+        logger.info(f"Fetching {len(coin_ids)} prices in {len(batches)} upstream calls")
+        results = await asyncio.gather(
+            *(self.get_price_batch(batch, vs_currencies, flags, priority) for batch in batches),
+            return_exceptions=True,
+        )
+
+        all_prices: Dict[str, Any] = {}
+        for idx, result in enumerate(results):
+            if isinstance(result, Exception):
+                logger.error(f"Error fetching batch {idx + 1}/{len(batches)}: {result}")
+                continue
+            all_prices.update(result)
+        return all_prices
+
+    async def get_coins_list(self, **kwargs: Any) -> List[Dict[str, Any]]:
+        return await self.request("coins/list", **kwargs) or []
+
+    async def get_coins_markets(
+        self,
+        vs_currency: str = "usd",
+        priority: int = PRIORITY_NORMAL,
+        max_wait: Optional[float] = None,
+        **params: Any,
+    ) -> List[Dict[str, Any]]:
+        params = {k: str(v).lower() if isinstance(v, bool) else v for k, v in params.items()}
+        params["vs_currency"] = vs_currency
+        return await self.request("coins/markets", params, priority=priority, max_wait=max_wait) or []
+
+    async def get_search_trending(self, **kwargs: Any) -> Dict[str, Any]:
+        return await self.request("search/trending", **kwargs) or {}
+
+    async def get_coin_market_chart_by_id(self, id: str, vs_currency: str = "usd", days: int = 30, **kwargs: Any) -> Dict[str, Any]:
+        return await self.request(f"coins/{id}/market_chart", {"vs_currency": vs_currency, "days": days}, **kwargs)
+
+    async def get_coin_ohlc_by_id(self, id: str, vs_currency: str = "usd", days: int = 30, **kwargs: Any) -> List[List[float]]:
+        return await self.request(f"coins/{id}/ohlc", {"vs_currency": vs_currency, "days": days}, **kwargs)
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+# Background loop shared by every sync caller in this process.
+# Recreated after fork so each Celery worker child gets its own loop and pool.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+_client: Optional[CoinGeckoClient] = None
+_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _loop_pid, _client
+    with _lock:
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            _client = None
+            threading.Thread(target=_loop.run_forever, name="coingecko-client", daemon=True).start()
+        return _loop
+
+
+def get_client() -> CoinGeckoClient:
+    """Return the process-wide CoinGecko client."""
+    global _client
+    _get_loop()
+    with _lock:
+        if _client is None:
+            _client = CoinGeckoClient()
+        return _client
+
+
+def run(coro, timeout: Optional[float] = None):
+    """Run a coroutine on the shared client loop and block until it finishes."""
+    future = asyncio.run_coroutine_threadsafe(coro, _get_loop())
+    return future.result(timeout)
+
+
+async def arun(coro):
+    """Await a coroutine on the shared client loop from another event loop."""
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, _get_loop()))
+
+
+def close():
+    """Close the pooled connections (call on application shutdown)."""
+    if _client is not None and _loop is not None and _loop_pid == os.getpid():
+        run(_client.aclose())
+
+
+# Sync wrappers mirroring the pycoingecko method names used across the app
+
+def get_price(ids: Union[str, Iterable[str]], vs_currencies: str = "usd", **kwargs: Any) -> Dict[str, Any]:
+    return run(get_client().get_price(ids, vs_currencies=vs_currencies, **kwargs))
+
+
+def get_prices(coin_ids: List[str], **kwargs: Any) -> Dict[str, Any]:
+    return run(get_client().get_prices(coin_ids, **kwargs))
+
+
+def get_coins_list(**kwargs: Any) -> List[Dict[str, Any]]:
+    return run(get_client().get_coins_list(**kwargs))
+
+
+def get_coins_markets(vs_currency: str = "usd", **params: Any) -> List[Dict[str, Any]]:
+    return run(get_client().get_coins_markets(vs_currency=vs_currency, **params))
+
+
+def get_search_trending(**kwargs: Any) -> Dict[str, Any]:
+    return run(get_client().get_search_trending(**kwargs))
+
+
+def get_coin_market_chart_by_id(id: str, vs_currency: str = "usd", days: int = 30, **kwargs: Any) -> Dict[str, Any]:
+    return run(get_client().get_coin_market_chart_by_id(id, vs_currency=vs_currency, days=days, **kwargs))
+
+
+def get_coin_ohlc_by_id(id: str, vs_currency: str = "usd", days: int = 30, **kwargs: Any) -> List[List[float]]:
+    return run(get_client().get_coin_ohlc_by_id(id, vs_currency=vs_currency, days=days, **kwargs))
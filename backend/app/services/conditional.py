@@ -0,0 +1,81 @@
+"""
+Conditional GET from freshness stamps.
+
+Routes whose body only changes when some stored data changes call check() with
+the freshness names they depend on before doing any work. The stamps give a
+weak ETag and a Last-Modified date. A client whose If-None-Match (or, without
+it, If-Modified-Since) still matches gets a bare 304, so no query runs and
+nothing is serialized.
+
+Validators are only sent while the stamps can be trusted: all of them must
+have been marked, and they must come from Redis, where Celery's writes show up.
+Otherwise the route answers in full as before.
+"""
+
+import datetime
+import hashlib
+import logging
+from email.utils import formatdate, parsedate_to_datetime
+from typing import List, Optional, Tuple
+
+from fastapi import Request, Response
+
+from app.services import freshness
+
+logger = logging.getLogger(__name__)
+
+
+def validators(names: List[str]) -> Optional[Tuple[str, float]]:
+    """(ETag, last modified epoch) for the current stamps of names, or None."""
+    stamps = freshness.get_shared(names)
+    if stamps is None or any(stamp is None for stamp in stamps.values()):
+        return None
+    version = "|".join(f"{name}={stamps[name]!r}" for name in names)
+    return f'W/"{hashlib.sha1(version.encode()).hexdigest()[:20]}"', max(stamps.values())
+
+
+def _opaque(tag: str) -> str:
+    # Weak comparison: W/"x" matches "x"
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def _not_modified(request: Request, etag: str, modified: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [_opaque(tag) for tag in if_none_match.split(",")]
+        return "*" in tags or _opaque(etag) in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=datetime.timezone.utc)
+        # HTTP dates have whole seconds
+        return int(modified) <= since.timestamp()
+    return False
+
+
+def check(request: Request, response: Response, names: List[str]) -> Optional[Response]:
+    """
+    Put ETag and Last-Modified for names on response. Returns a 304 response
+    to send instead when the client's copy is current, else None.
+    """
+    found = validators(names)
+    if found is None:
+        return None
+    etag, modified = found
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(modified, usegmt=True),
+        # Let browsers keep the body but revalidate on every use
+        "Cache-Control": "no-cache",
+    }
+    response.headers.update(headers)
+    if _not_modified(request, etag, modified):
+        logger.debug(f"Not modified since {headers['Last-Modified']} ({', '.join(names)})")
+        return Response(status_code=304, headers=headers)
+    return None
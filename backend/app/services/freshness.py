@@ -0,0 +1,112 @@
+"""
+Freshness stamps for stored data.
+
+Writers call mark(name) after committing new data; readers use get(name) to
+report how current their response is, or await wait_for_change() to hold a
+request until the next write lands. Stamps live in Redis so API processes see
+writes made by Celery workers; without Redis they are per-process.
+
+The stamps also version HTTP responses (see app/services/conditional.py).
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+import redis
+
+from app.services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+PRICES = "prices"
+WATCHLISTS = "watchlists"
+TRENDING = "trending"
+GAINERS_LOSERS = "gainers_losers"
+CATALOG = "catalog"
+
+KEY_PREFIX = "freshness:"
+
+# How often wait_for_change looks at the stamp
+POLL_INTERVAL_SECONDS = 0.25
+
+_local: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def mark(name: str, at: Optional[float] = None) -> float:
+    """Record that `name` changed at `at` (default now, epoch seconds)."""
+    stamp = at if at is not None else time.time()
+    with _lock:
+        if stamp > _local.get(name, 0.0):
+            _local[name] = stamp
+    client = get_redis()
+    if client is not None:
+        try:
+            client.set(f"{KEY_PREFIX}{name}", repr(stamp))
+        except redis.RedisError as e:
+            logger.warning(f"Could not store freshness stamp for {name}: {e}")
+    return stamp
+
+
+def get(name: str) -> Optional[float]:
+    """Latest stamp for `name`, or None if it was never marked."""
+    client = get_redis()
+    if client is not None:
+        try:
+            value = client.get(f"{KEY_PREFIX}{name}")
+            if value is not None:
+                return float(value)
+        except redis.RedisError as e:
+            logger.warning(f"Could not read freshness stamp for {name}: {e}")
+    with _lock:
+        return _local.get(name)
+
+
+def get_shared(names: List[str]) -> Optional[Dict[str, Optional[float]]]:
+    """
+    Stamps for names as stored in Redis, in one round trip. None when Redis is
+    unavailable, since per-process stamps miss writes made by other processes.
+    """
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        values = client.mget([f"{KEY_PREFIX}{name}" for name in names])
+    except redis.RedisError as e:
+        logger.warning(f"Could not read freshness stamps {names}: {e}")
+        return None
+    return {name: float(value) if value is not None else None for name, value in zip(names, values)}
+
+
+def mark_missing(names: List[str]) -> List[str]:
+    """
+    Mark names that have no stamp yet, so responses built on them get
+    validators before their data first changes. Safe because every later
+    write marks a newer stamp.
+    """
+    stamps = get_shared(names)
+    if stamps is None:
+        return []
+    missing = [name for name, stamp in stamps.items() if stamp is None]
+    for name in missing:
+        mark(name)
+    return missing
+
+
+async def wait_for_change(name: str, since: Optional[float], timeout: float) -> Optional[float]:
+    """
+    Wait up to `timeout` seconds for the stamp of `name` to move past `since`.
+    Returns the new stamp, or None on timeout. Never blocks the event loop.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        stamp = await asyncio.to_thread(get, name)
+        if stamp is not None and (since is None or stamp > since):
+            return stamp
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        await asyncio.sleep(min(POLL_INTERVAL_SECONDS, remaining))
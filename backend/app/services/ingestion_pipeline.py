@@ -0,0 +1,265 @@
+"""
+Staged streaming pipeline for price ingestion.
+
+    fetch -> parse/validate -> transform -> write
+
+Stages are connected by bounded asyncio queues, so a slow stage pushes back on
+the ones before it and memory stays bounded by the queue sizes rather than the
+size of the watched universe. Writes start as soon as the first batches are
+parsed, while later batches are still in flight.
+
+Each tick is stored with CoinGecko's last_updated_at as its timestamp. Ticks
+whose observation this process already wrote are dropped before the write,
+and the (coin_id, timestamp) uniqueness rule skips the rest in the database.
+"""
+
+import asyncio
+import datetime
+import logging
+import math
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.database import SessionLocal
+from app.services import coingecko, freshness, price_cache, price_stream, tick_buffer
+from app.services.bulk_writer import write_price_points
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a stream on a queue
+_DONE = object()
+
+# Last observation written per coin by this process
+_last_observed: Dict[str, datetime.datetime] = {}
+
+
+async def _cancel(tasks: List[asyncio.Future]):
+    """Cancel tasks that are still running and wait until they have stopped."""
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _new_counters() -> Dict[str, Any]:
+    return {"in": 0, "out": 0, "errors": 0, "seconds": 0.0}
+
+
+class PriceIngestionPipeline:
+    """Fetches, validates, transforms and writes prices for a set of coins."""
+
+    def __init__(
+        self,
+        coin_ids: List[str],
+        symbol_map: Dict[str, str],
+        dry_run: bool = False,
+        collect: bool = False,
+        fail_fast: bool = False,
+        queue_size: int = 4,
+        write_chunk_size: int = 1000,
+        session_factory: Callable = SessionLocal,
+        client: Optional[coingecko.CoinGeckoClient] = None,
+    ):
+        self.coin_ids = coin_ids
+        self.symbol_map = symbol_map
+        self.dry_run = dry_run
+        self.collect = collect
+        self.fail_fast = fail_fast
+        self.queue_size = queue_size
+        self.write_chunk_size = write_chunk_size
+        self.session_factory = session_factory
+        self.client = client or coingecko.get_client()
+        self.timestamp = datetime.datetime.utcnow()
+        self.collected: List[Dict[str, Any]] = []
+        self.counters = {
+            "fetch": _new_counters(),
+            "parse": _new_counters(),
+            "transform": _new_counters(),
+            "write": _new_counters(),
+        }
+
+    async def _fetch(self, out_q: asyncio.Queue):
+        """Fetch planned batches with a fixed number of workers."""
+        counters = self.counters["fetch"]
+        pending = list(self.client.plan_price_batches(self.coin_ids))
+        counters["batches"] = len(pending)
+
+        async def worker():
+            while pending:
+                batch = pending.pop()
+                counters["in"] += 1
+                start = time.perf_counter()
+                try:
+                    response = await self.client.get_price_batch(batch, "usd", {"include_last_updated_at": True})
+                except Exception as e:
+                    counters["errors"] += 1
+                    logger.error(f"Fetch of {len(batch)} ids failed: {e}")
+                    if self.fail_fast:
+                        raise
+                    continue
+                finally:
+                    counters["seconds"] += time.perf_counter() - start
+                counters["out"] += 1
+                await out_q.put(response)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(self.client.max_concurrency, len(pending)) or 1)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            # With fail_fast the first error ends the stage; the other workers
+            # may be blocked on out_q.put and would otherwise be left behind
+            await _cancel(workers)
+        await out_q.put(_DONE)
+
+    async def _parse(self, in_q: asyncio.Queue, out_q: asyncio.Queue):
+        """Keep only entries with a finite, non-negative USD price."""
+        counters = self.counters["parse"]
+        while (response := await in_q.get()) is not _DONE:
+            valid: List[Tuple[str, float, datetime.datetime]] = []
+            for coin_id, price_data in response.items():
+                counters["in"] += 1
+                try:
+                    price = float(price_data["usd"])
+                    if not math.isfinite(price) or price < 0:
+                        raise ValueError(f"bad price {price}")
+                    updated_at = price_data.get("last_updated_at")
+                    observed_at = (
+                        datetime.datetime.utcfromtimestamp(int(updated_at)) if updated_at else self.timestamp
+                    )
+                except (TypeError, KeyError, ValueError) as e:
+                    counters["errors"] += 1
+                    logger.warning(f"✗ No valid USD price for {coin_id}: {price_data} ({e})")
+                    continue
+                valid.append((coin_id, price, observed_at))
+            counters["out"] += len(valid)
+            if valid:
+                await out_q.put(valid)
+        await out_q.put(_DONE)
+
+    async def _transform(self, in_q: asyncio.Queue, out_q: asyncio.Queue):
+        """Turn parsed ticks into price_points rows, dropping unchanged observations."""
+        counters = self.counters["transform"]
+        counters["unchanged"] = 0
+        while (parsed := await in_q.get()) is not _DONE:
+            counters["in"] += len(parsed)
+            rows = []
+            for coin_id, price, observed_at in parsed:
+                row = {
+                    "coin_id": coin_id,
+                    "symbol": self.symbol_map.get(coin_id, coin_id.upper()),
+                    "price": price,
+                    "timestamp": observed_at,
+                }
+                if self.collect:
+                    self.collected.append(row)
+                last = _last_observed.get(coin_id)
+                if last is not None and observed_at <= last:
+                    counters["unchanged"] += 1
+                    continue
+                rows.append(row)
+            counters["out"] += len(rows)
+            if rows:
+                await out_q.put(rows)
+        await out_q.put(_DONE)
+
+    def _write_chunk(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        db = self.session_factory()
+        try:
+            stats = write_price_points(db, rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        for row in rows:
+            _last_observed[row["coin_id"]] = row["timestamp"]
+        price_cache.store(rows)
+        # Rows already stored were announced when they were first written
+        inserted = stats.pop("inserted")
+        tick_buffer.buffer.append_rows(inserted)
+        if inserted:
+            freshness.mark(freshness.PRICES)
+            price_stream.publish(inserted)
+        return stats
+
+    async def _write(self, in_q: asyncio.Queue):
+        """Write rows in chunks of write_chunk_size, off the event loop."""
+        counters = self.counters["write"]
+        counters["skipped"] = 0
+        buffer: List[Dict[str, Any]] = []
+
+        async def flush():
+            if not buffer:
+                return
+            chunk = buffer[:]
+            buffer.clear()
+            start = time.perf_counter()
+            if self.dry_run:
+                stats = {"rows": len(chunk), "skipped": 0}
+            else:
+                stats = await asyncio.to_thread(self._write_chunk, chunk)
+            counters["seconds"] += time.perf_counter() - start
+            counters["out"] += stats["rows"]
+            counters["skipped"] += stats["skipped"]
+
+        while (rows := await in_q.get()) is not _DONE:
+            counters["in"] += len(rows)
+            buffer.extend(rows)
+            if len(buffer) >= self.write_chunk_size:
+                await flush()
+        await flush()
+
+    async def run(self) -> Dict[str, Any]:
+        start = time.perf_counter()
+        raw_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        parsed_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        rows_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+
+        stages = [
+            asyncio.ensure_future(self._fetch(raw_q)),
+            asyncio.ensure_future(self._parse(raw_q, parsed_q)),
+            asyncio.ensure_future(self._transform(parsed_q, rows_q)),
+            asyncio.ensure_future(self._write(rows_q)),
+        ]
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            await _cancel(stages)
+
+        summary = {
+            "status": "success" if self.counters["parse"]["out"] else "error",
+            "dry_run": self.dry_run,
+            "coins_requested": len(self.coin_ids),
+            "upstream_calls": self.counters["fetch"].get("batches", 0),
+            "rows_written": self.counters["write"]["out"],
+            "unchanged": self.counters["transform"]["unchanged"] + self.counters["write"]["skipped"],
+            "timestamp": self.timestamp.isoformat(),
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+            "stages": {
+                name: {k: round(v, 4) if isinstance(v, float) else v for k, v in counters.items()}
+                for name, counters in self.counters.items()
+            },
+        }
+        logger.info(
+            f"Ingestion {'dry run ' if self.dry_run else ''}finished: "
+            f"{summary['rows_written']}/{len(self.coin_ids)} coins in {summary['elapsed_ms']}ms"
+        )
+        return summary
+
+
+def run_price_ingestion(
+    coin_ids: List[str],
+    symbol_map: Dict[str, str],
+    dry_run: bool = False,
+    collect: bool = False,
+    fail_fast: bool = False,
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Run the pipeline on the shared CoinGecko loop from sync code.
+    Returns the run summary and, when collect is set, every valid tick fetched.
+    With fail_fast, a failed upstream call aborts the run instead of being counted.
+    """
+    pipeline = PriceIngestionPipeline(coin_ids, symbol_map, dry_run=dry_run, collect=collect, fail_fast=fail_fast)
+    summary = coingecko.run(pipeline.run())
+    return summary, pipeline.collected
@@ -0,0 +1,72 @@
+"""
+Short-lived named claims shared across processes.
+
+claim(name, ttl) returns True for exactly one caller until the claim expires
+or is released, so a piece of work (one poll minute, one alert check) runs
+once even when several workers try at the same time. Claims live in Redis;
+without Redis they only hold within the current process.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+import redis
+
+from app.services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "lock:"
+
+# Deletes the key only if it still holds our token
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# name -> (token, monotonic expiry)
+_local: Dict[str, tuple] = {}
+_lock = threading.Lock()
+
+
+def _claim_local(name: str, token: str, ttl: float) -> bool:
+    now = time.monotonic()
+    with _lock:
+        current = _local.get(name)
+        if current is not None and current[1] > now:
+            return False
+        _local[name] = (token, now + ttl)
+        return True
+
+
+def claim(name: str, ttl: float) -> Optional[str]:
+    """Take the claim on name for ttl seconds. Returns a token for release(), or None if taken."""
+    token = uuid.uuid4().hex
+    client = get_redis()
+    if client is not None:
+        try:
+            if client.set(f"{KEY_PREFIX}{name}", token, nx=True, px=int(ttl * 1000)):
+                return token
+            return None
+        except redis.RedisError as e:
+            logger.warning(f"Could not claim {name} in Redis, claiming in this process only: {e}")
+    return token if _claim_local(name, token, ttl) else None
+
+
+def release(name: str, token: str):
+    """Give up a claim early; does nothing if it already expired or passed to someone else."""
+    with _lock:
+        current = _local.get(name)
+        if current is not None and current[0] == token:
+            del _local[name]
+    client = get_redis()
+    if client is not None:
+        try:
+            client.eval(_RELEASE_SCRIPT, 1, f"{KEY_PREFIX}{name}", token)
+        except redis.RedisError as e:
+            logger.warning(f"Could not release {name} in Redis: {e}")
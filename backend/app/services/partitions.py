@@ -0,0 +1,197 @@
+"""
+Monthly range partitions of price_points (PostgreSQL).
+
+price_points is partitioned by timestamp into one table per month, named
+price_points_yYYYYmMM. ensure_partitions() creates the current month and the
+next PARTITION_MONTHS_AHEAD months, plus a DEFAULT partition,
+price_points_default, that takes ticks outside every month (a stale coin's
+old last_updated_at, backfilled history) so they never fail a write. When a
+month is created later, its rows are moved out of the default partition.
+drop_expired_partitions() detaches and drops months past the retention period,
+which is a metadata operation instead of a bulk DELETE plus vacuum.
+Queries that filter on timestamp only scan the months they touch.
+
+Both are no-ops on other databases and on a price_points table that has not
+been converted yet (see migrations/partition_price_points.py).
+"""
+
+import datetime
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import PricePoint
+
+logger = logging.getLogger(__name__)
+
+TABLE = PricePoint.__tablename__
+DEFAULT_PARTITION = f"{TABLE}_default"
+_NAME_PATTERN = re.compile(rf"^{TABLE}_y(\d{{4}})m(\d{{2}})$")
+
+
+def month_start(value: datetime.datetime) -> datetime.date:
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(month: datetime.date, count: int) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime.date) -> str:
+    return f"{TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def is_partitioned(db: Session) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    result = db.execute(text("""
+        SELECT 1 FROM pg_partitioned_table p
+        JOIN pg_class c ON c.oid = p.partrelid
+        WHERE c.relname = :table AND pg_table_is_visible(c.oid)
+    """), {"table": TABLE})
+    return result.fetchone() is not None
+
+
+def create_partition_sql(month: datetime.date, table: str = TABLE) -> str:
+    name = f"{table}_y{month.year:04d}m{month.month:02d}"
+    return (
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def create_default_partition_sql(table: str = TABLE) -> str:
+    return f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"
+
+
+def _month_bounds(month: datetime.date) -> Dict[str, datetime.date]:
+    return {"low": month, "high": add_months(month, 1)}
+
+
+def _create_month(db: Session, month: datetime.date, has_default: bool):
+    """
+    Create month's partition. Rows for it already in the default partition
+    would make a plain CREATE ... PARTITION OF fail, so those are moved into a
+    standalone table that is then attached.
+    """
+    name = partition_name(month)
+    bounds = _month_bounds(month)
+    stranded = has_default and db.execute(text(
+        f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE timestamp >= :low AND timestamp < :high LIMIT 1"
+    ), bounds).fetchone() is not None
+    if not stranded:
+        db.execute(text(create_partition_sql(month)))
+        return
+
+    db.execute(text(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)"))
+    moved = db.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION}
+            WHERE timestamp >= :low AND timestamp < :high
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), bounds).rowcount
+    db.execute(text(
+        f"ALTER TABLE {TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{bounds['low'].isoformat()}') TO ('{bounds['high'].isoformat()}')"
+    ))
+    logger.info(f"Moved {moved} rows from {DEFAULT_PARTITION} into {name}")
+
+
+def list_partitions(db: Session) -> List[Dict[str, Any]]:
+    """Monthly partitions attached to price_points, oldest first."""
+    result = db.execute(text("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = :table
+    """), {"table": TABLE})
+    partitions = []
+    for (name,) in result:
+        match = _NAME_PATTERN.match(name)
+        if match:
+            partitions.append({"name": name, "month": datetime.date(int(match[1]), int(match[2]), 1)})
+    return sorted(partitions, key=lambda p: p["month"])
+
+
+def _has_default_partition(db: Session) -> bool:
+    result = db.execute(text("""
+        SELECT 1 FROM pg_partitioned_table p
+        JOIN pg_class c ON c.oid = p.partrelid
+        WHERE c.relname = :table AND pg_table_is_visible(c.oid) AND p.partdefid <> 0
+    """), {"table": TABLE})
+    return result.fetchone() is not None
+
+
+def ensure_partitions(db: Session, months_ahead: Optional[int] = None, now: Optional[datetime.datetime] = None) -> List[str]:
+    """
+    Create the default partition and any missing month from the current one up
+    to months_ahead months out. Commits.
+    """
+    if not is_partitioned(db):
+        return []
+    months_ahead = settings.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    first = month_start(now or datetime.datetime.utcnow())
+    existing = {p["name"] for p in list_partitions(db)}
+
+    created = []
+    has_default = _has_default_partition(db)
+    if not has_default:
+        db.execute(text(create_default_partition_sql()))
+        created.append(DEFAULT_PARTITION)
+    for offset in range(months_ahead + 1):
+        month = add_months(first, offset)
+        if partition_name(month) not in existing:
+            _create_month(db, month, has_default)
+            created.append(partition_name(month))
+    db.commit()
+    if created:
+        logger.info(f"Created price_points partitions: {', '.join(created)}")
+    return created
+
+
+def drop_expired_partitions(
+    engine: Engine,
+    db: Session,
+    retention_months: Optional[int] = None,
+    now: Optional[datetime.datetime] = None,
+) -> List[str]:
+    """
+    Detach and drop partitions that end before the retention cutoff, and delete
+    expired rows from the default partition. DETACH ... CONCURRENTLY does not
+    block writers, but cannot run in a transaction, so it uses its own
+    autocommit connection.
+    """
+    retention_months = settings.PRICE_RETENTION_MONTHS if retention_months is None else retention_months
+    if retention_months <= 0 or not is_partitioned(db):
+        return []
+    cutoff = add_months(month_start(now or datetime.datetime.utcnow()), -retention_months)
+    expired = [p["name"] for p in list_partitions(db) if add_months(p["month"], 1) <= cutoff]
+    if _has_default_partition(db):
+        deleted = db.execute(
+            text(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp < :cutoff"), {"cutoff": cutoff}
+        ).rowcount
+        if deleted:
+            logger.info(f"Deleted {deleted} expired rows from {DEFAULT_PARTITION}")
+    db.commit()
+
+    dropped = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name in expired:
+            try:
+                conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name} CONCURRENTLY"))
+                conn.execute(text(f"DROP TABLE {name}"))
+                dropped.append(name)
+            except Exception as e:
+                logger.error(f"Could not drop expired partition {name}: {e}")
+    if dropped:
+        logger.info(f"Dropped expired price_points partitions: {', '.join(dropped)}")
+    return dropped
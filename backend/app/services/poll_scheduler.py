@@ -0,0 +1,217 @@
+"""
+Tiered, adaptive polling schedule for watched coins.
+
+Coins are put into tiers by how many users watch them and how much their price
+moved recently. Each tier has its own refresh period. Every coin gets a fixed
+slot inside its period, so refreshes are spread evenly instead of all firing on
+the same minute. If the schedule would exceed the upstream call budget, the
+least important coins are moved down a tier until it fits.
+
+Manual refreshes (/prices?refresh=true) fetch the coins that are overdue for
+their tier, stalest first, and only spend what the schedule leaves of the
+budget.
+"""
+
+import datetime
+import logging
+import math
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import CurrentPrice, PricePoint, User, WatchlistItem
+from app.services import coingecko, subscriptions
+
+logger = logging.getLogger(__name__)
+
+# Hottest first; period_minutes is how often coins in the tier are refreshed
+TIERS = [
+    {"name": "hot", "period_minutes": 1},
+    {"name": "warm", "period_minutes": 5},
+    {"name": "standard", "period_minutes": 60},
+    {"name": "dormant", "period_minutes": 360},
+]
+
+VOLATILITY_WINDOW = datetime.timedelta(hours=1)
+
+# Recomputing tiers needs a few aggregate queries; reuse them for a while
+ASSIGNMENT_TTL_SECONDS = 300
+
+# Manual refreshes run at most this often across all workers
+REFRESH_INTERVAL_SECONDS = 30
+
+_cached: Optional[Dict[str, Any]] = None
+_cached_at = 0.0
+
+
+def _slot(coin_id: str, period_minutes: int) -> int:
+    """Stable minute offset of a coin inside its period (same in every process)."""
+    return zlib.crc32(coin_id.encode()) % period_minutes
+
+
+def _base_tier(watchers: int, active_watchers: int, volatility: float) -> int:
+    if watchers >= settings.POLL_HOT_WATCHERS or volatility >= settings.POLL_HOT_VOLATILITY:
+        return 0
+    if watchers >= settings.POLL_WARM_WATCHERS or volatility >= settings.POLL_WARM_VOLATILITY:
+        return 1
+    if active_watchers == 0:
+        return 3
+    return 2
+
+
+def estimate_calls_per_hour(tier_counts: List[int], ids_per_call: int) -> int:
+    """Upstream calls per hour when every minute fetches its due coins in packed calls."""
+    due_per_minute = sum(count / tier["period_minutes"] for count, tier in zip(tier_counts, TIERS))
+    return 60 * math.ceil(due_per_minute / ids_per_call) if due_per_minute else 0
+
+
+def _load_watched_coins(db: Session) -> List[Dict[str, Any]]:
+    """Watched coins from the subscription set, with how many of their watchers are still active."""
+    dormant_cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=settings.POLL_DORMANT_DAYS)
+    # Only dormant users' watchlist rows are scanned; users who never logged in
+    # since last_login_at was added count as active
+    dormant = dict(
+        db.query(WatchlistItem.coin_id, func.count(func.distinct(WatchlistItem.user_id)))
+        .join(User, User.id == WatchlistItem.user_id)
+        .filter(User.last_login_at < dormant_cutoff, WatchlistItem.coin_id.isnot(None))
+        .group_by(WatchlistItem.coin_id)
+        .all()
+    )
+    return [
+        {
+            "coin_id": sub.coin_id,
+            "symbol": sub.symbol,
+            "watchers": sub.watchers,
+            "active_watchers": max(0, sub.watchers - dormant.get(sub.coin_id, 0)),
+        }
+        for sub in subscriptions.active_subscriptions(db)
+    ]
+
+
+def _load_volatility(db: Session) -> Dict[str, float]:
+    """(max - min) / avg price per coin over the recent window."""
+    since = datetime.datetime.utcnow() - VOLATILITY_WINDOW
+    rows = (
+        db.query(
+            PricePoint.coin_id,
+            func.max(PricePoint.price),
+            func.min(PricePoint.price),
+            func.avg(PricePoint.price),
+        )
+        .filter(PricePoint.timestamp >= since, PricePoint.coin_id.isnot(None))
+        .group_by(PricePoint.coin_id)
+        .all()
+    )
+    return {coin_id: (hi - lo) / avg for coin_id, hi, lo, avg in rows if avg}
+
+
+def compute_assignments(db: Session, budget: Optional[int] = None) -> Dict[str, Any]:
+    """Assign every watched coin to a tier and slot within the upstream call budget."""
+    budget = budget or settings.POLL_BUDGET_CALLS_PER_HOUR
+    ids_per_call = coingecko.get_client().planner.max_ids
+    coins = _load_watched_coins(db)
+    volatility = _load_volatility(db)
+
+    for coin in coins:
+        coin["volatility"] = round(volatility.get(coin["coin_id"], 0.0), 6)
+        coin["tier"] = _base_tier(coin["watchers"], coin["active_watchers"], coin["volatility"])
+
+    # Demote the least-watched, calmest coins of the hottest tiers until we fit
+    coins.sort(key=lambda c: (c["watchers"], c["volatility"]), reverse=True)
+    tier_counts = [sum(1 for c in coins if c["tier"] == i) for i in range(len(TIERS))]
+    demoted = 0
+    while estimate_calls_per_hour(tier_counts, ids_per_call) > budget:
+        source = next((i for i in range(len(TIERS) - 1) if tier_counts[i]), None)
+        if source is None:
+            logger.warning(f"Cannot fit {len(coins)} coins into {budget} calls/hour even at the slowest tier")
+            break
+        step = max(1, tier_counts[source] // 10)
+        for coin in reversed(coins):
+            if step == 0:
+                break
+            if coin["tier"] == source:
+                coin["tier"] += 1
+                tier_counts[source] -= 1
+                tier_counts[source + 1] += 1
+                step -= 1
+                demoted += 1
+
+    tiers: Dict[str, Any] = {
+        tier["name"]: {"period_minutes": tier["period_minutes"], "count": 0, "coins": []} for tier in TIERS
+    }
+    for coin in coins:
+        tier = TIERS[coin["tier"]]
+        coin["slot"] = _slot(coin["coin_id"], tier["period_minutes"])
+        tiers[tier["name"]]["count"] += 1
+        tiers[tier["name"]]["coins"].append({
+            "coin_id": coin["coin_id"],
+            "symbol": coin["symbol"],
+            "watchers": coin["watchers"],
+            "volatility": coin["volatility"],
+            "slot": coin["slot"],
+        })
+
+    return {
+        "generated_at": datetime.datetime.utcnow().isoformat(),
+        "budget_calls_per_hour": budget,
+        "estimated_calls_per_hour": estimate_calls_per_hour(tier_counts, ids_per_call),
+        "demoted": demoted,
+        "tiers": tiers,
+    }
+
+
+def get_assignments(db: Session, refresh: bool = False) -> Dict[str, Any]:
+    """Current tier assignments, recomputed at most every ASSIGNMENT_TTL_SECONDS."""
+    global _cached, _cached_at
+    if refresh or _cached is None or time.monotonic() - _cached_at > ASSIGNMENT_TTL_SECONDS:
+        _cached = compute_assignments(db)
+        _cached_at = time.monotonic()
+    return _cached
+
+
+def refresh_call_allowance(assignments: Dict[str, Any]) -> int:
+    """Upstream calls one manual refresh may make: the spare budget spread over the refreshes an hour holds."""
+    spare = assignments["budget_calls_per_hour"] - assignments["estimated_calls_per_hour"]
+    return max(0, spare // (3600 // REFRESH_INTERVAL_SECONDS))
+
+
+def stale_coins(db: Session, assignments: Dict[str, Any], now: Optional[datetime.datetime] = None) -> Dict[str, str]:
+    """
+    coin_id -> symbol for watched coins whose stored price is older than their
+    tier's period, stalest first. Coins without a stored price come first.
+    """
+    now = now or datetime.datetime.utcnow()
+    coins = {
+        coin["coin_id"]: (coin["symbol"], datetime.timedelta(minutes=tier["period_minutes"]))
+        for tier in assignments["tiers"].values()
+        for coin in tier["coins"]
+    }
+    if not coins:
+        return {}
+    stored = dict(
+        db.query(CurrentPrice.coin_id, CurrentPrice.timestamp)
+        .filter(CurrentPrice.coin_id.in_(list(coins)))
+        .all()
+    )
+    stale = [
+        (stored.get(coin_id) or datetime.datetime.min, coin_id)
+        for coin_id, (_, period) in coins.items()
+        if coin_id not in stored or now - stored[coin_id] > period
+    ]
+    stale.sort()
+    return {coin_id: coins[coin_id][0] for _, coin_id in stale}
+
+
+def due_coins(assignments: Dict[str, Any], minute: int) -> Dict[str, str]:
+    """coin_id -> symbol for coins whose slot comes up at this minute since the epoch."""
+    due = {}
+    for tier in assignments["tiers"].values():
+        period = tier["period_minutes"]
+        for coin in tier["coins"]:
+            if minute % period == coin["slot"]:
+                due[coin["coin_id"]] = coin["symbol"]
+    return due
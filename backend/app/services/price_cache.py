@@ -0,0 +1,156 @@
+"""
+Latest price per coin, shared through Redis.
+
+Ingestion writes every stored tick to one Redis hash (coin_id -> price and
+observation time), so API and Celery processes can answer latest-price reads
+without touching PostgreSQL. A tick never replaces a newer one. Without Redis
+the cache is per-process and its entries expire after LOCAL_TTL_SECONDS, since
+ingestion may be writing from another process. Coins missing from the cache
+are read from current_prices and written back, so a cold cache fills itself.
+"""
+
+import datetime
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Tuple
+
+import redis
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models import CurrentPrice
+from app.services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+HASH_KEY = "prices:latest"
+
+# ARGV holds (coin_id, observed epoch, payload) triples; older ticks are ignored
+_STORE_SCRIPT = """
+local stored = 0
+for i = 1, #ARGV, 3 do
+    local current = redis.call('HGET', KEYS[1], ARGV[i])
+    if not current or cjson.decode(current)['t'] < tonumber(ARGV[i + 1]) then
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 2])
+        stored = stored + 1
+    end
+end
+return stored
+"""
+
+LOCAL_TTL_SECONDS = 15
+
+# coin_id -> (entry, monotonic time it was cached)
+_local: Dict[str, Tuple[Dict[str, Any], float]] = {}
+_lock = threading.Lock()
+
+
+def _epoch(timestamp: datetime.datetime) -> float:
+    return timestamp.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def _encode(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {"s": row["symbol"], "p": row["price"], "t": _epoch(row["timestamp"])}
+
+
+def _decode(coin_id: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "coin_id": coin_id,
+        "symbol": entry["s"],
+        "price": entry["p"],
+        "timestamp": datetime.datetime.utcfromtimestamp(entry["t"]),
+    }
+
+
+def store(rows: Iterable[Dict[str, Any]]) -> int:
+    """Cache rows ({"coin_id", "symbol", "price", "timestamp"}) unless a newer tick is cached."""
+    newest: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        entry = _encode(row)
+        if row["coin_id"] not in newest or entry["t"] > newest[row["coin_id"]]["t"]:
+            newest[row["coin_id"]] = entry
+    if not newest:
+        return 0
+
+    now = time.monotonic()
+    with _lock:
+        for coin_id, entry in newest.items():
+            current = _local.get(coin_id)
+            if current is None or current[0]["t"] <= entry["t"]:
+                _local[coin_id] = (entry, now)
+
+    client = get_redis()
+    if client is None:
+        return len(newest)
+    args: List[Any] = []
+    for coin_id, entry in newest.items():
+        args.extend((coin_id, entry["t"], json.dumps(entry)))
+    try:
+        return int(client.eval(_STORE_SCRIPT, 1, HASH_KEY, *args))
+    except redis.RedisError as e:
+        logger.warning(f"Could not cache {len(newest)} latest prices in Redis: {e}")
+        return len(newest)
+
+
+def _local_entries() -> Dict[str, Dict[str, Any]]:
+    cutoff = time.monotonic() - LOCAL_TTL_SECONDS
+    with _lock:
+        return {coin_id: entry for coin_id, (entry, cached_at) in _local.items() if cached_at >= cutoff}
+
+
+def _cached(coin_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    client = get_redis()
+    if client is not None:
+        try:
+            values = client.hmget(HASH_KEY, coin_ids) if coin_ids else []
+            return {coin_id: json.loads(v) for coin_id, v in zip(coin_ids, values) if v is not None}
+        except redis.RedisError as e:
+            logger.warning(f"Latest price cache unavailable, using process cache: {e}")
+    local = _local_entries()
+    return {coin_id: local[coin_id] for coin_id in coin_ids if coin_id in local}
+
+
+def _cached_all() -> Dict[str, Dict[str, Any]]:
+    client = get_redis()
+    if client is not None:
+        try:
+            return {k.decode(): json.loads(v) for k, v in client.hgetall(HASH_KEY).items()}
+        except redis.RedisError as e:
+            logger.warning(f"Latest price cache unavailable, using process cache: {e}")
+    return _local_entries()
+
+
+def _load_and_store(db: Session, query) -> List[Dict[str, Any]]:
+    rows = [
+        {"coin_id": p.coin_id, "symbol": p.symbol, "price": p.price, "timestamp": p.timestamp}
+        for p in query.all()
+    ]
+    store(rows)
+    return rows
+
+
+def get_latest(db: Session, coin_ids: List[str]) -> List[Dict[str, Any]]:
+    """Latest tick for each coin in coin_ids that has one, cache first."""
+    cached = _cached(coin_ids)
+    result = [_decode(coin_id, entry) for coin_id, entry in cached.items()]
+    missing = [coin_id for coin_id in coin_ids if coin_id not in cached]
+    if missing:
+        result.extend(_load_and_store(db, db.query(CurrentPrice).filter(CurrentPrice.coin_id.in_(missing))))
+    return result
+
+
+def get_latest_by_symbol(db: Session, symbols: Iterable[str]) -> Dict[str, float]:
+    """
+    SYMBOL -> latest price for the given symbols, cache first.
+    Where coins share a symbol, the most recently observed one wins.
+    """
+    wanted = {s.upper() for s in symbols}
+    rows = [_decode(coin_id, entry) for coin_id, entry in _cached_all().items() if entry["s"].upper() in wanted]
+    missing = wanted - {row["symbol"].upper() for row in rows}
+    if missing:
+        rows.extend(_load_and_store(db, db.query(CurrentPrice).filter(func.upper(CurrentPrice.symbol).in_(missing))))
+
+    rows.sort(key=lambda row: row["timestamp"])
+    return {row["symbol"].upper(): row["price"] for row in rows}
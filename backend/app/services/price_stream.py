@@ -0,0 +1,185 @@
+"""
+Push channel for new prices.
+
+Ingestion calls publish() after each committed chunk. With Redis the ticks go
+out on one pub/sub channel, and every API process runs a single listener that
+fans them out to its own subscribers, so clients on any uvicorn worker hear
+about writes made by Celery. Without Redis, publish() hands ticks straight to
+the hub of the current process, which covers single-node setups where
+ingestion runs in the API process.
+
+Each subscriber has a bounded queue. A client that falls behind loses its
+oldest batches, not the newest, and never slows down the others.
+"""
+
+import asyncio
+import datetime
+import json
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import redis
+import redis.asyncio as aioredis
+
+from app.config import settings
+from app.services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "prices:ticks"
+
+# Tick batches a subscriber may fall behind by before the oldest are dropped
+QUEUE_SIZE = 256
+
+# Wait before re-subscribing after the Redis listener lost its connection
+LISTENER_RETRY_SECONDS = 5
+
+
+def _encode(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    newest: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        current = newest.get(row["coin_id"])
+        if current is None or row["timestamp"] > current["timestamp"]:
+            newest[row["coin_id"]] = row
+    return [
+        {
+            "coin_id": row["coin_id"],
+            "symbol": row["symbol"],
+            "price": row["price"],
+            "timestamp": row["timestamp"].replace(tzinfo=datetime.timezone.utc).timestamp(),
+        }
+        for row in newest.values()
+    ]
+
+
+class Subscription:
+    """One client's filter and queue of tick batches."""
+
+    def __init__(self, coin_ids: Set[str]):
+        self.coin_ids = coin_ids
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.dropped = 0
+
+    def offer(self, ticks: List[Dict[str, Any]]):
+        if self.coin_ids:
+            ticks = [tick for tick in ticks if tick["coin_id"] in self.coin_ids]
+        if not ticks:
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(ticks)
+
+    async def next(self, timeout: float) -> Optional[List[Dict[str, Any]]]:
+        """Next batch of ticks, or None if none arrived within timeout."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class PriceHub:
+    """Subscribers of one process. subscribe(), unsubscribe() and dispatch() run on its event loop."""
+
+    def __init__(self):
+        self._subscribers: Set[Subscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener: Optional[asyncio.Task] = None
+        self.listening = False
+        self.delivered = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, coin_ids: Iterable[str] = ()) -> Subscription:
+        """Start receiving ticks for coin_ids (all coins when empty)."""
+        self._loop = asyncio.get_running_loop()
+        if self._listener is None or self._listener.done():
+            self._listener = self._loop.create_task(self._listen())
+        subscription = Subscription(set(coin_ids))
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+        if subscription.dropped:
+            logger.info(f"Price stream subscriber fell behind, {subscription.dropped} batches dropped")
+
+    def dispatch(self, ticks: List[Dict[str, Any]]):
+        for subscription in list(self._subscribers):
+            subscription.offer(ticks)
+        self.delivered += 1
+
+    def deliver_threadsafe(self, ticks: List[Dict[str, Any]]):
+        """Hand ticks to this process's subscribers from any thread."""
+        loop = self._loop
+        if loop is None or loop.is_closed() or not self._subscribers:
+            return
+        loop.call_soon_threadsafe(self.dispatch, ticks)
+
+    async def _listen(self):
+        """Relay the Redis channel to local subscribers while any exist."""
+        while self._subscribers:
+            if await asyncio.to_thread(get_redis) is None:
+                # In-process mode; check again later in case Redis comes back
+                await asyncio.sleep(LISTENER_RETRY_SECONDS)
+                continue
+            client = aioredis.Redis.from_url(settings.REDIS_URL)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(CHANNEL)
+                self.listening = True
+                logger.info("Price stream listening on Redis")
+                while self._subscribers:
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self.dispatch(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except (redis.RedisError, OSError) as e:
+                logger.warning(f"Price stream lost Redis, retrying in {LISTENER_RETRY_SECONDS}s: {e}")
+                await asyncio.sleep(LISTENER_RETRY_SECONDS)
+            finally:
+                self.listening = False
+                try:
+                    await pubsub.aclose()
+                    await client.aclose()
+                except (redis.RedisError, OSError):
+                    pass
+
+
+hub = PriceHub()
+
+
+def publish(rows: Iterable[Dict[str, Any]]) -> int:
+    """
+    Announce stored rows ({"coin_id", "symbol", "price", "timestamp"}), newest
+    per coin. Safe to call from any thread or process; returns ticks published.
+    """
+    ticks = _encode(rows)
+    if not ticks:
+        return 0
+
+    sent = False
+    client = get_redis()
+    if client is not None:
+        try:
+            client.publish(CHANNEL, json.dumps(ticks))
+            sent = True
+        except redis.RedisError as e:
+            logger.warning(f"Could not publish {len(ticks)} ticks to Redis: {e}")
+    # Local subscribers only hear Redis through the listener
+    if not (sent and hub.listening):
+        hub.deliver_threadsafe(ticks)
+    return len(ticks)
+
+
+def stream_event(ticks: List[Dict[str, Any]]) -> str:
+    """Server-Sent Events frame for a batch of ticks."""
+    return f"event: ticks\ndata: {json.dumps(ticks)}\n\n"
+
+
+def keepalive_event() -> str:
+    return f": keepalive {int(time.time())}\n\n"
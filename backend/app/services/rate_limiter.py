@@ -0,0 +1,185 @@
+"""
+Token-bucket rate limiter for upstream CoinGecko calls.
+
+The bucket lives in Redis so API workers and Celery workers share one budget;
+without Redis each process falls back to its own in-process bucket.
+
+Callers pass a priority. Lower-priority callers may only take a token while
+the bucket is above their reserve, so when the budget runs short ingestion
+(PRIORITY_HIGH) keeps going and best-effort callers wait or give up.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Optional
+
+import redis
+
+from app.config import settings
+from app.services.redis_client import connect_pending, get_redis, mark_unavailable
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# Fraction of the bucket each priority has to leave for higher priorities
+RESERVE_FRACTIONS = {
+    PRIORITY_HIGH: 0.0,
+    PRIORITY_NORMAL: 0.25,
+    PRIORITY_LOW: 0.5,
+}
+
+# Refill, take one token if the bucket stays above the reserve, and return the
+# seconds to wait otherwise. Uses Redis TIME so every process shares one clock.
+_ACQUIRE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local reserve = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens - 1 >= reserve then
+  tokens = tokens - 1
+else
+  wait = (reserve + 1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return tostring(wait)
+"""
+
+# Empty the bucket so nobody calls upstream for the given number of seconds
+_PENALIZE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local seconds = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+redis.call('HSET', KEYS[1], 'tokens', tostring(-seconds * rate), 'ts', tostring(now))
+return 1
+"""
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a caller would have to wait longer than its max_wait."""
+
+
+class LocalTokenBucket:
+    """In-process token bucket used when Redis is not available."""
+
+    blocking = False
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, reserve: float) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens - 1 >= reserve:
+                self.tokens -= 1
+                return 0.0
+            return (reserve + 1 - self.tokens) / self.rate
+
+    def penalize(self, seconds: float):
+        with self._lock:
+            self.updated = time.monotonic()
+            self.tokens = -seconds * self.rate
+
+
+class RedisTokenBucket:
+    """Token bucket shared across processes through a Redis hash."""
+
+    blocking = True
+
+    def __init__(self, client: redis.Redis, key: str, rate: float, capacity: float):
+        self.client = client
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity
+
+    def try_acquire(self, reserve: float) -> float:
+        return float(self.client.eval(_ACQUIRE_SCRIPT, 1, self.key, self.rate, self.capacity, reserve))
+
+    def penalize(self, seconds: float):
+        self.client.eval(_PENALIZE_SCRIPT, 1, self.key, self.rate, seconds)
+
+
+class RateLimiter:
+    """Priority-aware limiter that picks the Redis bucket when Redis is reachable."""
+
+    def __init__(
+        self,
+        rate_per_minute: Optional[float] = None,
+        burst: Optional[float] = None,
+        key: str = "ratelimit:coingecko",
+        redis_client: Optional[redis.Redis] = None,
+    ):
+        self.rate = (rate_per_minute or settings.COINGECKO_RATE_LIMIT_PER_MINUTE) / 60.0
+        self.capacity = burst or settings.COINGECKO_RATE_LIMIT_BURST
+        self.key = key
+        self._redis_client = redis_client
+        self._local = LocalTokenBucket(self.rate, self.capacity)
+        self.calls = 0
+        self.total_wait = 0.0
+
+    def _bucket(self):
+        client = self._redis_client or get_redis()
+        if client is None:
+            return self._local
+        return RedisTokenBucket(client, self.key, self.rate, self.capacity)
+
+    async def _call(self, method: str, *args) -> float:
+        if self._redis_client is None and connect_pending():
+            # The connect attempt blocks; keep it off the shared client loop
+            await asyncio.to_thread(get_redis)
+        bucket = self._bucket()
+        try:
+            if bucket.blocking:
+                return await asyncio.to_thread(getattr(bucket, method), *args)
+            return getattr(bucket, method)(*args)
+        except redis.RedisError as e:
+            logger.warning(f"Redis rate limiter failed, using in-process bucket: {e}")
+            if self._redis_client is None and isinstance(e, (redis.ConnectionError, redis.TimeoutError)):
+                mark_unavailable(e)
+            return getattr(self._local, method)(*args)
+
+    async def acquire(self, priority: int = PRIORITY_NORMAL, max_wait: Optional[float] = None) -> float:
+        """
+        Wait until a token is available for this priority.
+        Returns the number of seconds spent waiting.
+        """
+        reserve = self.capacity * RESERVE_FRACTIONS.get(priority, RESERVE_FRACTIONS[PRIORITY_LOW])
+        start = time.monotonic()
+
+        while True:
+            wait = await self._call("try_acquire", reserve)
+            waited = time.monotonic() - start
+            if wait <= 0:
+                self.calls += 1
+                self.total_wait += waited
+                return waited
+            if max_wait is not None and waited + wait > max_wait:
+                raise RateLimitTimeout(f"Rate limit wait of {wait:.2f}s exceeds {max_wait:.2f}s")
+            # Jitter so waiting callers do not retry in lockstep
+            await asyncio.sleep(min(wait, 1.0) * random.uniform(1.0, 1.2))
+
+    async def penalize(self, seconds: float):
+        """Pause every caller for `seconds`, e.g. after a 429 with Retry-After."""
+        logger.warning(f"CoinGecko rate limited us, pausing upstream calls for {seconds:.1f}s")
+        await self._call("penalize", seconds)
@@ -0,0 +1,70 @@
+"""
+Shared Redis connection.
+
+Redis is optional: helpers that can use it call get_redis() and fall back to
+in-process state when it returns None. Finding out means a blocking connect of
+up to 2s, after which the answer is cached; async callers check
+connect_pending() and resolve it in a thread first.
+"""
+
+import logging
+import threading
+import time
+from typing import Optional
+
+import redis
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# How long to wait before retrying after Redis was found unreachable
+RETRY_AFTER_SECONDS = 30
+
+_client: Optional[redis.Redis] = None
+_unavailable_until = 0.0
+_lock = threading.Lock()
+
+
+def get_redis() -> Optional[redis.Redis]:
+    """Return the shared Redis client, or None when Redis is not reachable."""
+    global _client, _unavailable_until
+    if _client is not None:
+        return _client
+
+    with _lock:
+        if _client is not None or time.monotonic() < _unavailable_until:
+            return _client
+        try:
+            client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+            client.ping()
+            _client = client
+            logger.info("Connected to Redis")
+        except redis.RedisError as e:
+            _unavailable_until = time.monotonic() + RETRY_AFTER_SECONDS
+            logger.warning(f"Redis unavailable, using in-process fallback: {e}")
+        return _client
+
+
+def connect_pending() -> bool:
+    """True when the next get_redis() would try to connect (and may block)."""
+    return _client is None and time.monotonic() >= _unavailable_until
+
+
+def mark_unavailable(error: Exception):
+    """Drop the shared client after a connection failure and back off before reconnecting."""
+    global _client, _unavailable_until
+    with _lock:
+        if _client is None:
+            return
+        _client = None
+        _unavailable_until = time.monotonic() + RETRY_AFTER_SECONDS
+    logger.warning(f"Lost Redis, using in-process fallback for {RETRY_AFTER_SECONDS}s: {error}")
+
+
+def set_redis(client: Optional[redis.Redis]):
+    """Replace the shared client (e.g. with a local Redis stand-in)."""
+    global _client, _unavailable_until
+    with _lock:
+        _client = client
+        _unavailable_until = 0.0 if client is not None else float("inf")
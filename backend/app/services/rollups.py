@@ -0,0 +1,167 @@
+"""
+Multi-resolution OHLC rollups of price_points (PostgreSQL).
+
+    ticks -> 1m buckets -> 1h buckets -> 1d buckets
+
+build_rollups() runs incrementally. It reads the ticks added since the last
+run (by id, kept in rollup_watermarks), works out which buckets they fall in,
+and recomputes only those buckets from their source: ticks for 1m, 1m
+buckets for 1h, and 1h buckets for 1d. Recomputing a bucket is idempotent,
+so each run re-reads a small id overlap to pick up transactions that
+committed out of id order.
+
+get_candles() answers chart reads from the rollups. It picks the finest
+resolution whose bucket count for the range fits the point budget.
+"""
+
+import datetime
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import PricePoint, PriceRollup, RollupWatermark
+
+logger = logging.getLogger(__name__)
+
+WATERMARK = "price_rollups"
+
+# Finest first: (name, bucket seconds, date_trunc unit)
+RESOLUTIONS: List[Tuple[str, int, str]] = [
+    ("1m", 60, "minute"),
+    ("1h", 3600, "hour"),
+    ("1d", 86400, "day"),
+]
+
+# Ids below the watermark that are read again in case they committed late
+ID_OVERLAP = 10000
+
+_TICK_BUCKETS_SQL = """
+WITH affected AS (
+    SELECT DISTINCT coin_id, date_trunc('minute', timestamp) AS bucket
+    FROM price_points
+    WHERE id > :low AND id <= :high AND coin_id IS NOT NULL
+)
+INSERT INTO price_rollups (coin_id, symbol, resolution, bucket, open, high, low, close, ticks, updated_at)
+SELECT a.coin_id, max(p.symbol), '1m', a.bucket,
+       (array_agg(p.price ORDER BY p.timestamp))[1], max(p.price), min(p.price),
+       (array_agg(p.price ORDER BY p.timestamp DESC))[1], count(*), now()
+FROM affected a
+JOIN price_points p
+  ON p.coin_id = a.coin_id AND p.timestamp >= a.bucket AND p.timestamp < a.bucket + interval '1 minute'
+GROUP BY a.coin_id, a.bucket
+ON CONFLICT (coin_id, resolution, bucket) DO UPDATE
+SET symbol = EXCLUDED.symbol, open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low,
+    close = EXCLUDED.close, ticks = EXCLUDED.ticks, updated_at = EXCLUDED.updated_at
+"""
+
+# Rebuilds :target buckets from the :source buckets inside them
+_ROLLUP_BUCKETS_SQL = """
+WITH affected AS (
+    SELECT DISTINCT coin_id, date_trunc('{unit}', timestamp) AS bucket
+    FROM price_points
+    WHERE id > :low AND id <= :high AND coin_id IS NOT NULL
+)
+INSERT INTO price_rollups (coin_id, symbol, resolution, bucket, open, high, low, close, ticks, updated_at)
+SELECT a.coin_id, max(r.symbol), :target, a.bucket,
+       (array_agg(r.open ORDER BY r.bucket))[1], max(r.high), min(r.low),
+       (array_agg(r.close ORDER BY r.bucket DESC))[1], sum(r.ticks), now()
+FROM affected a
+JOIN price_rollups r
+  ON r.coin_id = a.coin_id AND r.resolution = :source
+ AND r.bucket >= a.bucket AND r.bucket < a.bucket + interval '1 {unit}'
+GROUP BY a.coin_id, a.bucket
+ON CONFLICT (coin_id, resolution, bucket) DO UPDATE
+SET symbol = EXCLUDED.symbol, open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low,
+    close = EXCLUDED.close, ticks = EXCLUDED.ticks, updated_at = EXCLUDED.updated_at
+"""
+
+
+def _get_watermark(db: Session) -> RollupWatermark:
+    watermark = db.get(RollupWatermark, WATERMARK)
+    if watermark is None:
+        watermark = RollupWatermark(name=WATERMARK, last_id=0)
+        db.add(watermark)
+        db.flush()
+    return watermark
+
+
+def build_rollups(db: Session, batch_size: Optional[int] = None) -> Dict[str, Any]:
+    """Fold ticks added since the last run into the 1m/1h/1d buckets. Commits after each batch."""
+    start = time.perf_counter()
+    batch_size = batch_size or settings.ROLLUP_BATCH_SIZE
+    watermark = _get_watermark(db)
+    max_id = db.query(func.max(PricePoint.id)).scalar() or 0
+    low = max(0, watermark.last_id - ID_OVERLAP)
+
+    buckets = {name: 0 for name, _, _ in RESOLUTIONS}
+    batches = 0
+    while low < max_id:
+        high = min(low + batch_size, max_id)
+        params = {"low": low, "high": high}
+        buckets["1m"] += db.execute(text(_TICK_BUCKETS_SQL), params).rowcount
+        for (source, _, _), (target, _, unit) in zip(RESOLUTIONS, RESOLUTIONS[1:]):
+            buckets[target] += db.execute(
+                text(_ROLLUP_BUCKETS_SQL.format(unit=unit)),
+                {**params, "source": source, "target": target},
+            ).rowcount
+        watermark.last_id = max(watermark.last_id, high)
+        watermark.updated_at = datetime.datetime.utcnow()
+        db.commit()
+        low = high
+        batches += 1
+
+    pruned = _prune_minute_buckets(db)
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+    if batches:
+        logger.info(f"Rolled up ticks to id {watermark.last_id}: {buckets} buckets in {elapsed_ms}ms")
+    return {"last_id": watermark.last_id, "batches": batches, "buckets": buckets, "pruned": pruned, "elapsed_ms": elapsed_ms}
+
+
+def _prune_minute_buckets(db: Session) -> int:
+    """1m buckets are only kept for ROLLUP_MINUTE_RETENTION_DAYS; 1h and 1d are kept."""
+    if settings.ROLLUP_MINUTE_RETENTION_DAYS <= 0:
+        return 0
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=settings.ROLLUP_MINUTE_RETENTION_DAYS)
+    deleted = (
+        db.query(PriceRollup)
+        .filter(PriceRollup.resolution == "1m", PriceRollup.bucket < cutoff)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
+
+
+def pick_resolution(start: datetime.datetime, end: datetime.datetime, max_points: int) -> str:
+    """Finest resolution with at most max_points buckets in [start, end); 1d when nothing finer fits."""
+    span = (end - start).total_seconds()
+    for name, seconds, _ in RESOLUTIONS:
+        if span / seconds <= max_points:
+            return name
+    return RESOLUTIONS[-1][0]
+
+
+def get_candles(
+    db: Session,
+    coin_id: str,
+    start: datetime.datetime,
+    end: datetime.datetime,
+    max_points: int,
+) -> Tuple[str, List[PriceRollup]]:
+    """OHLC buckets for coin_id in [start, end) at the resolution picked for max_points."""
+    resolution = pick_resolution(start, end, max_points)
+    rows = (
+        db.query(PriceRollup)
+        .filter(
+            PriceRollup.coin_id == coin_id,
+            PriceRollup.resolution == resolution,
+            PriceRollup.bucket >= start,
+            PriceRollup.bucket < end,
+        )
+        .order_by(PriceRollup.bucket)
+        .all()
+    )
+    return resolution, rows
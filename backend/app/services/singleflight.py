@@ -0,0 +1,40 @@
+"""
+Single-flight coalescing for upstream calls.
+
+Concurrent callers asking for the same key share one in-flight call and its
+result (or exception) instead of each sending their own request.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Deduplicates concurrent coroutine calls by key on one event loop."""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() unless a call for key is already in flight, then await its result."""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.shared += 1
+            logger.debug(f"Joining in-flight call for {key}")
+        else:
+            self.calls += 1
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+
+        # shield so one cancelled waiter does not cancel the shared call
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
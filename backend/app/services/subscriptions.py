@@ -0,0 +1,98 @@
+"""
+Set of coins being ingested, with the number of users watching each.
+
+The watchlist routes increment and decrement the coin_subscriptions row in the
+same transaction as the watchlist change, so readers get the active universe
+from one small table instead of a DISTINCT over every watchlist row.
+"""
+
+import datetime
+import logging
+from typing import Dict, List
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models import CoinSubscription, WatchlistItem
+
+logger = logging.getLogger(__name__)
+
+
+def subscribe(db: Session, coin_id: str, symbol: str):
+    """Count one more watcher for coin_id. The caller commits."""
+    now = datetime.datetime.utcnow()
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(CoinSubscription).values(coin_id=coin_id, symbol=symbol, watchers=1, updated_at=now)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["coin_id"],
+            set_={"watchers": CoinSubscription.watchers + 1, "symbol": symbol, "updated_at": now},
+        )
+        db.execute(stmt)
+        return
+
+    subscription = db.get(CoinSubscription, coin_id)
+    if subscription is None:
+        db.add(CoinSubscription(coin_id=coin_id, symbol=symbol, watchers=1, updated_at=now))
+    else:
+        subscription.watchers += 1
+        subscription.updated_at = now
+
+
+def unsubscribe(db: Session, coin_id: str):
+    """Count one watcher less for coin_id, dropping the coin at zero. The caller commits."""
+    db.query(CoinSubscription).filter(CoinSubscription.coin_id == coin_id).update(
+        {
+            CoinSubscription.watchers: CoinSubscription.watchers - 1,
+            CoinSubscription.updated_at: datetime.datetime.utcnow(),
+        },
+        synchronize_session=False,
+    )
+    db.query(CoinSubscription).filter(
+        CoinSubscription.coin_id == coin_id,
+        CoinSubscription.watchers <= 0,
+    ).delete(synchronize_session=False)
+
+
+def active_coins(db: Session) -> Dict[str, str]:
+    """coin_id -> symbol for every coin with at least one watcher."""
+    rows = (
+        db.query(CoinSubscription.coin_id, CoinSubscription.symbol)
+        .filter(CoinSubscription.watchers > 0)
+        .all()
+    )
+    return {coin_id: symbol for coin_id, symbol in rows}
+
+
+def active_subscriptions(db: Session) -> List[CoinSubscription]:
+    return db.query(CoinSubscription).filter(CoinSubscription.watchers > 0).all()
+
+
+def rebuild(db: Session) -> int:
+    """
+    Recount every subscription from the watchlist table.
+    Used to backfill the table and to repair drift; commits.
+    """
+    rows = (
+        db.query(
+            WatchlistItem.coin_id,
+            func.min(WatchlistItem.symbol),
+            func.count(func.distinct(WatchlistItem.user_id)),
+        )
+        .filter(WatchlistItem.coin_id.isnot(None))
+        .group_by(WatchlistItem.coin_id)
+        .all()
+    )
+    now = datetime.datetime.utcnow()
+    db.query(CoinSubscription).delete(synchronize_session=False)
+    db.add_all(
+        CoinSubscription(coin_id=coin_id, symbol=symbol, watchers=watchers, updated_at=now)
+        for coin_id, symbol, watchers in rows
+    )
+    db.commit()
+    logger.info(f"Rebuilt {len(rows)} coin subscriptions from the watchlist")
+    return len(rows)
@@ -0,0 +1,99 @@
+"""
+Stale-while-revalidate cache for data loaded from upstream.
+
+Fresh entries are served as they are. Entries past their fresh period are
+still served at once, with their age, while one background refresh per key
+replaces them. Only a key with no usable entry makes the caller wait for the
+loader, so an upstream outage costs requests nothing as long as some last
+good data exists.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+HIT = "HIT"
+STALE = "STALE"
+MISS = "MISS"
+
+# Shared by every cache; refreshes are short upstream calls
+_refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="swr-refresh")
+
+
+class CacheResult:
+    """A cached value plus how it was served."""
+
+    def __init__(self, value: Any, status: str, age: float):
+        self.value = value
+        self.status = status
+        self.age = age
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"X-Cache-Status": self.status, "Age": str(int(self.age))}
+
+
+class SWRCache:
+    """Thread-safe in-process cache; loaders are plain sync callables."""
+
+    def __init__(self, name: str, fresh_seconds: float, max_stale_seconds: float, max_entries: int = 1000):
+        self.name = name
+        self.fresh_seconds = fresh_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[Any, float]] = {}
+        self._refreshing: Set[Hashable] = set()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> CacheResult:
+        """Return the cached value for key, loading or refreshing it as needed."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = now - stored_at
+            if age < self.fresh_seconds:
+                return CacheResult(value, HIT, age)
+            if age < self.max_stale_seconds:
+                self._refresh_in_background(key, loader)
+                return CacheResult(value, STALE, age)
+
+        try:
+            value = loader()
+        except Exception:
+            if entry is None:
+                raise
+            # Past max_stale_seconds, but still better than an error
+            return CacheResult(entry[0], STALE, now - entry[1])
+        self.set(key, value)
+        return CacheResult(value, MISS, 0.0)
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                # Drop the oldest entry to stay bounded
+                oldest = min(self._entries, key=lambda k: self._entries[k][1])
+                del self._entries[oldest]
+            self._entries[key] = (value, time.time())
+
+    def _refresh_in_background(self, key: Hashable, loader: Callable[[], Any]):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.set(key, loader())
+            except Exception as e:
+                logger.warning(f"Background refresh of {self.name} {key} failed, keeping stale data: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        _refresh_pool.submit(refresh)
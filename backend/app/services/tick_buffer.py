@@ -0,0 +1,227 @@
+"""
+In-process ring buffer of recent ticks per coin.
+
+Each coin gets two preallocated typed arrays (uint32 epoch seconds and float64
+prices) used as a ring, so memory per coin is fixed at 12 bytes x
+TICK_BUFFER_CAPACITY, however long the process runs. Sparklines, 24h change
+and short-range series are read from memory without a database query.
+
+Ticks come in three ways: warm() loads the last TICK_BUFFER_HOURS from
+price_points on startup; ingestion running in this process appends what it
+writes; and catch_up() reads ticks other processes (Celery workers) stored
+since the last id seen, within the same window. Ids are handed out before
+commit, so a writer can commit a lower id after a higher one was read;
+catch_up() re-reads the last CATCH_UP_ID_OVERLAP ids to pick those up, and
+ticks it already has are ignored. Readers call catch_up() at most every
+CATCH_UP_INTERVAL_SECONDS. Until warm() has finished, appends and
+catch-ups are skipped: warm() starts from the id high-water mark it read
+first, so nothing written meanwhile is missed.
+"""
+
+import bisect
+import datetime
+import logging
+import threading
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import PricePoint
+
+logger = logging.getLogger(__name__)
+
+CATCH_UP_INTERVAL_SECONDS = 5
+CATCH_UP_BATCH_SIZE = 50000
+# A few concurrent write chunks' worth of ids
+CATCH_UP_ID_OVERLAP = 5000
+
+
+def _epoch(timestamp: datetime.datetime) -> int:
+    return int(timestamp.replace(tzinfo=datetime.timezone.utc).timestamp())
+
+
+def _window_start() -> datetime.datetime:
+    return datetime.datetime.utcnow() - datetime.timedelta(hours=settings.TICK_BUFFER_HOURS)
+
+
+class CoinRing:
+    """Fixed-capacity ring of (timestamp, price) with timestamps strictly increasing."""
+
+    __slots__ = ("capacity", "times", "prices", "start", "size")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.times = array("I", bytes(4 * capacity))
+        self.prices = array("d", bytes(8 * capacity))
+        self.start = 0
+        self.size = 0
+
+    def last_time(self) -> int:
+        if not self.size:
+            return 0
+        return self.times[(self.start + self.size - 1) % self.capacity]
+
+    def append(self, timestamp: int, price: float) -> bool:
+        """Add a tick; ticks not newer than the last one are ignored."""
+        if self.size and timestamp <= self.last_time():
+            return False
+        if self.size < self.capacity:
+            index = (self.start + self.size) % self.capacity
+            self.size += 1
+        else:
+            index = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.times[index] = timestamp
+        self.prices[index] = price
+        return True
+
+    def since(self, timestamp: int) -> Tuple[List[int], List[float]]:
+        """Ticks at or after timestamp, oldest first."""
+        times = self._ordered(self.times)
+        first = bisect.bisect_left(times, timestamp)
+        return times[first:], self._ordered(self.prices)[first:]
+
+    def _ordered(self, values: array) -> list:
+        end = self.start + self.size
+        if end <= self.capacity:
+            return values[self.start:end].tolist()
+        return values[self.start:].tolist() + values[:end - self.capacity].tolist()
+
+
+class TickBuffer:
+    """coin_id -> CoinRing, shared by every request thread of the process."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._rings: Dict[str, CoinRing] = {}
+        self._lock = threading.Lock()
+        self._last_id = 0
+        self._caught_up_at = 0.0
+        self._ready = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def append_rows(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Add price_points rows ({"coin_id", "price", "timestamp"}); returns ticks kept."""
+        if not self.ready:
+            # warm() or the first catch_up() will load these
+            return 0
+        return self._append(rows)
+
+    def _append(self, rows: Iterable[Dict[str, Any]]) -> int:
+        added = 0
+        with self._lock:
+            for row in sorted(rows, key=lambda r: r["timestamp"]):
+                ring = self._rings.get(row["coin_id"])
+                if ring is None:
+                    ring = self._rings[row["coin_id"]] = CoinRing(self.capacity)
+                added += ring.append(_epoch(row["timestamp"]), float(row["price"]))
+        return added
+
+    def series(self, coin_id: str, since: datetime.datetime) -> Tuple[List[int], List[float]]:
+        with self._lock:
+            ring = self._rings.get(coin_id)
+            if ring is None:
+                return [], []
+            return ring.since(_epoch(since))
+
+    def _load(self, result) -> int:
+        rows = [
+            {"coin_id": coin_id, "price": price, "timestamp": timestamp}
+            for _, coin_id, price, timestamp in result
+        ]
+        max_id = max((row_id for row_id, _, _, _ in result), default=0)
+        added = self._append(rows)
+        with self._lock:
+            self._last_id = max(self._last_id, max_id)
+        return added
+
+    def warm(self, db: Session) -> int:
+        """Load the last TICK_BUFFER_HOURS of ticks for every coin, then start taking new ones."""
+        start = time.perf_counter()
+        # Anything stored after this point is left to catch_up()
+        high_water = db.query(func.max(PricePoint.id)).scalar() or 0
+        result = (
+            db.query(PricePoint.id, PricePoint.coin_id, PricePoint.price, PricePoint.timestamp)
+            .filter(
+                PricePoint.timestamp >= _window_start(),
+                PricePoint.id <= high_water,
+                PricePoint.coin_id.isnot(None),
+            )
+            .order_by(PricePoint.timestamp)
+            .all()
+        )
+        loaded = self._load(result)
+        with self._lock:
+            self._last_id = max(self._last_id, high_water)
+        self._caught_up_at = time.monotonic()
+        self._ready.set()
+        logger.info(
+            f"Warmed tick buffer with {loaded} ticks for {len(self._rings)} coins "
+            f"in {(time.perf_counter() - start) * 1000:.0f}ms"
+        )
+        return loaded
+
+    def catch_up(self, db: Session, force: bool = False) -> int:
+        """Load ticks in the window stored by other processes since the last id seen."""
+        if not self.ready:
+            return 0
+        if not force and time.monotonic() - self._caught_up_at < CATCH_UP_INTERVAL_SECONDS:
+            return 0
+        self._caught_up_at = time.monotonic()
+        result = (
+            db.query(PricePoint.id, PricePoint.coin_id, PricePoint.price, PricePoint.timestamp)
+            .filter(
+                PricePoint.id > self._last_id - CATCH_UP_ID_OVERLAP,
+                PricePoint.timestamp >= _window_start(),
+                PricePoint.coin_id.isnot(None),
+            )
+            .order_by(PricePoint.id)
+            .limit(CATCH_UP_BATCH_SIZE)
+            .all()
+        )
+        return self._load(result)
+
+
+buffer = TickBuffer(settings.TICK_BUFFER_CAPACITY)
+
+
+def sparkline(coin_id: str, hours: float, points: int) -> Optional[Dict[str, Any]]:
+    """
+    Last `hours` of ticks for coin_id, thinned to at most `points` evenly spaced
+    samples (last tick in each slot), plus the change over the window.
+    """
+    since = datetime.datetime.utcnow() - datetime.timedelta(hours=hours)
+    times, prices = buffer.series(coin_id, since)
+    if not times:
+        return None
+
+    slot = hours * 3600 / points
+    first = _epoch(since)
+    sampled_times: List[int] = []
+    sampled_prices: List[float] = []
+    last_slot = -1
+    for timestamp, price in zip(times, prices):
+        current_slot = int((timestamp - first) // slot)
+        if current_slot == last_slot:
+            sampled_times[-1], sampled_prices[-1] = timestamp, price
+        else:
+            sampled_times.append(timestamp)
+            sampled_prices.append(price)
+            last_slot = current_slot
+
+    change_pct = (prices[-1] / prices[0] - 1) * 100 if prices[0] else None
+    return {
+        "coin_id": coin_id,
+        "price": prices[-1],
+        "as_of": datetime.datetime.utcfromtimestamp(times[-1]).isoformat(),
+        "change_pct": round(change_pct, 4) if change_pct is not None else None,
+        "timestamps": sampled_times,
+        "prices": sampled_prices,
+    }
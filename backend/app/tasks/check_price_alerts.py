@@ -1,6 +1,6 @@
 from app.database import SessionLocal
-from app.models import AlertsItem, PricePoint, User
-from sqlalchemy import func
+from app.models import AlertsItem, User
+from app.services import locks, price_cache
 from celery import shared_task
 import smtplib
 from email.mime.text import MIMEText
@@ -11,11 +11,30 @@ from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Overlapping checks would email the same alert twice before it is deleted
+ALERT_CHECK_LOCK = "check_price_alerts"
+ALERT_CHECK_LOCK_SECONDS = 600
+
+
 @shared_task(name="app.tasks.check_price_alerts")
 def check_price_alerts():
     """
     Check all price alerts and send notifications when target prices are met.
+    Only one check runs at a time across workers. A check that finds one
+    already running is skipped; alerts it would have caught stay stored and
+    are picked up by the check after the next write.
     """
+    token = locks.claim(ALERT_CHECK_LOCK, ttl=ALERT_CHECK_LOCK_SECONDS)
+    if token is None:
+        logger.info("Price alert check already running, skipping")
+        return {"status": "skipped", "alerts_sent": 0}
+    try:
+        return _check_price_alerts()
+    finally:
+        locks.release(ALERT_CHECK_LOCK, token)
+
+
+def _check_price_alerts():
     db = SessionLocal()
     try:
         # Get all alerts
@@ -25,28 +44,8 @@ def check_price_alerts():
             logger.info("No price alerts")
             return {"status": "success", "alerts_sent": 0}
 
-        # Get latest prices
-        subquery = (
-            db.query(
-                PricePoint.symbol,
-                func.max(PricePoint.timestamp).label("max_timestamp")
-            )
-            .group_by(PricePoint.symbol)
-            .subquery()
-        )
-
-        latest_prices = (
-            db.query(PricePoint)
-            .join(
-                subquery,
-                (PricePoint.symbol == subquery.c.symbol) &
-                (PricePoint.timestamp == subquery.c.max_timestamp)
-            )
-            .all()
-        )
-
-        # Create price lookup dict
-        price_dict = {price.symbol.upper(): price.price for price in latest_prices}
+        # Latest price per alerted symbol, from the shared price cache first
+        price_dict = price_cache.get_latest_by_symbol(db, {alert.symbol for alert in alerts})
 
         alerts_sent = 0
         alerts_checked = 0
@@ -1,10 +1,20 @@
 from app.database import SessionLocal
-from app.models import PricePoint, Coin, WatchlistItem, User, AlertsItem
+from app.models import Coin, WatchlistItem, User, AlertsItem
 import datetime
-from celery import shared_task
+import json
+import random
+import uuid
+import time
+from typing import Any, Dict, List, Optional
+from celery import chord, group, shared_task
 import logging
-from pycoingecko import CoinGeckoAPI
 from app.config import settings
+from app.services import coingecko
+from app.services.ingestion_pipeline import run_price_ingestion
+from app.services.catalog_sync import sync_coin_catalog
+from app.services import locks, poll_scheduler, price_cache, subscriptions
+from app.services.redis_client import get_redis
+import redis
 from sqlalchemy import func
 import smtplib
 from email.mime.text import MIMEText
@@ -13,14 +23,31 @@ from email.mime.multipart import MIMEMultipart
 
 logger = logging.getLogger(__name__)
 
-cg = CoinGeckoAPI(demo_api_key=settings.COINGECKO_API_KEY)
+
+# Overlapping checks would email the same alert twice before it is deleted
+ALERT_CHECK_LOCK = "check_price_alerts"
+ALERT_CHECK_LOCK_SECONDS = 600
 
 
 def check_price_alerts():
-    logger.info("Checking price alerts")
     """
     Check all price alerts and send notifications when target prices are met.
+    Only one check runs at a time across workers. A check that finds one
+    already running is skipped; alerts it would have caught stay stored and
+    are picked up by the check after the next write.
     """
+    token = locks.claim(ALERT_CHECK_LOCK, ttl=ALERT_CHECK_LOCK_SECONDS)
+    if token is None:
+        logger.info("Price alert check already running, skipping")
+        return {"status": "skipped", "alerts_sent": 0}
+    try:
+        return _check_price_alerts()
+    finally:
+        locks.release(ALERT_CHECK_LOCK, token)
+
+
+def _check_price_alerts():
+    logger.info("Checking price alerts")
     db = SessionLocal()
     try:
         # Get all alerts
@@ -30,28 +57,8 @@ def check_price_alerts():
             logger.info("No price alerts")
             return {"status": "success", "alerts_sent": 0}
 
-        # Get latest prices
-        subquery = (
-            db.query(
-                PricePoint.symbol,
-                func.max(PricePoint.timestamp).label("max_timestamp")
-            )
-            .group_by(PricePoint.symbol)
-            .subquery()
-        )
-
-        latest_prices = (
-            db.query(PricePoint)
-            .join(
-                subquery,
-                (PricePoint.symbol == subquery.c.symbol) &
-                (PricePoint.timestamp == subquery.c.max_timestamp)
-            )
-            .all()
-        )
-
-        # Create price lookup dict
-        price_dict = {price.symbol.upper(): price.price for price in latest_prices}
+        # Latest price per alerted symbol, from the shared price cache first
+        price_dict = price_cache.get_latest_by_symbol(db, {alert.symbol for alert in alerts})
 
         alerts_sent = 0
         alerts_checked = 0
@@ -201,141 +208,275 @@ This is an automated alert from Crypto Price Tracker.
         logger.error(f"Failed to send email to {user_email}: {e}")
         raise
 
+def _retry_countdown(retries: int) -> float:
+    """Exponential backoff with full jitter, so retried batches do not fire together."""
+    ceiling = min(settings.INGEST_RETRY_BACKOFF_MAX_SECONDS, settings.INGEST_RETRY_BACKOFF_SECONDS * 2 ** retries)
+    return random.uniform(0, ceiling)
+
+
+def _chords_supported() -> bool:
+    # The rpc:// backend delivers results to the caller only and cannot run chord callbacks
+    return not settings.CELERY_RESULT_BACKEND.startswith("rpc")
+
+
+# Batch summaries of a group-mode run by batch index, kept in Redis until the last batch finishes
+RUN_RESULTS_KEY = "ingest_run:{run_id}:results"
+RUN_SUMMARY_LOCK = "ingest_run:{run_id}:summary"
+RUN_RESULTS_TTL_SECONDS = 86400
+
+
+def _collect_batch_result(run: Dict[str, Any], summary: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Store one batch summary under its batch index. Returns every summary of the
+    run to the one batch that completes it, None to the others. A redelivered
+    or retried batch overwrites its own entry instead of being counted twice.
+    Runs of more than one batch raise redis.RedisError without Redis.
+    """
+    if run["batches"] == 1:
+        results = [summary]
+    else:
+        client = get_redis()
+        if client is None:
+            raise redis.ConnectionError("Redis unavailable")
+        key = RUN_RESULTS_KEY.format(run_id=run["id"])
+        pipe = client.pipeline()
+        pipe.hset(key, str(run["index"]), json.dumps(summary))
+        pipe.expire(key, RUN_RESULTS_TTL_SECONDS)
+        pipe.hlen(key)
+        _, _, collected = pipe.execute()
+        if collected < run["batches"]:
+            return None
+        results = [json.loads(item) for item in client.hvals(key)]
+    # A redelivered batch can find the run complete again; only one summarizes it
+    if locks.claim(RUN_SUMMARY_LOCK.format(run_id=run["id"]), ttl=RUN_RESULTS_TTL_SECONDS) is None:
+        return None
+    return results
+
+
+def dispatch_price_ingestion(symbol_map: Dict[str, str], dry_run: bool = False, reason: str = "run") -> Dict[str, Any]:
+    """
+    Split an ingestion run into one subtask per planned upstream batch.
+    The batches run in parallel across the worker pool. Once everything is
+    stored their summaries are combined and alerts checked once: by a chord
+    callback where the result backend supports chords, otherwise by the batch
+    that finishes last, counted in Redis. Without either, nothing can tell
+    when the last batch is done, so the run goes out as one subtask.
+    """
+    coin_ids = list(symbol_map)
+    batches = coingecko.get_client().plan_price_batches(coin_ids, include_last_updated_at=True)
+    started_at = time.time()
+
+    if _chords_supported():
+        header = group(
+            ingest_price_batch.s({coin_id: symbol_map[coin_id] for coin_id in batch}, dry_run)
+            for batch in batches
+        )
+        result = chord(header)(summarize_price_ingestion.s(started_at, len(coin_ids), reason))
+        mode = "chord"
+    else:
+        run = {
+            "id": uuid.uuid4().hex,
+            "batches": len(batches),
+            "started_at": started_at,
+            "coins_requested": len(coin_ids),
+            "reason": reason,
+        }
+        if get_redis() is not None:
+            result = group(
+                ingest_price_batch.s({coin_id: symbol_map[coin_id] for coin_id in batch}, dry_run, {**run, "index": i})
+                for i, batch in enumerate(batches)
+            ).apply_async()
+            mode = "group"
+        else:
+            result = ingest_price_batch.delay(symbol_map, dry_run, {**run, "batches": 1, "index": 0})
+            mode = "single"
+
+    logger.info(f"Dispatched {reason}: {len(coin_ids)} coins in {len(batches)} batch subtasks ({mode})")
+    return {
+        "status": "dispatched",
+        "mode": mode,
+        "reason": reason,
+        "coins_requested": len(coin_ids),
+        "batches": len(batches),
+        "task_id": result.id,
+    }
+
+
+@shared_task(name="app.tasks.ingest_price_batch", bind=True, max_retries=settings.INGEST_BATCH_MAX_RETRIES)
+def ingest_price_batch(self, symbol_map: Dict[str, str], dry_run: bool = False, run: Optional[Dict[str, Any]] = None):
+    """
+    Fetch and store one upstream batch of prices.
+    Upstream failures are retried with jittered backoff; once retries are used up
+    the batch reports an error summary instead of failing the whole run.
+    In group and single mode (run given) the batch that finishes the run
+    summarizes it.
+    """
+    try:
+        summary, _ = run_price_ingestion(list(symbol_map), symbol_map, dry_run=dry_run, fail_fast=True)
+        summary["retries"] = self.request.retries
+        summary["fetch_seconds"] = summary["stages"]["fetch"]["seconds"]
+        summary["write_seconds"] = summary["stages"]["write"]["seconds"]
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            countdown = _retry_countdown(self.request.retries)
+            logger.warning(f"Batch of {len(symbol_map)} coins failed ({e}), retrying in {countdown:.1f}s")
+            raise self.retry(exc=e, countdown=countdown)
+        logger.error(f"Batch of {len(symbol_map)} coins failed after {self.request.retries} retries: {e}")
+        summary = {
+            "status": "error",
+            "message": str(e),
+            "coins_requested": len(symbol_map),
+            "retries": self.request.retries,
+        }
+
+    if run is not None:
+        try:
+            results = _collect_batch_result(run, summary)
+        except redis.RedisError as e:
+            # Lost Redis mid-run: summarize this batch alone and leave the alert
+            # check to the last batch of the run
+            logger.warning(f"Could not collect batch result for run {run['id']}: {e}")
+            summarize_price_ingestion(
+                [summary], run["started_at"], len(symbol_map), run["reason"],
+                check_alerts=run["index"] == run["batches"] - 1,
+            )
+        else:
+            if results is not None:
+                summarize_price_ingestion(results, run["started_at"], run["coins_requested"], run["reason"])
+    return summary
+
+
+@shared_task(name="app.tasks.summarize_price_ingestion")
+def summarize_price_ingestion(
+    results: List[Dict[str, Any]],
+    started_at: float,
+    coins_requested: int,
+    reason: str = "run",
+    check_alerts: bool = True,
+):
+    """
+    Combine per-batch summaries into one run summary and check alerts.
+    Runs as the chord callback, or is called by the last batch of a group run.
+    """
+    succeeded = [r for r in results if r.get("status") == "success"]
+    summary = {
+        "status": "success" if succeeded else "error",
+        "reason": reason,
+        "coins_requested": coins_requested,
+        "batches": len(results),
+        "failed_batches": sum(1 for r in results if r.get("status") != "success"),
+        "retries": sum(r.get("retries", 0) for r in results),
+        "upstream_calls": sum(r.get("upstream_calls", 0) for r in results),
+        "rows_written": sum(r.get("rows_written", 0) for r in results),
+        "unchanged": sum(r.get("unchanged", 0) for r in results),
+        # Summed over batches, so more than the elapsed time when they overlap
+        "fetch_seconds": round(sum(r.get("fetch_seconds", 0.0) for r in results), 4),
+        "write_seconds": round(sum(r.get("write_seconds", 0.0) for r in results), 4),
+        "elapsed_ms": round((time.time() - started_at) * 1000, 2),
+    }
+    logger.info(
+        f"Ingestion {reason} finished: {summary['rows_written']}/{coins_requested} coins stored "
+        f"from {summary['batches']} batches ({summary['failed_batches']} failed) in {summary['elapsed_ms']}ms"
+    )
+    if check_alerts and summary["rows_written"]:
+        check_price_alerts()
+    return summary
+
+
 @shared_task(name="app.tasks.fetch_and_store_prices")
-def fetch_and_store_prices():
-    print("="*60, "Fetch prices celery task called")
+def fetch_and_store_prices(dry_run: bool = False):
+    """Refresh every watched coin, fanned out as per-batch subtasks."""
     db = SessionLocal()
     try:
-        # Get all unique coin_ids from watchlist
-        watchlist_coins = (
-            db.query(WatchlistItem.coin_id, WatchlistItem.symbol)
-            .distinct(WatchlistItem.coin_id)
-            .filter(WatchlistItem.coin_id.isnot(None))
-            .all()
-        )
-        
-        if not watchlist_coins:
-            logger.info("No coins in any watchlist")
-            return {"status": "success", "symbols": 0}
-        
-        coin_ids = [c[0] for c in watchlist_coins]
-        symbol_map = {c[0]: c[1] for c in watchlist_coins}
+        symbol_map = subscriptions.active_coins(db)
+    finally:
+        db.close()
 
+    if not symbol_map:
+        logger.info("No coins in any watchlist")
+        return {"status": "success", "symbols": 0}
 
-        logger.info(f"Fetching prices for {len(coin_ids)} coins from watchlist")
-        
-        # Get symbol mapping from Coin table
-        coins = db.query(Coin).all()
-        coin_id_to_symbol = {c.coin_id: c.symbol for c in coins}
-        
-        # Fetch prices in batches from CoinGecko
-        batch_size = 10
-        all_prices = {}
-        
-        cg = CoinGeckoAPI()
-        
-        for i in range(0, len(coin_ids), batch_size):
-            batch = coin_ids[i:i + batch_size]
-            ids_str = ",".join(batch)
-            
-            try:
-                logger.info(f"Fetching batch {i//batch_size + 1}/{(len(coin_ids) + batch_size - 1)//batch_size}...")
-                
-                response = cg.get_price(
-                    ids=ids_str,
-                    vs_currencies="usd",
-                    include_market_cap=False,
-                    include_24hr_vol=False,
-                    include_last_updated_at=False
-                )
-                
-                all_prices.update(response)
-                logger.info(f"Batch {i//batch_size + 1} returned {len(response)} prices")
-                logger.info(f"Prices returned {response}")
-            except Exception as e:
-                logger.error(f"Error fetching batch {i//batch_size}: {e}")
-                continue
-        
-        if not all_prices:
-            logger.warning("No prices returned from CoinGecko")
-            return {"status": "error", "message": "No prices from API"}
-        
-        # Insert price points
-        timestamp = datetime.datetime.utcnow()
-        prices_added = 0
-        
-        for coin_id, price_data in all_prices.items():
-            logger.info(f"Processing {coin_id}: {price_data}")
-            
-            if isinstance(price_data, dict) and "usd" in price_data:
-                symbol = symbol_map.get(coin_id, coin_id.upper())
-                price_raw = price_data["usd"]
-                price = float(price_raw)
-                
-                logger.info(f"✓ {symbol} ({coin_id}): {price}")
-                
-                # Add to database
-                price_point = PricePoint(
-                    symbol=symbol,
-                    price=price,
-                    timestamp=timestamp
-                )
-                db.add(price_point)
-                prices_added += 1                
-            else:
-                logger.warning(f"✗ No USD price for {coin_id}: {price_data}")
-        
-        db.commit()
+    logger.info(f"Fetching prices for {len(symbol_map)} coins from watchlist")
+    return dispatch_price_ingestion(symbol_map, dry_run=dry_run, reason="full refresh")
 
-        logger.info(f"Prices updated at {timestamp.isoformat()}: {prices_added} coins stored")
-        return {"status": "success", "symbols": prices_added, "timestamp": timestamp.isoformat()}
-        
-    except Exception as e:
-        logger.error(f"Error fetching prices: {e}", exc_info=True)
-        db.rollback()
-        return {"status": "error", "message": str(e)}
+
+@shared_task(name="app.tasks.poll_due_prices")
+def poll_due_prices():
+    """
+    Refresh the coins whose tier slot comes up this minute.
+    Scheduled every minute by Celery beat; see app.services.poll_scheduler.
+    Each minute is polled once however often it is queued.
+    """
+    minute = int(time.time() // 60)
+    if locks.claim(f"poll_due_prices:{minute}", ttl=120) is None:
+        logger.info(f"Minute {minute} already polled, skipping")
+        return {"status": "skipped", "symbols": 0, "minute": minute}
+
+    db = SessionLocal()
+    try:
+        assignments = poll_scheduler.get_assignments(db)
     finally:
         db.close()
-        check_price_alerts()
 
+    symbol_map = poll_scheduler.due_coins(assignments, minute)
+    if not symbol_map:
+        return {"status": "success", "symbols": 0, "minute": minute}
+
+    logger.info(f"Polling {len(symbol_map)} due coins for minute {minute}")
+    return {"minute": minute, **dispatch_price_ingestion(symbol_map, reason=f"poll minute {minute}")}
+
+
+@shared_task(name="app.tasks.refresh_stale_prices")
+def refresh_stale_prices():
+    """
+    Refresh watched coins that are overdue for their tier, stalest first.
+    Queued by /prices?refresh=true. Runs at most once per
+    REFRESH_INTERVAL_SECONDS across workers and makes no more upstream calls
+    than the poll schedule leaves spare, so it cannot push past the budget.
+    """
+    if locks.claim("refresh_stale_prices", ttl=poll_scheduler.REFRESH_INTERVAL_SECONDS) is None:
+        logger.info("Refresh ran recently, skipping")
+        return {"status": "skipped", "symbols": 0}
+
+    db = SessionLocal()
+    try:
+        assignments = poll_scheduler.get_assignments(db)
+        stale = poll_scheduler.stale_coins(db, assignments)
+    finally:
+        db.close()
+
+    calls = poll_scheduler.refresh_call_allowance(assignments)
+    if not stale or not calls:
+        logger.info(f"Refresh found {len(stale)} stale coins, {calls} calls to spare")
+        return {"status": "success", "symbols": 0, "stale": len(stale), "calls_allowed": calls}
+
+    batches = coingecko.get_client().plan_price_batches(list(stale), include_last_updated_at=True)[:calls]
+    symbol_map = {coin_id: stale[coin_id] for batch in batches for coin_id in batch}
+    logger.info(f"Refreshing {len(symbol_map)} of {len(stale)} stale coins in {len(batches)} calls")
+    return {"stale": len(stale), **dispatch_price_ingestion(symbol_map, reason="manual refresh")}
 
 
 @shared_task(name="app.tasks.update_coins_list")
 def update_coins_list():
     """
-    Update the Coins table with all available coins from CoinGecko.
+    Sync the Coins table with all available coins from CoinGecko.
+    Only inserts, symbol changes and delistings are written, in one transaction.
     Run once a week.
     """
     db = SessionLocal()
     try:
-        cg = CoinGeckoAPI()
         logger.info("Fetching coins list from CoinGecko...")
-        coin_list = cg.get_coins_list()
+        coin_list = coingecko.get_coins_list()
         
         if not coin_list:
             logger.error("No coins returned from CoinGecko")
             return {"status": "error", "message": "No coins from API"}
         
-        # Clear existing coins and insert new ones
-        db.query(Coin).delete()
-        db.commit()
-        
-        added_count = 0
-        for coin in coin_list:
-            try:
-                db.add(Coin(
-                    coin_id=coin["id"],
-                    symbol=coin["symbol"].upper()
-                ))
-                added_count += 1
-            except Exception as e:
-                logger.warning(f"Error adding coin {coin.get('id')}: {e}")
-                continue
-        
-        db.commit()
+        # Diff against the existing table and write only the changes
+        stats = sync_coin_catalog(db, coin_list)
         
-        logger.info(f"Successfully updated {added_count} coins in database")
-        return {"status": "success", "coins_count": added_count}
+        logger.info(f"Successfully synced {len(coin_list)} coins in database")
+        return {"status": "success", "coins_count": len(coin_list), **stats}
         
     except Exception as e:
         logger.error(f"Error updating coins list: {e}")
@@ -3,7 +3,7 @@ from app.models import TrendingCoin, TopGainerLoser
 import datetime
 from celery import shared_task
 import logging
-from pycoingecko import CoinGeckoAPI
+from app.services import coingecko, freshness
 
 logger = logging.getLogger(__name__)
 
@@ -17,10 +17,8 @@ def fetch_trending_coins():
     db = SessionLocal()
     try:
         logger.info("Fetching trending coins from CoinGecko...")
-        cg = CoinGeckoAPI()
-        
         # Get trending coins
-        trending_data = cg.get_search_trending()
+        trending_data = coingecko.get_search_trending()
         
         if not trending_data or 'coins' not in trending_data:
             logger.error("No trending data returned from CoinGecko")
@@ -58,6 +56,7 @@ def fetch_trending_coins():
                 continue
         
         db.commit()
+        freshness.mark(freshness.TRENDING)
         logger.info(f"Successfully updated {added_count} trending coins")
         return {"status": "success", "count": added_count}
         
@@ -80,11 +79,9 @@ def fetch_top_gainers_losers():
     try:
         logger.info("Fetching top gainers and losers from CoinGecko (free tier)...")
         
-        cg = CoinGeckoAPI()
-        
         # Fetch top 250 coins by market cap with price change data
         # This is available in the free tier
-        market_data = cg.get_coins_markets(
+        market_data = coingecko.get_coins_markets(
             vs_currency='usd',
             order='market_cap_desc',
             per_page=250,
@@ -172,6 +169,7 @@ def fetch_top_gainers_losers():
                 continue
         
         db.commit()
+        freshness.mark(freshness.GAINERS_LOSERS)
         logger.info(f"Successfully updated {added_gainers} gainers and {added_losers} losers")
         return {
             "status": "success", 
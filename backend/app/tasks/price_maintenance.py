@@ -0,0 +1,42 @@
+from celery import shared_task
+import logging
+from app.database import SessionLocal, engine
+from app.services import partitions, rollups
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name="app.tasks.maintain_price_partitions")
+def maintain_price_partitions():
+    """
+    Create upcoming monthly price_points partitions and drop expired ones.
+    Run once a day.
+    """
+    db = SessionLocal()
+    try:
+        created = partitions.ensure_partitions(db)
+        dropped = partitions.drop_expired_partitions(engine, db)
+        return {"status": "success", "created": created, "dropped": dropped}
+    except Exception as e:
+        logger.error(f"Error maintaining price partitions: {e}", exc_info=True)
+        db.rollback()
+        return {"status": "error", "message": str(e)}
+    finally:
+        db.close()
+
+
+@shared_task(name="app.tasks.build_price_rollups")
+def build_price_rollups():
+    """
+    Fold newly stored ticks into the 1m/1h/1d OHLC rollups.
+    Run every few minutes; the first run backfills all history in batches.
+    """
+    db = SessionLocal()
+    try:
+        return {"status": "success", **rollups.build_rollups(db)}
+    except Exception as e:
+        logger.error(f"Error building price rollups: {e}", exc_info=True)
+        db.rollback()
+        return {"status": "error", "message": str(e)}
+    finally:
+        db.close()
@@ -33,16 +33,32 @@ celery_app.conf.update(
 )
 
 # Import tasks to register them
-from app.tasks.fetch_and_store_prices import fetch_and_store_prices, update_coins_list
+from app.tasks.fetch_and_store_prices import (
+    fetch_and_store_prices, poll_due_prices, refresh_stale_prices, ingest_price_batch, summarize_price_ingestion,
+    update_coins_list,
+)
 from app.tasks.check_price_alerts import check_price_alerts
+from app.tasks.price_maintenance import maintain_price_partitions, build_price_rollups
 # from app.tasks.fetch_market_data import fetch_trending_coins, fetch_top_gainers_losers
 
 # Celery Beat Schedule
 celery_app.conf.beat_schedule = {
-    # Fetch prices every hour
-    'fetch-prices-every-hour': {
-        'task': 'app.tasks.fetch_and_store_prices',
-        'schedule': crontab(minute='20'),  
+    # Refresh the coins due this minute (tiered by watchers/volatility, see poll_scheduler)
+    'poll-due-prices-every-minute': {
+        'task': 'app.tasks.poll_due_prices',
+        'schedule': crontab(),
+    },
+    
+    # Create next months' price_points partitions, drop expired ones
+    'maintain-price-partitions-daily': {
+        'task': 'app.tasks.maintain_price_partitions',
+        'schedule': crontab(hour=0, minute=30),
+    },
+    
+    # Fold new ticks into the 1m/1h/1d OHLC rollups used by /charts/rollups
+    'build-price-rollups-every-5-minutes': {
+        'task': 'app.tasks.build_price_rollups',
+        'schedule': crontab(minute='*/5'),
     },
     
     # # Check price alerts every hour
@@ -0,0 +1,37 @@
+"""
+Migration script to create the coin_subscriptions table and fill it from the watchlist.
+Ingestion and the polling scheduler read the watched coins from this table.
+Run this once to update the database schema (running it again recounts the table).
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import engine, SessionLocal
+from app.models import CoinSubscription
+from app.services import subscriptions
+
+def migrate():
+    """Create coin_subscriptions if missing and backfill watcher counts"""
+    db = SessionLocal()
+
+    try:
+        print("Creating 'coin_subscriptions' table if missing...")
+        CoinSubscription.__table__.create(bind=engine, checkfirst=True)
+
+        print("Backfilling subscriptions from watchlist...")
+        count = subscriptions.rebuild(db)
+        print(f"  {count} watched coins")
+
+        print("✓ Migration completed successfully!")
+
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate()
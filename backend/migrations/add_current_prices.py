@@ -0,0 +1,47 @@
+"""
+Migration script to create the current_prices table and fill it from price_points.
+Latest-price reads (/prices, price alerts) use this table; ingestion keeps it current.
+Run this once to update the database schema.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.database import engine, SessionLocal
+from app.models import CurrentPrice
+
+def migrate():
+    """Create current_prices if missing and backfill the newest tick per coin"""
+    db = SessionLocal()
+
+    try:
+        print("Creating 'current_prices' table if missing...")
+        CurrentPrice.__table__.create(bind=engine, checkfirst=True)
+
+        print("Backfilling current prices from price_points...")
+        result = db.execute(text("""
+            INSERT INTO current_prices (coin_id, symbol, price, timestamp)
+            SELECT DISTINCT ON (coin_id) coin_id, symbol, price, timestamp
+            FROM price_points
+            WHERE coin_id IS NOT NULL
+            ORDER BY coin_id, timestamp DESC, id DESC
+            ON CONFLICT (coin_id) DO UPDATE
+            SET symbol = EXCLUDED.symbol, price = EXCLUDED.price, timestamp = EXCLUDED.timestamp
+            WHERE current_prices.timestamp < EXCLUDED.timestamp
+        """))
+        db.commit()
+        print(f"  Backfilled {result.rowcount} coins")
+
+        print("✓ Migration completed successfully!")
+
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,49 @@
+"""
+Migration script to add the (symbol, timestamp DESC, id DESC) index to price_points.
+Serves keyset-paged price history reads as an index range scan.
+The index is built CONCURRENTLY so ingestion keeps writing while it runs.
+Run this once to update the database schema.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.database import engine
+
+INDEX_NAME = "ix_price_points_symbol_timestamp"
+
+def migrate():
+    """Create the composite history index without blocking writes"""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        try:
+            # An interrupted concurrent build leaves an INVALID index behind; rebuild it
+            result = conn.execute(text("""
+                SELECT i.indisvalid
+                FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+                WHERE c.relname = :name
+            """), {"name": INDEX_NAME})
+            row = result.fetchone()
+            if row and row[0]:
+                print(f"✓ Index '{INDEX_NAME}' already exists")
+                return
+            if row:
+                print(f"Dropping invalid index '{INDEX_NAME}' left by an interrupted build...")
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}"))
+
+            print(f"Creating index '{INDEX_NAME}' on price_points (this can take a while)...")
+            conn.execute(text(f"""
+                CREATE INDEX CONCURRENTLY {INDEX_NAME}
+                ON price_points (symbol, timestamp DESC, id DESC)
+            """))
+
+            print("✓ Migration completed successfully!")
+
+        except Exception as e:
+            print(f"✗ Migration failed: {e}")
+            raise
+
+if __name__ == "__main__":
+    migrate()
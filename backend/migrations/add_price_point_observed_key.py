@@ -0,0 +1,87 @@
+"""
+Migration script to key price_points on (coin_id, timestamp).
+Adds the coin_id column, backfills it from the watchlist, removes duplicate
+observations and adds the uniqueness rule ingestion relies on to skip re-runs.
+Run this once to update the database schema.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.database import engine, SessionLocal
+
+def migrate():
+    """Add coin_id, dedupe and add the (coin_id, timestamp) unique constraint"""
+    db = SessionLocal()
+
+    try:
+        # Add the coin_id column if missing (PostgreSQL)
+        result = db.execute(text("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name='price_points' AND column_name='coin_id'
+        """))
+        if result.fetchone():
+            print("✓ Column 'coin_id' already exists in price_points table")
+        else:
+            print("Adding 'coin_id' column to price_points table...")
+            db.execute(text("ALTER TABLE price_points ADD COLUMN coin_id VARCHAR"))
+            db.execute(text("CREATE INDEX IF NOT EXISTS ix_price_points_coin_id ON price_points (coin_id)"))
+            db.commit()
+
+        # Backfill from the watchlist, where each symbol was ingested for one coin_id
+        print("Backfilling coin_id from watchlist symbols...")
+        result = db.execute(text("""
+            UPDATE price_points p
+            SET coin_id = w.coin_id
+            FROM (
+                SELECT symbol, MIN(coin_id) AS coin_id
+                FROM watchlist
+                WHERE coin_id IS NOT NULL
+                GROUP BY symbol
+                HAVING COUNT(DISTINCT coin_id) = 1
+            ) w
+            WHERE p.coin_id IS NULL AND p.symbol = w.symbol
+        """))
+        db.commit()
+        print(f"  Backfilled {result.rowcount} rows")
+
+        result = db.execute(text("""
+            SELECT 1 FROM pg_constraint WHERE conname = 'uix_price_coin_observed'
+        """))
+        if result.fetchone():
+            print("✓ Constraint 'uix_price_coin_observed' already exists")
+            return
+
+        # Keep the first row of every duplicated observation
+        print("Removing duplicate (coin_id, timestamp) rows...")
+        result = db.execute(text("""
+            DELETE FROM price_points p
+            USING price_points d
+            WHERE p.coin_id = d.coin_id
+            AND p.timestamp = d.timestamp
+            AND p.id > d.id
+        """))
+        db.commit()
+        print(f"  Removed {result.rowcount} duplicate rows")
+
+        print("Adding unique constraint on (coin_id, timestamp)...")
+        db.execute(text("""
+            ALTER TABLE price_points
+            ADD CONSTRAINT uix_price_coin_observed UNIQUE (coin_id, timestamp)
+        """))
+        db.commit()
+
+        print("✓ Migration completed successfully!")
+
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,45 @@
+"""
+Migration script to add 'last_login_at' column to users table.
+Used by the polling scheduler to spot coins watched only by dormant users.
+Run this once to update the database schema.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.database import engine, SessionLocal
+
+def migrate():
+    """Add last_login_at column (NULL until the user next logs in)"""
+    db = SessionLocal()
+
+    try:
+        # Check if column already exists (PostgreSQL)
+        result = db.execute(text("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name='users' AND column_name='last_login_at'
+        """))
+        columns = [row[0] for row in result.fetchall()]
+
+        if 'last_login_at' in columns:
+            print("✓ Column 'last_login_at' already exists in users table")
+            return
+
+        print("Adding 'last_login_at' column to users table...")
+        db.execute(text('ALTER TABLE users ADD COLUMN last_login_at TIMESTAMP'))
+        db.commit()
+
+        print("✓ Migration completed successfully!")
+
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,149 @@
+"""
+Migration script to convert price_points into a table range-partitioned by month.
+
+Online path, ingestion keeps running until the final swap:
+  1. create price_points_partitioned with monthly partitions covering all history
+     and a default partition for ticks outside them
+  2. copy existing rows across in id batches, one short transaction each
+  3. lock price_points against writes, copy the rows that arrived meanwhile,
+     and swap the tables by renaming (a few seconds)
+
+The old table is kept as price_points_old; drop it once the new one checks out.
+Run this once to update the database schema.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datetime
+from sqlalchemy import text
+from app.database import engine, SessionLocal
+from app.config import settings
+from app.services import partitions
+
+NEW = "price_points_partitioned"
+OLD = "price_points_old"
+BATCH_SIZE = 50000
+COLUMNS = "id, coin_id, symbol, price, timestamp"
+
+# Old name -> name it takes once the tables are swapped
+INDEX_RENAMES = {
+    f"{NEW}_pkey": "price_points_pkey",
+    f"{NEW}_coin_observed": "uix_price_coin_observed",
+    f"ix_{NEW}_id": "ix_price_points_id",
+    f"ix_{NEW}_coin_id": "ix_price_points_coin_id",
+    f"ix_{NEW}_symbol": "ix_price_points_symbol",
+    f"ix_{NEW}_symbol_timestamp": "ix_price_points_symbol_timestamp",
+}
+
+
+def copy_rows(db, low, high):
+    result = db.execute(text(f"""
+        INSERT INTO {NEW} ({COLUMNS})
+        SELECT {COLUMNS} FROM price_points
+        WHERE id > :low AND id <= :high AND timestamp IS NOT NULL
+        ON CONFLICT DO NOTHING
+    """), {"low": low, "high": high})
+    return result.rowcount
+
+
+def migrate():
+    """Build the partitioned table, backfill it in batches and swap it in"""
+    db = SessionLocal()
+
+    try:
+        if partitions.is_partitioned(db):
+            print("✓ Table 'price_points' is already partitioned")
+            return
+
+        sequence = db.execute(text("SELECT pg_get_serial_sequence('price_points', 'id')")).scalar()
+        first, max_id = db.execute(text("SELECT MIN(timestamp), COALESCE(MAX(id), 0) FROM price_points")).fetchone()
+
+        print(f"Creating partitioned table '{NEW}'...")
+        db.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {NEW} (
+                id INTEGER NOT NULL DEFAULT nextval('{sequence}'),
+                coin_id VARCHAR,
+                symbol VARCHAR,
+                price DOUBLE PRECISION,
+                timestamp TIMESTAMP NOT NULL,
+                CONSTRAINT {NEW}_pkey PRIMARY KEY (id, timestamp),
+                CONSTRAINT {NEW}_coin_observed UNIQUE (coin_id, timestamp)
+            ) PARTITION BY RANGE (timestamp)
+        """))
+        db.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{NEW}_id ON {NEW} (id)"))
+        db.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{NEW}_coin_id ON {NEW} (coin_id)"))
+        db.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{NEW}_symbol ON {NEW} (symbol)"))
+        db.execute(text(f"""
+            CREATE INDEX IF NOT EXISTS ix_{NEW}_symbol_timestamp
+            ON {NEW} (symbol, timestamp DESC, id DESC)
+        """))
+
+        # One partition per month from the oldest tick to a few months ahead
+        now = datetime.datetime.utcnow()
+        month = partitions.month_start(first or now)
+        last = partitions.add_months(partitions.month_start(now), settings.PARTITION_MONTHS_AHEAD)
+        count = 0
+        while month <= last:
+            db.execute(text(partitions.create_partition_sql(month, table=NEW)))
+            month = partitions.add_months(month, 1)
+            count += 1
+        db.execute(text(partitions.create_default_partition_sql(table=NEW)))
+        db.commit()
+        print(f"  Created {count} monthly partitions and a default partition")
+
+        # Backfill in batches; writers are not blocked
+        print(f"Copying rows up to id {max_id} in batches of {BATCH_SIZE}...")
+        copied = 0
+        low = 0
+        while low < max_id:
+            high = low + BATCH_SIZE
+            copied += copy_rows(db, low, high)
+            db.commit()
+            low = high
+            print(f"  {copied} rows copied (id <= {min(high, max_id)})")
+
+        # Final catch-up and swap; EXCLUSIVE mode still lets readers through
+        print("Swapping tables...")
+        db.execute(text("LOCK TABLE price_points IN EXCLUSIVE MODE"))
+        final_max = db.execute(text("SELECT COALESCE(MAX(id), 0) FROM price_points")).scalar()
+        # From max_id, not low: the last batch may have ended past max_id, and
+        # rows above max_id committed after it ran would be skipped otherwise.
+        # Overlap with rows already copied is skipped by ON CONFLICT.
+        late = copy_rows(db, max_id, final_max)
+        print(f"  {late} rows written during the backfill copied")
+
+        db.execute(text(f"ALTER TABLE price_points RENAME TO {OLD}"))
+        for index in ["price_points_pkey", "uix_price_coin_observed", "ix_price_points_id",
+                      "ix_price_points_coin_id", "ix_price_points_symbol", "ix_price_points_symbol_timestamp"]:
+            db.execute(text(f"ALTER INDEX IF EXISTS {index} RENAME TO {index}_old"))
+        db.execute(text(f"ALTER TABLE {NEW} RENAME TO price_points"))
+        for old_name, new_name in INDEX_RENAMES.items():
+            db.execute(text(f"ALTER INDEX IF EXISTS {old_name} RENAME TO {new_name}"))
+        for partition in db.execute(text("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = 'price_points'
+        """)).scalars().all():
+            db.execute(text(f"ALTER TABLE {partition} RENAME TO {partition.replace(NEW, 'price_points', 1)}"))
+        db.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY price_points.id"))
+        db.commit()
+
+        skipped = db.execute(text(f"SELECT COUNT(*) FROM {OLD} WHERE timestamp IS NULL")).scalar()
+        if skipped:
+            print(f"  {skipped} rows without a timestamp were left in {OLD}")
+
+        print("✓ Migration completed successfully!")
+        print(f"  Check the data, then drop the old table with: DROP TABLE {OLD};")
+
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,44 @@
+"""
+Shared test setup.
+
+Tests run without PostgreSQL, Redis or CoinGecko: the settings below point
+the app at a scratch SQLite file and at ports where nothing listens, and the
+shared Redis client is switched off so every helper takes its in-process path.
+"""
+
+import os
+import tempfile
+
+# Before anything imports app.config
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+os.environ["REDIS_URL"] = "redis://127.0.0.1:1/0"
+os.environ["COINGECKO_API_URL"] = "http://127.0.0.1:1/api/v3"
+os.environ["COINGECKO_PRICE_URL"] = "http://127.0.0.1:1/api/v3/simple/price"
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import Base
+from app.services import redis_client
+
+
+@pytest.fixture(autouse=True)
+def no_redis():
+    redis_client.set_redis(None)
+    yield
+    redis_client.set_redis(None)
+
+
+@pytest.fixture
+def db():
+    """Session on an empty in-memory SQLite database with every table created."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
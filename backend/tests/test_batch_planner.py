@@ -0,0 +1,92 @@
+import pytest
+
+from app.services import batch_planner
+from app.services.batch_planner import BatchPlanner
+
+URL = "https://api.coingecko.com/api/v3/simple/price"
+PARAMS = {"vs_currencies": "usd"}
+
+
+def _ids(count, prefix="coin"):
+    return [f"{prefix}-{i:04d}" for i in range(count)]
+
+
+def test_plan_respects_ids_per_call():
+    planner = BatchPlanner(max_url_length=100_000, max_ids=10)
+    batches = planner.plan(_ids(25), URL, PARAMS)
+    assert [len(b) for b in batches] == [10, 10, 5]
+    assert [c for b in batches for c in b] == _ids(25)
+
+
+def test_plan_respects_url_length():
+    planner = BatchPlanner(max_url_length=400, max_ids=1000)
+    batches = planner.plan(_ids(200), URL, PARAMS)
+    assert len(batches) > 1
+    for batch in batches:
+        assert planner.url_length(URL, batch, PARAMS) <= 400
+    assert [c for b in batches for c in b] == _ids(200)
+
+
+def test_plan_counts_encoded_length():
+    planner = BatchPlanner(max_url_length=100_000, max_ids=1000)
+    # "," is sent as %2C and each "/" as %2F
+    assert planner.url_length(URL, ["a/b", "c"], PARAMS) == planner.base_length(URL, PARAMS) + 5 + 3 + 1
+
+
+def test_oversized_id_gets_its_own_batch():
+    planner = BatchPlanner(max_url_length=150, max_ids=100)
+    huge = "x" * 500
+    assert planner.plan(["a", huge, "b"], URL, PARAMS) == [["a"], [huge], ["b"]]
+
+
+@pytest.mark.parametrize("status_code, body, expected", [
+    (414, "", True),
+    (400, "Request URI too long", True),
+    (400, "invalid vs_currency", False),
+    (429, "too long", False),
+    (None, "", False),
+])
+def test_is_oversize(status_code, body, expected):
+    assert batch_planner.is_oversize(status_code, body) is expected
+
+
+def test_rejection_lowers_limits():
+    planner = BatchPlanner(max_url_length=100_000, max_ids=100)
+    rejected = _ids(100)
+    planner.record_rejection(URL, rejected, PARAMS)
+    assert planner.max_ids == 50
+    assert planner.max_url_length == planner.url_length(URL, rejected, PARAMS) - 1
+    assert all(len(b) <= 50 for b in planner.plan(_ids(300), URL, PARAMS))
+
+
+def test_single_id_rejection_changes_nothing():
+    planner = BatchPlanner(max_url_length=1000, max_ids=100)
+    planner.record_rejection(URL, ["bitcoin"], PARAMS)
+    assert (planner.max_ids, planner.max_url_length) == (100, 1000)
+
+
+def test_successes_probe_back_up_below_the_rejected_size():
+    planner = BatchPlanner(max_url_length=100_000, max_ids=100)
+    planner.record_rejection(URL, _ids(80), PARAMS)
+    assert planner.max_ids == 40
+
+    for _ in range(batch_planner.PROBE_AFTER_SUCCESSES - 1):
+        planner.record_success(_ids(2))
+    assert planner.max_ids == 40
+    planner.record_success(_ids(2))
+    # Halfway to one below the rejected count
+    assert planner.max_ids == 60
+
+    for _ in range(10 * batch_planner.PROBE_AFTER_SUCCESSES):
+        planner.record_success(_ids(2))
+    assert planner.max_ids == 79
+
+
+def test_probes_reach_the_ceiling_once_the_rejection_is_forgotten(monkeypatch):
+    planner = BatchPlanner(max_url_length=100_000, max_ids=100)
+    planner.record_rejection(URL, _ids(80), PARAMS)
+    monkeypatch.setattr(batch_planner, "REJECTION_MEMORY_SECONDS", 0)
+
+    for _ in range(20 * batch_planner.PROBE_AFTER_SUCCESSES):
+        planner.record_success(_ids(2))
+    assert (planner.max_ids, planner.max_url_length) == (100, 100_000)
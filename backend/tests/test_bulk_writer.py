@@ -0,0 +1,52 @@
+import datetime
+
+from app.models import CurrentPrice, PricePoint
+from app.services.bulk_writer import write_price_points
+
+NOW = datetime.datetime(2026, 1, 1, 12, 0, 0)
+
+
+def _row(coin_id, price, minutes=0):
+    return {
+        "coin_id": coin_id,
+        "symbol": coin_id[:3].upper(),
+        "price": price,
+        "timestamp": NOW + datetime.timedelta(minutes=minutes),
+    }
+
+
+def test_writes_rows_and_moves_current_prices(db):
+    stats = write_price_points(db, [_row("bitcoin", 1.0), _row("bitcoin", 2.0, 1), _row("ethereum", 3.0)])
+    db.commit()
+    assert (stats["rows"], stats["skipped"]) == (3, 0)
+    assert db.query(PricePoint).count() == 3
+    current = {c.coin_id: c.price for c in db.query(CurrentPrice)}
+    assert current == {"bitcoin": 2.0, "ethereum": 3.0}
+
+
+def test_returns_only_the_rows_actually_inserted(db):
+    write_price_points(db, [_row("bitcoin", 1.0), _row("ethereum", 2.0)])
+    db.commit()
+
+    stats = write_price_points(db, [_row("bitcoin", 1.0), _row("ethereum", 2.0), _row("solana", 3.0)])
+    db.commit()
+    assert (stats["rows"], stats["skipped"]) == (1, 2)
+    assert [r["coin_id"] for r in stats["inserted"]] == ["solana"]
+
+
+def test_duplicate_within_one_call_is_reported_once(db):
+    stats = write_price_points(db, [_row("bitcoin", 1.0), _row("bitcoin", 1.0)])
+    db.commit()
+    assert (stats["rows"], stats["skipped"]) == (1, 1)
+    assert len(stats["inserted"]) == 1
+
+
+def test_older_tick_does_not_replace_current_price(db):
+    write_price_points(db, [_row("bitcoin", 2.0, 5)])
+    write_price_points(db, [_row("bitcoin", 1.0, 0)])
+    db.commit()
+    assert db.query(CurrentPrice).one().price == 2.0
+
+
+def test_empty_input():
+    assert write_price_points(None, [])["inserted"] == []
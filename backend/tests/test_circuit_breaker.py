@@ -0,0 +1,77 @@
+import pytest
+
+from app.services import circuit_breaker
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _opened(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == circuit_breaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == circuit_breaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_allows_one_trial(clock):
+    breaker = _opened(clock)
+    clock[0] += 30
+    assert breaker.state == circuit_breaker.HALF_OPEN
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_successful_trial_closes(clock):
+    breaker = _opened(clock)
+    clock[0] += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == circuit_breaker.CLOSED
+    breaker.before_call()
+
+
+def test_failed_trial_reopens(clock):
+    breaker = _opened(clock)
+    clock[0] += 30
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == circuit_breaker.OPEN
+    assert breaker.status()["retry_in"] == pytest.approx(30)
+
+
+def test_abandoned_trial_frees_its_slot(clock):
+    breaker = _opened(clock)
+    clock[0] += 30
+    breaker.before_call()
+    # e.g. the rate limiter gave up before the request went out
+    breaker.abandon()
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == circuit_breaker.CLOSED
+
+
+def test_check_takes_no_slot(clock):
+    breaker = _opened(clock)
+    clock[0] += 30
+    breaker.check()
+    breaker.check()
+    breaker.before_call()
@@ -0,0 +1,98 @@
+from email.utils import formatdate
+
+import pytest
+from fastapi import FastAPI, Request, Response
+from fastapi.testclient import TestClient
+
+from app.routes import prices
+from app.services import conditional, freshness
+
+STAMPS = {freshness.PRICES: 1_700_000_000.5, freshness.WATCHLISTS: 1_600_000_000.0}
+
+
+@pytest.fixture
+def stamps(monkeypatch):
+    current = dict(STAMPS)
+    monkeypatch.setattr(freshness, "get_shared", lambda names: {name: current.get(name) for name in names})
+    return current
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.get("/data")
+    def data(request: Request, response: Response):
+        not_modified = conditional.check(request, response, [freshness.PRICES, freshness.WATCHLISTS])
+        if not_modified is not None:
+            return not_modified
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_no_validators_without_shared_stamps(monkeypatch):
+    monkeypatch.setattr(freshness, "get_shared", lambda names: None)
+    assert conditional.validators([freshness.PRICES]) is None
+
+
+def test_no_validators_until_every_stamp_is_marked(stamps):
+    del stamps[freshness.WATCHLISTS]
+    assert conditional.validators([freshness.PRICES, freshness.WATCHLISTS]) is None
+
+
+def test_etag_follows_the_stamps(stamps):
+    etag, modified = conditional.validators([freshness.PRICES, freshness.WATCHLISTS])
+    assert etag.startswith('W/"')
+    assert modified == STAMPS[freshness.PRICES]
+    stamps[freshness.WATCHLISTS] += 1
+    assert conditional.validators([freshness.PRICES, freshness.WATCHLISTS])[0] != etag
+
+
+def test_full_response_carries_validators(stamps, client):
+    response = client.get("/data")
+    assert response.status_code == 200
+    assert response.headers["etag"]
+    assert response.headers["last-modified"] == formatdate(STAMPS[freshness.PRICES], usegmt=True)
+
+
+def test_matching_etag_gets_304(stamps, client):
+    etag = client.get("/data").headers["etag"]
+    response = client.get("/data", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    # Weak comparison, and lists of tags
+    assert client.get("/data", headers={"If-None-Match": f'"other", {etag[2:]}'}).status_code == 304
+
+
+def test_changed_data_gets_a_full_response(stamps, client):
+    etag = client.get("/data").headers["etag"]
+    stamps[freshness.PRICES] += 60
+    assert client.get("/data", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_if_modified_since(stamps, client):
+    modified = client.get("/data").headers["last-modified"]
+    assert client.get("/data", headers={"If-Modified-Since": modified}).status_code == 304
+    earlier = formatdate(STAMPS[freshness.PRICES] - 3600, usegmt=True)
+    assert client.get("/data", headers={"If-Modified-Since": earlier}).status_code == 200
+    assert client.get("/data", headers={"If-Modified-Since": "not a date"}).status_code == 200
+
+
+def test_if_none_match_wins_over_if_modified_since(stamps, client):
+    modified = client.get("/data").headers["last-modified"]
+    response = client.get("/data", headers={"If-None-Match": '"stale"', "If-Modified-Since": modified})
+    assert response.status_code == 200
+
+
+def test_failed_prices_load_is_a_500_without_validators(stamps, monkeypatch):
+    def broken():
+        raise RuntimeError("database down")
+
+    monkeypatch.setattr(prices, "_load_latest_prices", broken)
+    app = FastAPI()
+    app.include_router(prices.router)
+    response = TestClient(app).get("/prices")
+    assert response.status_code == 500
+    assert "etag" not in response.headers
+    assert "last-modified" not in response.headers
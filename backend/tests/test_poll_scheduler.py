@@ -0,0 +1,95 @@
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.models import CurrentPrice
+from app.services import poll_scheduler
+
+
+@pytest.fixture
+def watched(monkeypatch):
+    """Replace the database reads of compute_assignments with a fixed universe."""
+    coins = []
+    monkeypatch.setattr(poll_scheduler, "_load_watched_coins", lambda db: [dict(c) for c in coins])
+    monkeypatch.setattr(poll_scheduler, "_load_volatility", lambda db: {})
+    client = SimpleNamespace(planner=SimpleNamespace(max_ids=10))
+    monkeypatch.setattr(poll_scheduler.coingecko, "get_client", lambda: client)
+    return coins
+
+
+def _coin(coin_id, watchers, active=None):
+    return {
+        "coin_id": coin_id,
+        "symbol": coin_id.upper(),
+        "watchers": watchers,
+        "active_watchers": watchers if active is None else active,
+    }
+
+
+def test_slot_is_stable_and_inside_the_period():
+    assert poll_scheduler._slot("bitcoin", 60) == poll_scheduler._slot("bitcoin", 60)
+    assert all(0 <= poll_scheduler._slot(f"coin-{i}", 5) < 5 for i in range(100))
+
+
+@pytest.mark.parametrize("watchers, active, volatility, tier", [
+    (500, 500, 0.0, 0),
+    (1, 1, 0.10, 0),
+    (20, 20, 0.0, 1),
+    (1, 1, 0.03, 1),
+    (2, 2, 0.0, 2),
+    (2, 0, 0.0, 3),
+])
+def test_base_tier(watchers, active, volatility, tier):
+    assert poll_scheduler._base_tier(watchers, active, volatility) == tier
+
+
+def test_estimate_packs_due_coins_into_calls():
+    # 25 hot coins every minute at 10 ids per call: 3 calls a minute
+    assert poll_scheduler.estimate_calls_per_hour([25, 0, 0, 0], 10) == 180
+    # 50 warm coins: 10 due a minute, one call
+    assert poll_scheduler.estimate_calls_per_hour([0, 50, 0, 0], 10) == 60
+    assert poll_scheduler.estimate_calls_per_hour([0, 0, 0, 0], 10) == 0
+
+
+def test_every_coin_is_due_once_per_period(watched):
+    watched.extend(_coin(f"coin-{i}", 20) for i in range(30))
+    assignments = poll_scheduler.compute_assignments(None, budget=10_000)
+    assert assignments["tiers"]["warm"]["count"] == 30
+
+    seen = []
+    for minute in range(5):
+        seen.extend(poll_scheduler.due_coins(assignments, minute))
+    assert sorted(seen) == sorted(c["coin_id"] for c in watched)
+
+
+def test_demotes_least_watched_coins_to_fit_the_budget(watched):
+    watched.extend(_coin(f"coin-{i}", 200 - i) for i in range(40))
+    assignments = poll_scheduler.compute_assignments(None, budget=120)
+    assert assignments["estimated_calls_per_hour"] <= 120
+    assert assignments["demoted"] > 0
+    hot = {c["coin_id"] for c in assignments["tiers"]["hot"]["coins"]}
+    # The most watched stay hot
+    assert "coin-0" in hot and "coin-39" not in hot
+
+
+def test_refresh_allowance_is_the_spare_budget_per_refresh():
+    per_hour = 3600 // poll_scheduler.REFRESH_INTERVAL_SECONDS
+    assignments = {"budget_calls_per_hour": 1200, "estimated_calls_per_hour": 1200 - 3 * per_hour}
+    assert poll_scheduler.refresh_call_allowance(assignments) == 3
+    assignments["estimated_calls_per_hour"] = 1300
+    assert poll_scheduler.refresh_call_allowance(assignments) == 0
+
+
+def test_stale_coins_are_overdue_for_their_tier_stalest_first(db):
+    now = datetime.datetime(2026, 1, 1, 12, 0)
+    db.add_all([
+        CurrentPrice(coin_id="fresh", symbol="F", price=1.0, timestamp=now - datetime.timedelta(minutes=2)),
+        CurrentPrice(coin_id="late", symbol="L", price=1.0, timestamp=now - datetime.timedelta(minutes=10)),
+        CurrentPrice(coin_id="later", symbol="R", price=1.0, timestamp=now - datetime.timedelta(minutes=30)),
+    ])
+    db.commit()
+    assignments = {"tiers": {"warm": {"period_minutes": 5, "coins": [
+        {"coin_id": coin_id, "symbol": coin_id.upper()} for coin_id in ("fresh", "late", "later", "new")
+    ]}}}
+    assert list(poll_scheduler.stale_coins(db, assignments, now=now)) == ["new", "later", "late"]
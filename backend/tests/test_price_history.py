@@ -0,0 +1,64 @@
+import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import dependencies
+from app.models import PricePoint
+from app.routes import prices
+
+START = datetime.datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(prices.router)
+    app.dependency_overrides[dependencies.get_db] = lambda: db
+    return TestClient(app)
+
+
+@pytest.fixture
+def history(db):
+    # Two coins share the BTC symbol and tick on the same minutes, so pages must tie-break on id
+    points = [
+        PricePoint(coin_id=("bitcoin", "bitcoin-bep2")[i % 2], symbol="BTC", price=float(i), timestamp=START + datetime.timedelta(minutes=i // 2))
+        for i in range(25)
+    ]
+    points.append(PricePoint(coin_id="ethereum", symbol="ETH", price=1.0, timestamp=START))
+    db.add_all(points)
+    db.commit()
+    return points
+
+
+def test_cursor_pages_cover_history_once_newest_first(client, history):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 10, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/prices/btc", params=params)
+        assert response.status_code == 200
+        seen.extend(p["price"] for p in response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert seen == [float(i) for i in reversed(range(25))]
+
+
+def test_last_short_page_has_no_cursor(client, history):
+    response = client.get("/prices/BTC", params={"limit": 30})
+    assert len(response.json()) == 25
+    assert "x-next-cursor" not in response.headers
+
+
+def test_before_and_after_bound_the_range(client, history):
+    response = client.get("/prices/BTC", params={
+        "after": (START + datetime.timedelta(minutes=2)).isoformat(),
+        "before": (START + datetime.timedelta(minutes=5)).isoformat(),
+    })
+    # Minutes 3 and 4, two ticks each
+    assert [p["price"] for p in response.json()] == [9.0, 8.0, 7.0, 6.0]
+
+
+def test_bad_cursor_is_a_400(client, history):
+    assert client.get("/prices/BTC", params={"cursor": "not-a-cursor"}).status_code == 400
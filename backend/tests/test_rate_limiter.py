@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services import rate_limiter
+from app.services.rate_limiter import LocalTokenBucket, RateLimiter, RateLimitTimeout
+
+
+def test_local_bucket_spends_burst_then_asks_to_wait():
+    bucket = LocalTokenBucket(rate=1.0, capacity=3)
+    assert [bucket.try_acquire(0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = bucket.try_acquire(0)
+    assert 0 < wait <= 1.0
+
+
+def test_local_bucket_keeps_reserve_for_higher_priorities():
+    bucket = LocalTokenBucket(rate=1.0, capacity=4)
+    # A caller that must leave 2 tokens gets 2 of the 4
+    assert bucket.try_acquire(2) == 0.0
+    assert bucket.try_acquire(2) == 0.0
+    assert bucket.try_acquire(2) > 0
+    # Reserve 0 (ingestion) can still take the rest
+    assert bucket.try_acquire(0) == 0.0
+
+
+def test_local_bucket_refills_over_time(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: now[0])
+    bucket = LocalTokenBucket(rate=2.0, capacity=2)
+    bucket.try_acquire(0)
+    bucket.try_acquire(0)
+    assert bucket.try_acquire(0) == pytest.approx(0.5)
+    now[0] += 0.5
+    assert bucket.try_acquire(0) == 0.0
+
+
+def test_penalize_empties_the_bucket(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: now[0])
+    bucket = LocalTokenBucket(rate=1.0, capacity=10)
+    bucket.penalize(5)
+    assert bucket.try_acquire(0) == pytest.approx(6.0)
+
+
+def test_limiter_falls_back_to_the_local_bucket_without_redis():
+    limiter = RateLimiter(rate_per_minute=600, burst=2)
+    assert limiter._bucket() is limiter._local
+
+    async def run():
+        start = time.monotonic()
+        for _ in range(3):
+            await limiter.acquire(rate_limiter.PRIORITY_HIGH)
+        return time.monotonic() - start
+
+    # The third token takes about 0.1s to refill at 10/s
+    assert 0.05 <= asyncio.run(run()) < 1.0
+    assert limiter.calls == 3
+
+
+def test_low_priority_gives_up_past_max_wait():
+    limiter = RateLimiter(rate_per_minute=6, burst=2)
+
+    async def run():
+        await limiter.acquire(rate_limiter.PRIORITY_LOW, max_wait=0.1)
+        await limiter.acquire(rate_limiter.PRIORITY_LOW, max_wait=0.1)
+
+    with pytest.raises(RateLimitTimeout):
+        asyncio.run(run())
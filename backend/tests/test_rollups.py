@@ -0,0 +1,90 @@
+import datetime
+
+import pytest
+
+from app.models import PricePoint, PriceRollup, RollupWatermark
+from app.services import rollups
+
+START = datetime.datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def rollup_ranges(db, monkeypatch):
+    """
+    Record the id ranges build_rollups() folds in. The bucket SQL is
+    PostgreSQL-only, so those statements are recorded instead of run.
+    """
+    ranges = []
+    execute = db.execute
+
+    class Result:
+        rowcount = 1
+
+    def recording_execute(statement, params=None, *args, **kwargs):
+        if "INSERT INTO price_rollups" in str(statement):
+            if "'1m'" in str(statement):
+                ranges.append((params["low"], params["high"]))
+            return Result()
+        return execute(statement, params, *args, **kwargs)
+
+    monkeypatch.setattr(db, "execute", recording_execute)
+    return ranges
+
+
+def _add_ticks(db, first_id, count):
+    db.add_all(
+        PricePoint(id=i, coin_id="bitcoin", symbol="BTC", price=float(i), timestamp=START + datetime.timedelta(minutes=i))
+        for i in range(first_id, first_id + count)
+    )
+    db.commit()
+
+
+def test_first_run_folds_everything_in_batches(db, rollup_ranges):
+    _add_ticks(db, 1, 25)
+    summary = rollups.build_rollups(db, batch_size=10)
+    assert rollup_ranges == [(0, 10), (10, 20), (20, 25)]
+    assert summary["last_id"] == 25
+    assert db.get(RollupWatermark, rollups.WATERMARK).last_id == 25
+
+
+def test_next_run_starts_at_the_watermark_minus_the_overlap(db, rollup_ranges, monkeypatch):
+    monkeypatch.setattr(rollups, "ID_OVERLAP", 3)
+    _add_ticks(db, 1, 25)
+    rollups.build_rollups(db, batch_size=100)
+    _add_ticks(db, 26, 5)
+    rollup_ranges.clear()
+
+    summary = rollups.build_rollups(db, batch_size=100)
+    assert rollup_ranges == [(22, 30)]
+    assert summary["last_id"] == 30
+
+
+def test_nothing_new_still_rereads_the_overlap_only(db, rollup_ranges, monkeypatch):
+    monkeypatch.setattr(rollups, "ID_OVERLAP", 3)
+    _add_ticks(db, 1, 10)
+    rollups.build_rollups(db)
+    rollup_ranges.clear()
+    rollups.build_rollups(db)
+    assert rollup_ranges == [(7, 10)]
+
+
+@pytest.mark.parametrize("span, max_points, resolution", [
+    (datetime.timedelta(hours=2), 500, "1m"),
+    (datetime.timedelta(days=7), 500, "1h"),
+    (datetime.timedelta(days=365), 500, "1d"),
+    (datetime.timedelta(days=5000), 10, "1d"),
+])
+def test_pick_resolution(span, max_points, resolution):
+    assert rollups.pick_resolution(START, START + span, max_points) == resolution
+
+
+def test_get_candles_reads_the_picked_resolution(db):
+    for resolution, minutes in (("1m", 0), ("1m", 1), ("1h", 0), ("1m", 200)):
+        db.add(PriceRollup(
+            coin_id="bitcoin", symbol="BTC", resolution=resolution, bucket=START + datetime.timedelta(minutes=minutes),
+            open=1.0, high=2.0, low=0.5, close=1.5, ticks=3,
+        ))
+    db.commit()
+    resolution, rows = rollups.get_candles(db, "bitcoin", START, START + datetime.timedelta(hours=2), 500)
+    assert resolution == "1m"
+    assert [r.bucket for r in rows] == [START, START + datetime.timedelta(minutes=1)]
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    started = 0
+
+    async def fetch():
+        nonlocal started
+        started += 1
+        await asyncio.sleep(0.01)
+        return {"bitcoin": 1}
+
+    async def run():
+        return await asyncio.gather(*(flight.do("prices", fetch) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert started == 1
+    assert results == [{"bitcoin": 1}] * 5
+    assert (flight.calls, flight.shared) == (1, 4)
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+
+    async def run():
+        return await asyncio.gather(
+            flight.do("a", lambda: asyncio.sleep(0, result="a")),
+            flight.do("b", lambda: asyncio.sleep(0, result="b")),
+        )
+
+    assert asyncio.run(run()) == ["a", "b"]
+    assert flight.calls == 2
+
+
+def test_finished_call_is_forgotten():
+    flight = SingleFlight()
+
+    async def run():
+        await flight.do("k", lambda: asyncio.sleep(0, result=1))
+        await flight.do("k", lambda: asyncio.sleep(0, result=2))
+
+    asyncio.run(run())
+    assert flight.calls == 2
+
+
+def test_error_reaches_every_waiter():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def run():
+        return await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flight.calls == 1
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    flight = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("k", slow))
+        second = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "done"
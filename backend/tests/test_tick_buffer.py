@@ -0,0 +1,101 @@
+import datetime
+
+from app.models import PricePoint
+from app.services import tick_buffer
+from app.services.tick_buffer import CoinRing, TickBuffer
+
+
+def test_ring_keeps_ticks_in_order():
+    ring = CoinRing(5)
+    for t in (10, 20, 30):
+        assert ring.append(t, float(t))
+    assert ring.since(0) == ([10, 20, 30], [10.0, 20.0, 30.0])
+    assert ring.since(20) == ([20, 30], [20.0, 30.0])
+
+
+def test_ring_ignores_ticks_that_are_not_newer():
+    ring = CoinRing(5)
+    ring.append(10, 1.0)
+    assert not ring.append(10, 2.0)
+    assert not ring.append(5, 3.0)
+    assert ring.since(0) == ([10], [1.0])
+
+
+def test_ring_overwrites_the_oldest_when_full():
+    ring = CoinRing(3)
+    for t in range(1, 8):
+        ring.append(t, t * 1.5)
+    assert ring.size == 3
+    assert ring.since(0) == ([5, 6, 7], [7.5, 9.0, 10.5])
+    assert ring.last_time() == 7
+
+
+def test_empty_ring():
+    ring = CoinRing(3)
+    assert ring.last_time() == 0
+    assert ring.since(0) == ([], [])
+
+
+def _point(coin_id, price, age, **kwargs):
+    return PricePoint(
+        coin_id=coin_id, symbol=coin_id.upper(), price=price,
+        timestamp=datetime.datetime.utcnow() - age, **kwargs
+    )
+
+
+def test_nothing_is_taken_before_warm(db):
+    buffer = TickBuffer(10)
+    db.add(_point("btc", 1.0, datetime.timedelta(minutes=5)))
+    db.commit()
+    assert buffer.append_rows([{"coin_id": "btc", "price": 2.0, "timestamp": datetime.datetime.utcnow()}]) == 0
+    assert buffer.catch_up(db, force=True) == 0
+
+
+def test_warm_loads_the_window_and_seeds_the_last_id(db):
+    db.add_all([
+        _point("btc", 1.0, datetime.timedelta(days=30)),
+        _point("btc", 2.0, datetime.timedelta(hours=1)),
+    ])
+    db.commit()
+    buffer = TickBuffer(10)
+    assert buffer.warm(db) == 1
+    assert buffer.ready
+    # Seeded from max(id), not just from the rows inside the window
+    assert buffer._last_id == 2
+
+
+def test_catch_up_skips_old_ticks_and_picks_up_late_commits(db):
+    db.add(_point("btc", 1.0, datetime.timedelta(hours=2)))
+    db.commit()
+    buffer = TickBuffer(10)
+    buffer.warm(db)
+
+    db.add(_point("eth", 1.0, datetime.timedelta(minutes=1), id=10))
+    db.add(_point("btc", 9.0, datetime.timedelta(days=10), id=11))
+    db.commit()
+    assert buffer.catch_up(db, force=True) == 1
+
+    # A lower id committed after id 10 was read
+    db.add(_point("btc", 3.0, datetime.timedelta(hours=1), id=5))
+    db.commit()
+    assert buffer.catch_up(db, force=True) == 1
+    week_ago = datetime.datetime.utcnow() - datetime.timedelta(days=7)
+    assert buffer.series("btc", week_ago)[1] == [1.0, 3.0]
+
+
+def test_sparkline_samples_and_change(monkeypatch):
+    buffer = TickBuffer(100)
+    buffer._ready.set()
+    now = datetime.datetime.utcnow()
+    buffer.append_rows(
+        {"coin_id": "btc", "price": 100.0 + i, "timestamp": now - datetime.timedelta(minutes=60 - i)}
+        for i in range(60)
+    )
+    monkeypatch.setattr(tick_buffer, "buffer", buffer)
+
+    line = tick_buffer.sparkline("btc", hours=1, points=6)
+    assert len(line["prices"]) <= 6
+    assert line["price"] == 159.0
+    assert line["prices"][-1] == 159.0
+    assert line["change_pct"] == round((159.0 / 100.0 - 1) * 100, 4)
+    assert tick_buffer.sparkline("eth", hours=1, points=6) is None
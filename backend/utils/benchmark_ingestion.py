@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Ingestion throughput benchmark.
+
+Runs price ingestion against the local CoinGecko stand-in
+(utils/fake_coingecko.py) and a database for a range of watched-universe
+sizes, and saves the numbers as JSON so versions can be compared.
+
+Each size runs in its own process so peak RSS is per size. Two modes:
+    task      (default) the fetch_and_store_prices Celery task, run eagerly in
+              the benchmark process: batch planning, the ingest_price_batch
+              subtasks and the summarizing callback, without a broker, so the
+              numbers do not depend on the worker count
+    pipeline  run_price_ingestion alone, with per-stage timings
+
+Reported per size and run:
+    coins_per_second, upstream_calls (as counted by the stand-in), end_to_end_ms,
+    rows_written, unchanged, write_seconds, fetch_seconds, peak_rss_mb;
+    batches and failed_batches in task mode, where the stage times are summed
+    over the batch subtasks
+
+Usage:
+    python utils/benchmark_ingestion.py
+    python utils/benchmark_ingestion.py --sizes 100,1000 --runs 2 --latency-ms 80
+    python utils/benchmark_ingestion.py --mode pipeline --database-url sqlite:///bench.db --output results.json
+
+The benchmark writes coin_subscriptions and price_points rows for the
+synthetic coin-NNNNN ids and removes them afterwards (unless --keep-data).
+Use a scratch database; don't run it against production.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Any, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = "100,1000,10000,50000"
+RESULTS_DIR = os.path.join(BACKEND_DIR, "utils", "benchmark_results")
+
+
+def _http_json(url: str, method: str = "GET", body: Any = None) -> Any:
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def _wait_for_server(base_url: str, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            _http_json(f"{base_url}/__stats")
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Fake CoinGecko server did not come up at {base_url}")
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _run_task() -> Dict[str, Any]:
+    """Run fetch_and_store_prices eagerly and return the run summary of its callback."""
+    from app.tasks.fetch_and_store_prices import fetch_and_store_prices
+    from app.worker.celery_app import celery_app
+
+    dispatched = fetch_and_store_prices.apply().get()
+    summary = celery_app.AsyncResult(dispatched["task_id"]).get(timeout=10)
+    return {**summary, "planned_batches": dispatched["batches"]}
+
+
+def run_worker(size: int, runs: int, server: str, keep_data: bool, mode: str) -> Dict[str, Any]:
+    """Benchmark one universe size in this process. Expects the app env to be set by the parent."""
+    sys.path.insert(0, BACKEND_DIR)
+    from app.database import SessionLocal, engine
+    from app.models import Base, CoinSubscription, CurrentPrice, PricePoint
+    from app.services import coingecko, ingestion_pipeline, subscriptions
+    from app.services.bulk_writer import upsert_rows
+
+    Base.metadata.create_all(
+        bind=engine, tables=[PricePoint.__table__, CurrentPrice.__table__, CoinSubscription.__table__]
+    )
+
+    coins = [c for c in coingecko.get_coins_list() if c["id"].startswith("coin-")][:size]
+    if len(coins) < size:
+        raise RuntimeError(f"Stand-in only has {len(coins)} synthetic coins; start it with --coins {size}")
+    coin_ids = [c["id"] for c in coins]
+
+    def cleanup():
+        db = SessionLocal()
+        try:
+            for i in range(0, len(coin_ids), 1000):
+                chunk = coin_ids[i:i + 1000]
+                db.query(PricePoint).filter(PricePoint.coin_id.in_(chunk)).delete(synchronize_session=False)
+                db.query(CurrentPrice).filter(CurrentPrice.coin_id.in_(chunk)).delete(synchronize_session=False)
+                db.query(CoinSubscription).filter(CoinSubscription.coin_id.in_(chunk)).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    cleanup()
+    db = SessionLocal()
+    try:
+        upsert_rows(
+            db,
+            CoinSubscription,
+            [{"coin_id": c["id"], "symbol": c["symbol"], "watchers": 1} for c in coins],
+            ["coin_id"],
+            ["symbol", "watchers"],
+        )
+        db.commit()
+        start = time.perf_counter()
+        universe = subscriptions.active_coins(db)
+        universe_ms = (time.perf_counter() - start) * 1000
+    finally:
+        db.close()
+    symbol_map = {coin_id: universe[coin_id] for coin_id in coin_ids}
+
+    if mode == "task":
+        from app.worker.celery_app import celery_app
+        # Subtasks and the chord callback run in this process; results stay in memory
+        celery_app.conf.update(
+            task_always_eager=True,
+            task_eager_propagates=True,
+            task_store_eager_result=True,
+            result_backend="cache+memory://",
+        )
+
+    results = []
+    try:
+        for run in range(1, runs + 1):
+            _http_json(f"{server}/__stats/reset", method="POST")
+            start = time.perf_counter()
+            if mode == "task":
+                summary = _run_task()
+            else:
+                summary, _ = ingestion_pipeline.run_price_ingestion(coin_ids, symbol_map)
+            elapsed = time.perf_counter() - start
+            stats = _http_json(f"{server}/__stats")
+            stages = summary.get("stages", {})
+            results.append({
+                "size": size,
+                "run": run,
+                "mode": mode,
+                "coins_per_second": round(size / elapsed, 1) if elapsed else None,
+                "end_to_end_ms": round(elapsed * 1000, 2),
+                "upstream_calls": stats["requests"],
+                "planned_calls": summary["upstream_calls"],
+                "status_429": stats["status_429"],
+                "rows_written": summary["rows_written"],
+                "unchanged": summary["unchanged"],
+                "batches": summary.get("batches"),
+                "failed_batches": summary.get("failed_batches"),
+                "fetch_seconds": stages.get("fetch", {}).get("seconds", summary.get("fetch_seconds")),
+                "write_seconds": stages.get("write", {}).get("seconds", summary.get("write_seconds")),
+                "fetch_errors": stages.get("fetch", {}).get("errors"),
+                "universe_read_ms": round(universe_ms, 2),
+                "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            })
+    finally:
+        if not keep_data:
+            cleanup()
+        coingecko.close()
+    return {"results": results}
+
+
+def _run_size(args, size: int, server: str) -> List[Dict[str, Any]]:
+    env = dict(os.environ)
+    env.update({
+        "COINGECKO_API_URL": f"{server}/api/v3",
+        "COINGECKO_PRICE_URL": f"{server}/api/v3/simple/price",
+        # Measure the pipeline, not the production rate limit
+        "COINGECKO_RATE_LIMIT_PER_MINUTE": str(args.rate_limit),
+        "COINGECKO_RATE_LIMIT_BURST": str(args.rate_limit),
+    })
+    if args.database_url:
+        env["DATABASE_URL"] = args.database_url
+    if args.mode == "task":
+        # A backend that can run chord callbacks, so the run is summarized
+        env["CELERY_RESULT_BACKEND"] = "cache+memory://"
+    if not args.use_redis:
+        # Nothing listens on port 1, so the limiter uses its per-process bucket
+        env["REDIS_URL"] = "redis://127.0.0.1:1/0"
+
+    command = [
+        sys.executable, os.path.abspath(__file__), "--worker", str(size), "--runs", str(args.runs),
+        "--server", server, "--mode", args.mode,
+    ]
+    if args.keep_data:
+        command.append("--keep-data")
+    output = subprocess.run(command, env=env, cwd=BACKEND_DIR, capture_output=True, text=True)
+    if output.returncode != 0:
+        sys.stderr.write(output.stderr)
+        raise RuntimeError(f"Benchmark for {size} coins failed")
+    # The app prints config lines on import; the result is the last line
+    return json.loads(output.stdout.strip().splitlines()[-1])["results"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark price ingestion against the local CoinGecko stand-in")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma separated watched-universe sizes")
+    parser.add_argument("--mode", choices=["task", "pipeline"], default="task", help="What to measure (see above)")
+    parser.add_argument("--runs", type=int, default=1, help="Runs per size (later runs hit already-stored ticks)")
+    parser.add_argument("--server", help="Use a running stand-in at this URL instead of starting one")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Upstream latency of the started stand-in")
+    parser.add_argument("--database-url", help="Database to write to (defaults to DATABASE_URL)")
+    parser.add_argument("--rate-limit", type=float, default=1_000_000, help="Upstream calls per minute allowed")
+    parser.add_argument("--use-redis", action="store_true", help="Use the Redis-backed rate limiter")
+    parser.add_argument("--keep-data", action="store_true", help="Leave benchmark rows in the database")
+    parser.add_argument("--output", help="Results file (default utils/benchmark_results/ingestion-<time>.json)")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.runs, args.server, args.keep_data, args.mode)))
+        return
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    server = args.server
+    fake = None
+    if not server:
+        server = f"http://127.0.0.1:{args.port}"
+        fake = subprocess.Popen([
+            sys.executable, os.path.join(BACKEND_DIR, "utils", "fake_coingecko.py"),
+            "--port", str(args.port), "--coins", str(max(sizes) + 100), "--latency-ms", str(args.latency_ms),
+        ])
+    try:
+        _wait_for_server(server)
+        results = []
+        for size in sizes:
+            print(f"Benchmarking {size} coins...")
+            for row in _run_size(args, size, server):
+                results.append(row)
+                detail = f"write {row['write_seconds']}s"
+                if args.mode == "task":
+                    detail += f", {row['batches']} batches, {row['failed_batches']} failed"
+                print(
+                    f"  run {row['run']}: {row['coins_per_second']} coins/s, {row['upstream_calls']} calls, "
+                    f"{detail}, {row['end_to_end_ms']}ms end to end, peak RSS {row['peak_rss_mb']}MB"
+                )
+    finally:
+        if fake:
+            fake.terminate()
+            fake.wait()
+
+    report = {
+        "generated_at": datetime.datetime.utcnow().isoformat(),
+        "git_commit": _git_commit(),
+        "config": {
+            "sizes": sizes,
+            "mode": args.mode,
+            "runs": args.runs,
+            "server": args.server or "started",
+            "latency_ms": None if args.server else args.latency_ms,
+            "database": (args.database_url or os.getenv("DATABASE_URL", "default")).split("@")[-1],
+        },
+        "results": results,
+    }
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"ingestion-{datetime.datetime.utcnow():%Y%m%d-%H%M%S}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
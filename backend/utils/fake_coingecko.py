@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the CoinGecko API, for offline testing and benchmarking.
+
+Serves synthetic (or recorded) data for the endpoints the app uses:
+
+    /simple/price, /coins/list, /coins/markets, /search/trending,
+    /coins/{id}/market_chart, /coins/{id}/ohlc
+
+Every route is available both at the root and under /api/v3, so point the app at it with:
+
+    COINGECKO_API_URL=http://localhost:8900/api/v3
+    COINGECKO_PRICE_URL=http://localhost:8900/api/v3/simple/price
+
+Faults are set with FAKE_COINGECKO_* environment variables at startup, or at
+runtime with PUT /__faults (JSON body with any of the FAULT_DEFAULTS keys).
+GET /__stats returns request counters; POST /__stats/reset clears them.
+
+Recorded responses: put coins_list.json, search_trending.json or
+coins_markets.json in FAKE_COINGECKO_FIXTURES and they are served as-is.
+
+Run:
+    python utils/fake_coingecko.py --port 8900 --coins 50000 --latency-ms 80 --rate-429 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+
+# Well-known ids come first so charts and the watchlist UI look familiar
+KNOWN_COINS = [
+    ("bitcoin", "btc", "Bitcoin", 60000.0),
+    ("ethereum", "eth", "Ethereum", 3000.0),
+    ("tether", "usdt", "Tether", 1.0),
+    ("binancecoin", "bnb", "BNB", 550.0),
+    ("solana", "sol", "Solana", 150.0),
+    ("ripple", "xrp", "XRP", 0.6),
+    ("cardano", "ada", "Cardano", 0.45),
+    ("dogecoin", "doge", "Dogecoin", 0.15),
+]
+
+FAULT_DEFAULTS: Dict[str, Any] = {
+    "latency_ms": 0.0,            # added to every response
+    "latency_jitter_ms": 0.0,     # uniform extra latency on top
+    "rate_429": 0.0,              # probability of a 429 with Retry-After
+    "retry_after_seconds": 1,
+    "rate_timeout": 0.0,          # probability of hanging for timeout_seconds before answering
+    "timeout_seconds": 30.0,
+    "rate_500": 0.0,              # probability of a 500
+    "partial_fraction": 0.0,      # share of requested ids silently left out of /simple/price
+    "max_url_length": 0,          # answer 414 when the request URL is longer (0 = unlimited)
+    "tick_seconds": 30,           # how often last_updated_at advances
+}
+
+FAULTS: Dict[str, Any] = dict(FAULT_DEFAULTS)
+STATS: Dict[str, Any] = {}
+
+
+def _reset_stats():
+    STATS.clear()
+    STATS.update({"requests": 0, "by_path": {}, "ids_requested": 0, "ids_returned": 0,
+                  "status_429": 0, "status_500": 0, "status_414": 0, "timeouts": 0})
+
+
+_reset_stats()
+
+
+def _load_faults_from_env():
+    for key, default in FAULT_DEFAULTS.items():
+        value = os.getenv(f"FAKE_COINGECKO_{key.upper()}")
+        if value is not None:
+            FAULTS[key] = type(default)(value)
+
+
+class Universe:
+    """Deterministic synthetic coin set; prices drift smoothly with time."""
+
+    def __init__(self, size: int):
+        self.coins: List[Dict[str, Any]] = []
+        for coin_id, symbol, name, base in KNOWN_COINS[:size]:
+            self.coins.append({"id": coin_id, "symbol": symbol, "name": name, "base": base})
+        for i in range(len(self.coins), size):
+            seed = zlib.crc32(f"coin-{i}".encode())
+            self.coins.append({
+                "id": f"coin-{i:05d}",
+                "symbol": f"c{i:05d}",
+                "name": f"Coin {i}",
+                "base": round(0.01 + (seed % 100000) / 100.0, 4),
+            })
+        self.by_id = {coin["id"]: coin for coin in self.coins}
+
+    def price(self, coin: Dict[str, Any], at: float) -> float:
+        phase = (zlib.crc32(coin["id"].encode()) % 6283) / 1000.0
+        drift = 0.03 * math.sin(at / 3600.0 + phase) + 0.005 * math.sin(at / 97.0 + phase)
+        return round(coin["base"] * (1 + drift), 8)
+
+
+UNIVERSE = Universe(int(os.getenv("FAKE_COINGECKO_COINS", "20000")))
+FIXTURES_DIR = os.getenv("FAKE_COINGECKO_FIXTURES", "")
+
+
+def _fixture(name: str) -> Optional[Any]:
+    if not FIXTURES_DIR:
+        return None
+    path = os.path.join(FIXTURES_DIR, f"{name}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _observed_at(now: float) -> int:
+    tick = max(1, int(FAULTS["tick_seconds"]))
+    return int(now // tick * tick)
+
+
+def _get_coin(coin_id: str) -> Dict[str, Any]:
+    coin = UNIVERSE.by_id.get(coin_id)
+    if coin is None:
+        raise HTTPException(status_code=404, detail="coin not found")
+    return coin
+
+
+app = FastAPI(title="Fake CoinGecko")
+api = APIRouter()
+
+
+@app.middleware("http")
+async def inject_faults(request: Request, call_next):
+    """Apply latency and configured failures before the real handler runs."""
+    path = request.url.path
+    if path.startswith("/__"):
+        return await call_next(request)
+
+    STATS["requests"] += 1
+    STATS["by_path"][path] = STATS["by_path"].get(path, 0) + 1
+
+    delay = FAULTS["latency_ms"] + random.uniform(0, FAULTS["latency_jitter_ms"])
+    if delay:
+        await asyncio.sleep(delay / 1000.0)
+
+    if FAULTS["max_url_length"] and len(str(request.url)) > FAULTS["max_url_length"]:
+        STATS["status_414"] += 1
+        return JSONResponse({"error": "URI Too Long"}, status_code=414)
+    if random.random() < FAULTS["rate_429"]:
+        STATS["status_429"] += 1
+        return JSONResponse(
+            {"status": {"error_code": 429, "error_message": "You've exceeded the Rate Limit."}},
+            status_code=429,
+            headers={"Retry-After": str(FAULTS["retry_after_seconds"])},
+        )
+    if random.random() < FAULTS["rate_timeout"]:
+        STATS["timeouts"] += 1
+        await asyncio.sleep(FAULTS["timeout_seconds"])
+    if random.random() < FAULTS["rate_500"]:
+        STATS["status_500"] += 1
+        return JSONResponse({"error": "internal error"}, status_code=500)
+
+    return await call_next(request)
+
+
+@api.get("/simple/price")
+def simple_price(
+    ids: str = Query(...),
+    vs_currencies: str = Query("usd"),
+    include_last_updated_at: bool = Query(False),
+    include_24hr_change: bool = Query(False),
+):
+    now = time.time()
+    requested = [i for i in ids.split(",") if i]
+    STATS["ids_requested"] += len(requested)
+    currencies = [c for c in vs_currencies.split(",") if c]
+
+    result = {}
+    for coin_id in requested:
+        coin = UNIVERSE.by_id.get(coin_id)
+        if coin is None:
+            continue
+        if FAULTS["partial_fraction"] and random.random() < FAULTS["partial_fraction"]:
+            continue
+        price = UNIVERSE.price(coin, now)
+        entry: Dict[str, Any] = {currency: price for currency in currencies}
+        if include_24hr_change:
+            change = (price / UNIVERSE.price(coin, now - 86400) - 1) * 100
+            entry.update({f"{currency}_24h_change": round(change, 4) for currency in currencies})
+        if include_last_updated_at:
+            entry["last_updated_at"] = _observed_at(now)
+        result[coin_id] = entry
+
+    STATS["ids_returned"] += len(result)
+    return result
+
+
+@api.get("/coins/list")
+def coins_list():
+    recorded = _fixture("coins_list")
+    if recorded is not None:
+        return recorded
+    return [{"id": c["id"], "symbol": c["symbol"], "name": c["name"]} for c in UNIVERSE.coins]
+
+
+@api.get("/coins/markets")
+def coins_markets(
+    vs_currency: str = Query("usd"),
+    order: str = Query("market_cap_desc"),
+    per_page: int = Query(100, le=250),
+    page: int = Query(1, ge=1),
+):
+    recorded = _fixture("coins_markets")
+    if recorded is not None:
+        return recorded
+
+    now = time.time()
+    start = (page - 1) * per_page
+    by_change = order.startswith("price_change")
+    # Market cap order is the universe order, so only the requested page is priced
+    coins = UNIVERSE.coins if by_change else UNIVERSE.coins[start:start + per_page]
+    first_rank = 1 if by_change else start + 1
+    rows = []
+    for rank, coin in enumerate(coins, start=first_rank):
+        price = UNIVERSE.price(coin, now)
+        rows.append({
+            "id": coin["id"],
+            "symbol": coin["symbol"],
+            "name": coin["name"],
+            "image": f"https://example.invalid/{coin['id']}.png",
+            "current_price": price,
+            "market_cap_rank": rank,
+            "price_change_percentage_24h": round((price / UNIVERSE.price(coin, now - 86400) - 1) * 100, 4),
+            "last_updated": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(_observed_at(now))),
+        })
+    if not by_change:
+        return rows
+    rows.sort(key=lambda r: r["price_change_percentage_24h"], reverse=order.endswith("desc"))
+    return rows[start:start + per_page]
+
+
+@api.get("/search/trending")
+def search_trending():
+    recorded = _fixture("search_trending")
+    if recorded is not None:
+        return recorded
+
+    picks = UNIVERSE.coins[:15]
+    btc = UNIVERSE.price(UNIVERSE.coins[0], time.time())
+    return {
+        "coins": [
+            {"item": {
+                "id": coin["id"],
+                "coin_id": zlib.crc32(coin["id"].encode()) % 100000,
+                "name": coin["name"],
+                "symbol": coin["symbol"].upper(),
+                "market_cap_rank": rank,
+                "thumb": f"https://example.invalid/{coin['id']}-thumb.png",
+                "price_btc": UNIVERSE.price(coin, time.time()) / btc,
+                "score": rank - 1,
+            }}
+            for rank, coin in enumerate(picks, start=1)
+        ],
+    }
+
+
+def _days_span(days: str) -> float:
+    return 365 * 5 if days == "max" else float(days)
+
+
+@api.get("/coins/{coin_id}/market_chart")
+def market_chart(coin_id: str, vs_currency: str = Query("usd"), days: str = Query("1")):
+    coin = _get_coin(coin_id)
+    span = _days_span(days)
+    # Same granularity rules as CoinGecko: 5-minutely, hourly, then daily
+    step = 300 if span <= 1 else 3600 if span <= 90 else 86400
+    now = time.time()
+    start = now - span * 86400
+    points = []
+    at = start
+    while at <= now:
+        points.append([int(at * 1000), UNIVERSE.price(coin, at)])
+        at += step
+    return {
+        "prices": points,
+        "market_caps": [[t, p * 1e7] for t, p in points],
+        "total_volumes": [[t, p * 1e5] for t, p in points],
+    }
+
+
+@api.get("/coins/{coin_id}/ohlc")
+def ohlc(coin_id: str, vs_currency: str = Query("usd"), days: str = Query("1")):
+    coin = _get_coin(coin_id)
+    span = _days_span(days)
+    candle = 1800 if span <= 2 else 14400 if span <= 30 else 345600
+    now = time.time()
+    rows = []
+    at = now - span * 86400
+    while at + candle <= now:
+        samples = [UNIVERSE.price(coin, at + candle * k / 4) for k in range(5)]
+        rows.append([int((at + candle) * 1000), samples[0], max(samples), min(samples), samples[-1]])
+        at += candle
+    return rows
+
+
+@app.get("/__faults")
+def get_faults():
+    return FAULTS
+
+
+@app.put("/__faults")
+def set_faults(update: Dict[str, Any]):
+    unknown = set(update) - set(FAULT_DEFAULTS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fault settings: {sorted(unknown)}")
+    for key, value in update.items():
+        FAULTS[key] = type(FAULT_DEFAULTS[key])(value)
+    return FAULTS
+
+
+@app.delete("/__faults")
+def reset_faults():
+    FAULTS.clear()
+    FAULTS.update(FAULT_DEFAULTS)
+    return FAULTS
+
+
+@app.get("/__stats")
+def get_stats():
+    return STATS
+
+
+@app.post("/__stats/reset")
+def reset_stats():
+    _reset_stats()
+    return STATS
+
+
+app.include_router(api)
+app.include_router(api, prefix="/api/v3")
+_load_faults_from_env()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a local CoinGecko stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--coins", type=int, help="Size of the synthetic coin universe")
+    for key, default in FAULT_DEFAULTS.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(default), dest=key)
+    args = parser.parse_args()
+
+    if args.coins:
+        UNIVERSE = Universe(args.coins)
+    for key in FAULT_DEFAULTS:
+        if getattr(args, key) is not None:
+            FAULTS[key] = getattr(args, key)
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
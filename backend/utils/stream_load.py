@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Load test for the price push channel (GET /prices/stream).
+
+Opens many concurrent subscribers, publishes synthetic ticks stamped with the
+time they were sent, and reports how many batches each subscriber got and the
+publish-to-delivery latency.
+
+Modes:
+    local  in-process hub only, no server or Redis: measures the fan-out itself
+    http   SSE clients against a running API; ticks are published through Redis,
+           so the API must use the same REDIS_URL (run it with several uvicorn
+           workers to check the cross-worker fan-out)
+
+Usage:
+    python utils/stream_load.py --mode local --subscribers 5000 --batches 50
+    python utils/stream_load.py --mode http --url http://localhost:8000 --subscribers 500
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import price_stream
+from app.services.redis_client import get_redis, set_redis
+
+
+def _ticks(batch: int, coins: int) -> List[Dict[str, Any]]:
+    now = datetime.datetime.utcnow()
+    return [
+        {"coin_id": f"coin-{i:05d}", "symbol": f"C{i}", "price": 100.0 + batch, "timestamp": now}
+        for i in range(coins)
+    ]
+
+
+def _summary(received: List[int], latencies: List[float], batches: int, elapsed: float) -> Dict[str, Any]:
+    latencies.sort()
+    return {
+        "subscribers": len(received),
+        "batches_published": batches,
+        "batches_received": sum(received),
+        "complete_subscribers": sum(1 for count in received if count >= batches),
+        "latency_ms_p50": round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        "latency_ms_p99": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2) if latencies else None,
+        "latency_ms_max": round(latencies[-1] * 1000, 2) if latencies else None,
+        "elapsed_seconds": round(elapsed, 2),
+    }
+
+
+async def run_local(args) -> Dict[str, Any]:
+    set_redis(None)
+    received = [0] * args.subscribers
+    latencies: List[float] = []
+
+    async def subscriber(index: int):
+        subscription = price_stream.hub.subscribe()
+        try:
+            while received[index] < args.batches:
+                ticks = await subscription.next(timeout=args.timeout)
+                if ticks is None:
+                    return
+                latencies.append(time.time() - ticks[0]["timestamp"])
+                received[index] += 1
+        finally:
+            price_stream.hub.unsubscribe(subscription)
+
+    tasks = [asyncio.create_task(subscriber(i)) for i in range(args.subscribers)]
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    for batch in range(args.batches):
+        # Ingestion publishes from a worker thread after its commit
+        await asyncio.to_thread(price_stream.publish, _ticks(batch, args.coins))
+        await asyncio.sleep(args.interval)
+    await asyncio.gather(*tasks)
+    return _summary(received, latencies, args.batches, time.perf_counter() - start)
+
+
+async def run_http(args) -> Dict[str, Any]:
+    import httpx
+
+    if get_redis() is None:
+        raise SystemExit("http mode publishes through Redis; set REDIS_URL to the API's Redis")
+    received = [0] * args.subscribers
+    latencies: List[float] = []
+    connected = asyncio.Semaphore(0)
+
+    async def subscriber(index: int, client: httpx.AsyncClient):
+        async with client.stream("GET", f"{args.url}/prices/stream") as response:
+            connected.release()
+            event = None
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line.split(":", 1)[1].strip()
+                elif line.startswith("data:") and event == "ticks":
+                    ticks = json.loads(line.split(":", 1)[1])
+                    latencies.append(time.time() - ticks[0]["timestamp"])
+                    received[index] += 1
+                    if received[index] >= args.batches:
+                        return
+
+    limits = httpx.Limits(max_connections=args.subscribers + 10)
+    async with httpx.AsyncClient(timeout=httpx.Timeout(args.timeout, connect=30), limits=limits) as client:
+        tasks = [asyncio.create_task(subscriber(i, client)) for i in range(args.subscribers)]
+        for _ in range(args.subscribers):
+            await connected.acquire()
+        # Let the API's listener come up before the first publish
+        await asyncio.sleep(2)
+        start = time.perf_counter()
+        for batch in range(args.batches):
+            await asyncio.to_thread(price_stream.publish, _ticks(batch, args.coins))
+            await asyncio.sleep(args.interval)
+        done, pending = await asyncio.wait(tasks, timeout=args.timeout)
+        for task in pending:
+            task.cancel()
+    return _summary(received, latencies, args.batches, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the price push channel")
+    parser.add_argument("--mode", choices=["local", "http"], default="local")
+    parser.add_argument("--url", default="http://localhost:8000", help="API base URL (http mode)")
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--batches", type=int, default=20, help="Tick batches to publish")
+    parser.add_argument("--coins", type=int, default=50, help="Ticks per batch")
+    parser.add_argument("--interval", type=float, default=0.1, help="Seconds between batches")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Give up on a silent subscriber after this long")
+    args = parser.parse_args()
+
+    runner = run_local if args.mode == "local" else run_http
+    print(f"Running {args.mode} stream load test with {args.subscribers} subscribers...")
+    print(json.dumps(asyncio.run(runner(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()